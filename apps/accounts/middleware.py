@@ -1,8 +1,8 @@
-class OnboardingMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+from django.utils.deprecation import MiddlewareMixin
 
-    def __call__(self, request):
+
+class OnboardingMiddleware(MiddlewareMixin):
+    def process_request(self, request):
         if (request.user.is_authenticated
                 and not request.user.onboarding_completed
                 and not request.path.startswith('/auth/')
@@ -13,4 +13,3 @@ class OnboardingMiddleware:
                 and not request.path.startswith('/admin')):
             from django.shortcuts import redirect
             return redirect('accounts:onboarding')
-        return self.get_response(request)
@@ -1,37 +1,138 @@
 import hashlib
+import logging
 
+from django.core.cache import cache
 from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
 
+def verified_key_cache_key(key_hash):
+    return f"api-key:{key_hash}"
+
+
+logger = logging.getLogger('spritetest.api')
+
+# Set (Redis) com os ids das keys usadas desde o último flush
+USED_KEYS_SET = 'api-key-used-ids'
+
+
+def _usage_cache_key(key_id):
+    return f"api-key-used:{key_id}"
+
+
+def _mark_used(key_id) -> None:
+    """Entra no set das keys a gravar; sem Redis, num set guardado no cache local."""
+    from apps.core.cache import redis_client
+
+    client = redis_client()
+    if client is None:
+        used = cache.get(USED_KEYS_SET) or set()
+        used.add(str(key_id))
+        cache.set(USED_KEYS_SET, used, None)
+        return
+    try:
+        client.sadd(cache.make_and_validate_key(USED_KEYS_SET), str(key_id))
+    except Exception as e:
+        logger.debug("Uso da API key %s não marcado: %s", key_id, e)
+
+
+def _pop_used_ids(batch_size) -> list:
+    """Tira do set (SPOP) e devolve os ids das keys usadas desde o último flush."""
+    from apps.core.cache import redis_client
+
+    client = redis_client()
+    if client is None:
+        used = cache.get(USED_KEYS_SET) or set()
+        cache.delete(USED_KEYS_SET)
+        return list(used)
+    set_key = cache.make_and_validate_key(USED_KEYS_SET)
+    ids = []
+    while True:
+        batch = client.spop(set_key, batch_size)
+        if not batch:
+            return ids
+        ids.extend(key_id.decode() for key_id in batch)
+
+
+def invalidate_api_key(api_key):
+    """Tira a key do cache de verificação — chamado ao revogar/editar/apagar."""
+    cache.delete(verified_key_cache_key(api_key.key_hash))
+
+
+def flush_last_used() -> int:
+    """
+    Grava em lote o last_used_at das keys usadas desde o último flush: só os
+    ids do set de uso (sem varrer as keys ativas) e um bulk_update.
+
+    A request grava o horário e depois entra no set; o flush tira do set e
+    depois lê o horário. Um uso entre as duas leituras volta para o set e sai
+    no flush seguinte — nada se perde. Os horários não são apagados aqui:
+    expiram sozinhos (API_KEY_USAGE_TTL) e só são gravados via set.
+    """
+    from django.conf import settings
+
+    from apps.api.models import APIKey
+
+    ids = _pop_used_ids(settings.API_KEY_FLUSH_BATCH_SIZE)
+    if not ids:
+        return 0
+    keys = {_usage_cache_key(key_id): key_id for key_id in ids}
+    used = cache.get_many(list(keys))
+    try:
+        updated = APIKey.objects.bulk_update(
+            [APIKey(id=keys[key], last_used_at=used_at) for key, used_at in used.items()],
+            ['last_used_at'], batch_size=settings.API_KEY_FLUSH_BATCH_SIZE,
+        )
+    except Exception:
+        for key_id in ids:
+            _mark_used(key_id)
+        raise
+    return updated
+
+
 class APIKeyAuthentication(BaseAuthentication):
+    """
+    Bearer spt_... — a key verificada fica no cache (por hash, API_KEY_CACHE_TTL)
+    e o last_used_at vai para o cache; flush_last_used() grava em lote.
+    Sem query nem UPDATE por request numa integração de CI ocupada.
+    """
+
     def authenticate(self, request):
+        from django.conf import settings
+
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         if not auth_header.startswith('Bearer spt_'):
             return None
 
         raw_key = auth_header.split(' ', 1)[1]
-        prefix = raw_key[:8]
+        key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
+
+        cache_key = verified_key_cache_key(key_hash)
+        api_key = cache.get(cache_key)
+        if api_key is None:
+            api_key = self._lookup(raw_key[:8], key_hash)
+            cache.set(cache_key, api_key, settings.API_KEY_CACHE_TTL)
+
+        if api_key.expires_at and api_key.expires_at < timezone.now():
+            raise AuthenticationFailed('API Key expirada')
+
+        cache.set(_usage_cache_key(api_key.id), timezone.now(), settings.API_KEY_USAGE_TTL)
+        _mark_used(api_key.id)
 
+        request.workspace = api_key.workspace
+        return (api_key.created_by, api_key)
+
+    def _lookup(self, prefix, key_hash):
         from apps.api.models import APIKey
 
         try:
-            api_key = APIKey.objects.select_related('workspace').get(
+            api_key = APIKey.objects.select_related('workspace', 'created_by').get(
                 key_prefix=prefix, is_active=True
             )
         except APIKey.DoesNotExist:
             raise AuthenticationFailed('API Key inválida')
 
-        if api_key.expires_at and api_key.expires_at < timezone.now():
-            raise AuthenticationFailed('API Key expirada')
-
-        key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
         if key_hash != api_key.key_hash:
             raise AuthenticationFailed('API Key inválida')
-
-        api_key.last_used_at = timezone.now()
-        api_key.save(update_fields=['last_used_at'])
-
-        request.workspace = api_key.workspace
-        return (api_key.created_by, api_key)
+        return api_key
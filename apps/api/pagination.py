@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedCursorPagination(CursorPagination):
+    """Paginação por cursor (estável sob inserções) do mais novo para o mais antigo."""
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CaseCursorPagination(CursorPagination):
+    ordering = ('order', 'created_at')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
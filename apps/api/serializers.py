@@ -3,7 +3,36 @@ from rest_framework import serializers
 from apps.testing.models import TestCase, TestProject, TestRun
 
 
-class TestCaseSerializer(serializers.ModelSerializer):
+def parse_csv_param(request, name) -> set:
+    """`?name=a,b` -> {'a', 'b'} (vazio se ausente)."""
+    if request is None:
+        return set()
+    return {part.strip() for part in request.query_params.get(name, '').split(',') if part.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    `?fields=a,b` restringe os campos da resposta; os campos em
+    `Meta.expandable` (aninhados/caros) só aparecem com `?expand=campo`.
+    Só vale no serializer raiz — aninhados não recebem o request no __init__.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        expand = parse_csv_param(request, 'expand')
+        for name in getattr(self.Meta, 'expandable', ()):
+            if name not in expand:
+                self.fields.pop(name, None)
+        fields = parse_csv_param(request, 'fields')
+        if fields:
+            for name in set(self.fields) - fields - expand:
+                self.fields.pop(name)
+
+
+class TestCaseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TestCase
         fields = [
@@ -12,34 +41,46 @@ class TestCaseSerializer(serializers.ModelSerializer):
         ]
 
 
-class TestRunSerializer(serializers.ModelSerializer):
+class TestRunSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     cases = TestCaseSerializer(many=True, read_only=True)
     pass_rate = serializers.FloatField(read_only=True)
+    project_id = serializers.UUIDField(read_only=True)
 
     class Meta:
         model = TestRun
         fields = [
-            'id', 'status', 'pass_rate', 'total_cases', 'passed_cases',
+            'id', 'project_id', 'status', 'pass_rate', 'total_cases', 'passed_cases',
             'failed_cases', 'ai_summary', 'duration_secs', 'created_at',
             'completed_at', 'cases',
         ]
+        expandable = ['cases']
+
+
+class TestRunSummarySerializer(serializers.ModelSerializer):
+    """TestRun sem os casos — para listagens."""
+    pass_rate = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = TestRun
+        fields = [
+            'id', 'status', 'pass_rate', 'total_cases', 'passed_cases',
+            'failed_cases', 'duration_secs', 'created_at', 'completed_at',
+        ]
 
 
-class TestProjectSerializer(serializers.ModelSerializer):
-    last_run = serializers.SerializerMethodField()
+class TestProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Usa as stats desnormalizadas do projeto; com expand=last_run a view faz select_related('last_run')
+    last_run = TestRunSummarySerializer(read_only=True)
+    avg_pass_rate = serializers.FloatField(source='average_pass_rate', read_only=True)
 
     class Meta:
         model = TestProject
         fields = [
             'id', 'name', 'base_url', 'test_type', 'special_instructions',
-            'is_active', 'created_at', 'last_run',
+            'is_active', 'created_at', 'total_runs', 'completed_runs',
+            'avg_pass_rate', 'last_run_status', 'last_run',
         ]
-
-    def get_last_run(self, obj):
-        run = obj.runs.first()
-        if run:
-            return TestRunSerializer(run).data
-        return None
+        expandable = ['last_run']
 
 
 class CreateTestSerializer(serializers.Serializer):
@@ -50,3 +91,4 @@ class CreateTestSerializer(serializers.Serializer):
     auth_email = serializers.EmailField(required=False, allow_blank=True, default='')
     auth_password = serializers.CharField(required=False, allow_blank=True, default='')
     run_immediately = serializers.BooleanField(default=True)
+    regenerate = serializers.BooleanField(default=False)
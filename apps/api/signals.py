@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_api_key
+from .models import APIKey
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def invalidate_verified_key(sender, instance, **kwargs):
+    """Revogar (is_active=False) ou apagar a key vale na próxima request, sem esperar o TTL."""
+    invalidate_api_key(instance)
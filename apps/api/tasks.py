@@ -0,0 +1,14 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger('spritetest.tasks')
+
+
+@shared_task(name='api.flush_key_usage')
+def flush_key_usage():
+    """Grava em lote o last_used_at das API keys acumulado no cache."""
+    from .authentication import flush_last_used
+
+    flushed = flush_last_used()
+    return f"API keys: last_used_at de {flushed} key(s) gravado"
@@ -0,0 +1,188 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+User = get_user_model()
+
+
+class LeanRunApiTest(TestCase):
+    def setUp(self):
+        from apps.api.models import APIKey
+        from apps.testing.models import TestProject
+        from apps.testing.services import materialize_run
+
+        self.user = User.objects.create_user(
+            username='api', email='api@test.com', password='APpass123!'
+        )
+        workspace = self.user.workspaces.first()
+        _, raw_key = APIKey.generate(workspace, self.user, 'CI')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {raw_key}'}
+        self.project = TestProject.objects.create(
+            workspace=workspace, created_by=self.user, name='API', base_url='https://example.com',
+        )
+        self.runs = [
+            materialize_run(self.project, self.user, [{'title': f'c{i}', 'steps': ['x']} for i in range(3)])
+            for _ in range(3)
+        ]
+
+    def test_sparse_fields_expand_and_cursor_pagination(self):
+        response = self.client.get('/api/v1/runs/?fields=id,status&page_size=2', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([set(r) for r in body['results']], [{'id', 'status'}] * 2)
+        self.assertIsNotNone(body['next'])
+        self.assertEqual(len(self.client.get(body['next'], **self.auth).json()['results']), 1)
+
+        detail = self.client.get(f'/api/v1/runs/{self.runs[0].id}/', **self.auth).json()
+        self.assertNotIn('cases', detail)
+        detail = self.client.get(f'/api/v1/runs/{self.runs[0].id}/?expand=cases', **self.auth).json()
+        self.assertEqual(len(detail['cases']), 3)
+
+        cases = self.client.get(
+            f'/api/v1/runs/{self.runs[0].id}/cases/?fields=title,status', **self.auth,
+        ).json()
+        self.assertEqual([c['title'] for c in cases['results']], ['c0', 'c1', 'c2'])
+        self.assertNotIn('steps', cases['results'][0])
+
+        projects = self.client.get('/api/v1/projects/?expand=last_run', **self.auth).json()['results']
+        self.assertEqual(projects[0]['last_run']['id'], str(self.runs[-1].id))
+
+    def test_project_filter_rejects_non_uuid(self):
+        response = self.client.get('/api/v1/runs/?project=abc', **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.json())
+        response = self.client.get(f'/api/v1/runs/?project={self.project.id}', **self.auth)
+        self.assertEqual(len(response.json()['results']), 3)
+
+
+
+class CachedAPIKeyAuthTest(TestCase):
+    def setUp(self):
+        from apps.api.models import APIKey
+
+        self.user = User.objects.create_user(username='key', email='key@test.com', password='KYpass123!')
+        self.key, raw_key = APIKey.generate(self.user.workspaces.first(), self.user, 'CI')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {raw_key}'}
+
+    def test_verified_key_is_cached_and_usage_flushed_in_bulk(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from apps.api.authentication import flush_last_used
+
+        self.assertEqual(self.client.get('/api/v1/projects/', **self.auth).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/api/v1/projects/', **self.auth).status_code, 200)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('api_apikey', sql)
+
+        self.key.refresh_from_db()
+        self.assertIsNone(self.key.last_used_at)
+        self.assertEqual(flush_last_used(), 1)
+        self.key.refresh_from_db()
+        self.assertIsNotNone(self.key.last_used_at)
+        self.assertEqual(flush_last_used(), 0)
+
+    def test_usage_written_during_flush_is_not_lost(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from apps.api import authentication
+
+        class FakeRedis:
+            def __init__(self):
+                self.members = set()
+
+            def sadd(self, key, *values):
+                self.members.update(values)
+
+            def spop(self, key, count):
+                popped = [self.members.pop().encode() for _ in range(min(count, len(self.members)))]
+                return popped
+
+        redis = FakeRedis()
+        original_get_many = cache.get_many
+
+        def get_many_then_request(keys):
+            found = original_get_many(keys)
+            # Request concorrente entre o SPOP e o fim do flush
+            self.client.get('/api/v1/projects/', **self.auth)
+            return found
+
+        with mock.patch('apps.core.cache.redis_client', return_value=redis):
+            self.client.get('/api/v1/projects/', **self.auth)
+            self.assertEqual(redis.members, {str(self.key.id)})
+            with mock.patch.object(cache, 'get_many', side_effect=get_many_then_request):
+                self.assertEqual(authentication.flush_last_used(), 1)
+            self.assertEqual(redis.members, {str(self.key.id)})
+            self.assertEqual(authentication.flush_last_used(), 1)
+            self.assertEqual(authentication.flush_last_used(), 0)
+
+    def test_revoked_key_is_rejected_immediately(self):
+        self.assertEqual(self.client.get('/api/v1/projects/', **self.auth).status_code, 200)
+        self.key.is_active = False
+        self.key.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get('/api/v1/projects/', **self.auth).status_code, 403)
+
+
+@override_settings(EVENTS_REDIS_URL='', EVENTS_POLL_SECS=0.05)
+class RunStatusWaitTest(TestCase):
+    """Sem Redis os waiters caem no polling do banco — mesmo contrato da API."""
+
+    def setUp(self):
+        from apps.api.models import APIKey
+        from apps.testing.models import TestProject, TestRun
+
+        user = User.objects.create_user(username='wait', email='wait@test.com', password='WTpass123!')
+        workspace = user.workspaces.first()
+        _, raw_key = APIKey.generate(workspace, user, 'CI')
+        self.auth = {'headers': {'Authorization': f'Bearer {raw_key}'}}
+        project = TestProject.objects.create(
+            workspace=workspace, created_by=user, name='W', base_url='https://example.com',
+        )
+        self.run = TestRun.objects.create(project=project, triggered_by=user, status='running', total_cases=2)
+
+    async def test_long_poll_wakes_on_status_change(self):
+        from asgiref.sync import sync_to_async
+
+        url = f'/api/v1/runs/{self.run.id}/status/'
+        response = await self.async_client.get(url + '?wait=5&since_status=pending', **self.auth)
+        self.assertEqual(response.json()['status'], 'running')
+
+        async def finish_soon():
+            await asyncio.sleep(0.1)
+            self.run.status = 'passed'
+            await sync_to_async(self.run.save)(update_fields=['status'])
+
+        finisher = asyncio.ensure_future(finish_soon())
+        response = await self.async_client.get(url + '?wait=5&since_status=running', **self.auth)
+        await finisher
+        self.assertEqual(response.json()['status'], 'passed')
+
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+
+    async def test_event_stream_ends_on_terminal_status(self):
+        from asgiref.sync import sync_to_async
+
+        self.run.status = 'failed'
+        await sync_to_async(self.run.save)(update_fields=['status'])
+        response = await self.async_client.get(f'/api/v1/runs/{self.run.id}/events/', **self.auth)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertTrue(body.startswith('event: status\n'))
+        self.assertIn('"status": "failed"', body)
+        self.assertTrue(body.rstrip().split('\n')[-2] == 'event: end')
+
+    async def test_status_endpoints_are_throttled(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from rest_framework.throttling import UserRateThrottle
+
+        await cache.aclear()
+        with mock.patch.object(UserRateThrottle, 'THROTTLE_RATES', {'user': '2/hour'}):
+            url = f'/api/v1/runs/{self.run.id}/status/'
+            for _ in range(2):
+                self.assertEqual((await self.async_client.get(url, **self.auth)).status_code, 200)
+            response = await self.async_client.get(f'/api/v1/runs/{self.run.id}/events/', **self.auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
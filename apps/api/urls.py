@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views, views_dashboard
+from . import views, views_dashboard, views_stream
 
 app_name = 'api'
 
@@ -8,8 +8,11 @@ urlpatterns = [
     # REST API endpoints
     path('v1/projects/', views.ProjectListView.as_view(), name='projects'),
     path('v1/tests/', views.CreateTestView.as_view(), name='create_test'),
+    path('v1/runs/', views.RunListView.as_view(), name='runs'),
     path('v1/runs/<uuid:run_id>/', views.RunDetailView.as_view(), name='run_detail'),
-    path('v1/runs/<uuid:run_id>/status/', views.RunStatusView.as_view(), name='run_status'),
+    path('v1/runs/<uuid:run_id>/cases/', views.RunCasesView.as_view(), name='run_cases'),
+    path('v1/runs/<uuid:run_id>/status/', views_stream.run_status, name='run_status'),
+    path('v1/runs/<uuid:run_id>/events/', views_stream.run_events, name='run_events'),
     # Dashboard key management
     path('keys/', views_dashboard.api_keys_list, name='keys_list'),
     path('keys/create/', views_dashboard.api_key_create, name='key_create'),
@@ -1,22 +1,67 @@
+import uuid
+
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django_ratelimit.decorators import ratelimit
-from rest_framework import status
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.testing.models import TestCase, TestProject, TestRun
 
-from .serializers import CreateTestSerializer, TestProjectSerializer, TestRunSerializer
+from .pagination import CaseCursorPagination, CreatedCursorPagination
+from .serializers import (
+    CreateTestSerializer,
+    TestCaseSerializer,
+    TestProjectSerializer,
+    TestRunSerializer,
+    parse_csv_param,
+)
+
+
+def _expanded(request, name) -> bool:
+    """True se o campo aninhado `name` foi pedido em `?expand=` — o queryset carrega junto."""
+    return name in parse_csv_param(request, 'expand')
 
 
 @method_decorator(ratelimit(key='user', rate='60/m', block=True), name='dispatch')
-class ProjectListView(APIView):
-    def get(self, request):
-        projects = TestProject.objects.filter(
-            workspace=request.workspace, is_active=True
-        )
-        return Response(TestProjectSerializer(projects, many=True).data)
+class ProjectListView(generics.ListAPIView):
+    """Projetos ativos, paginados por cursor. `?expand=last_run` inclui o último run."""
+    serializer_class = TestProjectSerializer
+    pagination_class = CreatedCursorPagination
+
+    def get_queryset(self):
+        projects = TestProject.objects.filter(workspace=self.request.workspace, is_active=True)
+        if _expanded(self.request, 'last_run'):
+            projects = projects.select_related('last_run')
+        return projects
+
+
+@method_decorator(ratelimit(key='user', rate='60/m', block=True), name='dispatch')
+class RunListView(generics.ListAPIView):
+    """
+    Runs do workspace, paginados por cursor. Filtros: `?project=<id>`,
+    `?status=passed,failed`. `?expand=cases` aninha os casos.
+    """
+    serializer_class = TestRunSerializer
+    pagination_class = CreatedCursorPagination
+
+    def get_queryset(self):
+        runs = TestRun.objects.filter(project__workspace=self.request.workspace)
+        project_id = self.request.query_params.get('project')
+        if project_id:
+            try:
+                project_id = uuid.UUID(project_id)
+            except ValueError:
+                raise ValidationError({'project': 'Informe o UUID de um projeto.'})
+            runs = runs.filter(project_id=project_id)
+        statuses = parse_csv_param(self.request, 'status')
+        if statuses:
+            runs = runs.filter(status__in=statuses)
+        if _expanded(self.request, 'cases'):
+            runs = runs.prefetch_related('cases')
+        return runs
 
 
 @method_decorator(ratelimit(key='user', rate='60/m', block=True), name='dispatch')
@@ -46,11 +91,9 @@ class CreateTestView(APIView):
             auth_password=d.get('auth_password', ''),
         )
 
-        from apps.testing.ai_service import generate_test_cases
+        from apps.testing.ai_service import generate_for_project
 
-        ai_result = generate_test_cases(
-            project.base_url, project.test_type, project.special_instructions
-        )
+        ai_result = generate_for_project(project, regenerate=d.get('regenerate', False))
 
         if 'error' in ai_result:
             return Response(
@@ -58,28 +101,24 @@ class CreateTestView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        run = TestRun.objects.create(
-            project=project, triggered_by=request.user, status='pending'
-        )
+        from apps.testing.services import create_run_from_ai
+        from apps.workspaces.quota import QuotaExceeded
 
-        for i, tc in enumerate(ai_result.get('test_cases', [])):
-            TestCase.objects.create(
-                run=run,
-                title=tc.get('title', ''),
-                description=tc.get('description', ''),
-                category=tc.get('category', ''),
-                steps=tc.get('steps', []),
-                order=i,
+        try:
+            run = create_run_from_ai(project, request.user, ai_result, enforce_quota=True)
+        except QuotaExceeded:
+            # Outro request levou o último run do mês entre o check e a criação
+            project.delete()
+            return Response(
+                {'detail': f'Quota excedida: {quota["limit"]} runs/mês no plano atual.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
             )
 
-        run.total_cases = run.cases.count()
-        run.save(update_fields=['total_cases'])
-
         if d.get('run_immediately'):
-            from apps.testing.tasks import run_test_execution
+            from apps.testing.queues import INTERACTIVE, enqueue_run
 
             try:
-                run_test_execution.delay(str(run.id))
+                enqueue_run(run, INTERACTIVE)
             except Exception:
                 from apps.testing.executor import run_test_execution_smart
 
@@ -98,22 +137,28 @@ class CreateTestView(APIView):
 
 class RunDetailView(APIView):
     def get(self, request, run_id):
+        runs = TestRun.objects.all()
+        if _expanded(request, 'cases'):
+            runs = runs.prefetch_related('cases')
         run = get_object_or_404(
-            TestRun, id=run_id, project__workspace=request.workspace
+            runs, id=run_id, project__workspace=request.workspace
         )
-        return Response(TestRunSerializer(run).data)
+        return Response(TestRunSerializer(run, context={'request': request}).data)
 
 
-class RunStatusView(APIView):
-    def get(self, request, run_id):
+@method_decorator(ratelimit(key='user', rate='60/m', block=True), name='dispatch')
+class RunCasesView(generics.ListAPIView):
+    """Casos de um run, paginados por cursor; `?fields=` para omitir steps etc."""
+    serializer_class = TestCaseSerializer
+    pagination_class = CaseCursorPagination
+
+    def get_queryset(self):
         run = get_object_or_404(
-            TestRun, id=run_id, project__workspace=request.workspace
+            TestRun.objects.only('id'), id=self.kwargs['run_id'], project__workspace=self.request.workspace,
         )
-        return Response({
-            'run_id': str(run.id),
-            'status': run.status,
-            'pass_rate': run.pass_rate,
-            'total': run.total_cases,
-            'passed': run.passed_cases,
-            'failed': run.failed_cases,
-        })
+        cases = TestCase.objects.filter(run=run)
+        fields = parse_csv_param(self.request, 'fields')
+        if fields and 'steps' not in fields:
+            cases = cases.defer('steps')
+        return cases
+
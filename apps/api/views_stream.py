@@ -0,0 +1,90 @@
+"""
+Status de run sem polling agressivo: long-poll (`?wait=`) e Server-Sent
+Events. Views async — esperando, uma conexão não ocupa thread nem faz
+queries; acorda com os eventos publicados pelos executores (apps.testing.events).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework.throttling import UserRateThrottle
+
+from apps.testing.events import load_status, stream_response, wait_for_status_change
+
+
+def _authenticate(request):
+    """Mesmos autenticadores da API REST, uma vez por conexão."""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _throttle_wait(request, user):
+    """
+    Mesmo throttle 'user' das views DRF (e do antigo RunStatusView), contado
+    por conexão. None se liberado; senão os segundos até a próxima vaga.
+    """
+    request.user = user
+    throttle = UserRateThrottle()
+    if throttle.allow_request(request, None):
+        return None
+    return throttle.wait() or 1
+
+
+async def _initial_status(request, run_id):
+    """(payload, None) ou (None, resposta de erro)."""
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except AuthenticationFailed as e:
+        return None, JsonResponse({'detail': str(e.detail)}, status=401)
+    if user is None:
+        return None, JsonResponse({'detail': 'Credenciais não informadas.'}, status=401)
+
+    wait = await sync_to_async(_throttle_wait)(request, user)
+    if wait is not None:
+        response = JsonResponse({'detail': 'Limite de requisições excedido.'}, status=429)
+        response['Retry-After'] = str(int(wait))
+        return None, response
+
+    payload = await load_status(run_id, getattr(request, 'workspace', None))
+    if payload is None:
+        return None, JsonResponse({'detail': 'Run não encontrado.'}, status=404)
+    return payload, None
+
+
+@require_GET
+async def run_status(request, run_id):
+    """
+    Status rápido do run. Com `?wait=N` (até EVENTS_LONGPOLL_MAX_SECS) vira
+    long-poll: responde quando o status sair de `since_status` (padrão: o
+    status atual) ou quando o tempo acabar, com o status do momento.
+    """
+    payload, error = await _initial_status(request, run_id)
+    if error:
+        return error
+
+    try:
+        wait = min(max(int(request.GET.get('wait', 0)), 0), settings.EVENTS_LONGPOLL_MAX_SECS)
+    except ValueError:
+        wait = 0
+    since_status = request.GET.get('since_status') or payload['status']
+    if wait and payload['status'] == since_status:
+        payload = await wait_for_status_change(run_id, request.workspace, payload, since_status, wait)
+    return JsonResponse(payload)
+
+
+@require_GET
+async def run_events(request, run_id):
+    """
+    Stream SSE do run: `status` a cada mudança, `case` a cada caso concluído
+    e `end` quando o run termina (ou após EVENTS_STREAM_MAX_SECS — o
+    EventSource reconecta sozinho).
+    """
+    payload, error = await _initial_status(request, run_id)
+    if error:
+        return error
+    return stream_response(run_id, request.workspace, payload)
@@ -0,0 +1,110 @@
+"""
+Backend de cache Redis com modo degradado e helpers de namespace.
+
+Com REDIS_URL definido, o cache default é compartilhado entre todos os
+processos (gunicorn e Celery) — rate limits e valores cacheados deixam de ser
+por processo. Se o Redis cair, o backend passa a usar um LocMemCache local por
+alguns segundos em vez de propagar erro, do mesmo jeito que
+core.status.check_redis reporta 'degraded' em vez de 'outage'.
+"""
+import logging
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger('spritetest.cache')
+
+_REDIS_ERRORS = (RedisConnectionError, RedisTimeoutError)
+
+
+def workspace_key(workspace_id, *parts) -> str:
+    """Chave com namespace do workspace: ws:<id>:<parts...>."""
+    return ':'.join(['ws', str(workspace_id), *(str(part) for part in parts)])
+
+
+def redis_client():
+    """
+    Client Redis cru do cache default, para estruturas que o cache do Django
+    não tem (sets...). None com LocMem (dev/testes) ou com o Redis degradado.
+    """
+    from django.core.cache import caches
+
+    backend = caches['default']
+    if not isinstance(backend, RedisCache) or getattr(backend, 'degraded', False):
+        return None
+    return backend._cache.get_client(write=True)
+
+
+def is_degraded() -> bool:
+    """True se o cache default está servindo do fallback local (Redis offline)."""
+    from django.core.cache import cache
+
+    return getattr(cache, 'degraded', False)
+
+
+class ResilientRedisCache(RedisCache):
+    """
+    RedisCache que, em erro de conexão/timeout, serve de um LocMemCache do
+    processo por DEGRADED_RETRY_SECS antes de tentar o Redis de novo — sem
+    pagar o timeout de conexão a cada chamada enquanto o Redis está fora.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._retry_secs = params.get('DEGRADED_RETRY_SECS', 30)
+        self._down_until = 0.0
+        self._fallback = LocMemCache('spritetest-fallback', {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': self.key_prefix,
+            'VERSION': self.version,
+        })
+
+    @property
+    def degraded(self):
+        return time.monotonic() < self._down_until
+
+    def _call(self, method, *args, **kwargs):
+        if not self.degraded:
+            try:
+                return getattr(super(), method)(*args, **kwargs)
+            except _REDIS_ERRORS as e:
+                logger.warning("Redis cache offline (%s) — usando cache local por %ss", e, self._retry_secs)
+                self._down_until = time.monotonic() + self._retry_secs
+        return getattr(self._fallback, method)(*args, **kwargs)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('add', key, value, timeout, version)
+
+    def get(self, key, default=None, version=None):
+        return self._call('get', key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set', key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('touch', key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self._call('delete', key, version)
+
+    def get_many(self, keys, version=None):
+        return self._call('get_many', keys, version)
+
+    def has_key(self, key, version=None):
+        return self._call('has_key', key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._call('incr', key, delta, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set_many', data, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        return self._call('delete_many', keys, version)
+
+    def clear(self):
+        return self._call('clear')
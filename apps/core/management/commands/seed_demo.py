@@ -72,6 +72,13 @@ class Command(BaseCommand):
                         description='Auto-gerado por seed_demo',
                     )
                 total_runs += 1
+            project.refresh_stats()
+
+        from django.core.management import call_command
+        call_command('backfill_daily_stats', workspace=ws.slug, stdout=self.stdout)
+
+        from apps.workspaces.quota import reconcile_run_counters
+        reconcile_run_counters()
 
         self.stdout.write(self.style.SUCCESS(
             f'Demo criado! Login: {email} / Senha: demo1234\n'
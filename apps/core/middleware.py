@@ -1,15 +1,43 @@
 import time
 import logging
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.deprecation import MiddlewareMixin
+from whitenoise.middleware import WhiteNoiseMiddleware
+
 logger = logging.getLogger('spritetest.security')
 
+# Os middlewares do projeto são sync+async (MiddlewareMixin): sob ASGI, as
+# views async de eventos (SSE/long-poll) não prendem uma thread por conexão.
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise com caminho async — o WhiteNoiseMiddleware original é só sync."""
+    sync_capable = True
+    async_capable = True
 
-class SecurityHeadersMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class SecurityHeadersMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
         response['X-Content-Type-Options'] = 'nosniff'
         response['X-Frame-Options'] = 'DENY'
         response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
@@ -17,26 +45,18 @@ class SecurityHeadersMiddleware:
         return response
 
 
-class RequestLoggingMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+class RequestLoggingMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        request._logging_start = time.time()
 
-    def __call__(self, request):
-        start = time.time()
-        response = self.get_response(request)
-        duration = round((time.time() - start) * 1000)
+    def process_response(self, request, response):
+        duration = round((time.time() - getattr(request, '_logging_start', time.time())) * 1000)
         if request.path.startswith('/api/'):
             logger.info(f"{request.method} {request.path} {response.status_code} {duration}ms")
         return response
 
 
-class RateLimitMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        return self.get_response(request)
-
+class RateLimitMiddleware(MiddlewareMixin):
     def process_exception(self, request, exception):
         from django_ratelimit.exceptions import Ratelimited
         if isinstance(exception, Ratelimited):
@@ -24,6 +24,22 @@ def check_redis():
         return {'status': 'degraded', 'note': 'Redis offline — usando fallback síncrono'}
 
 
+def check_cache():
+    start = time.time()
+    try:
+        from django.core.cache import cache
+
+        from apps.core.cache import is_degraded
+
+        cache.set('status:ping', 1, 10)
+        ok = cache.get('status:ping') == 1
+        if ok and not is_degraded():
+            return {'status': 'operational', 'latency_ms': round((time.time() - start) * 1000)}
+    except Exception:
+        pass
+    return {'status': 'degraded', 'note': 'Cache Redis offline — usando cache local por processo'}
+
+
 def check_ai():
     from django.conf import settings
     if getattr(settings, 'ANTHROPIC_API_KEY', ''):
@@ -35,6 +51,7 @@ def get_system_status():
     components = {
         'API & Dashboard':    check_database(),
         'Background Workers': check_redis(),
+        'Cache':              check_cache(),
         'AI Engine':          check_ai(),
         'Test Execution':     {'status': 'operational'},
     }
@@ -5,3 +5,22 @@ class CoreTest(TestCase):
     def test_home_page(self):
         response = self.client.get('/')
         self.assertEqual(response.status_code, 200)
+
+
+class ResilientCacheTest(TestCase):
+    def test_falls_back_to_local_cache_while_redis_is_down(self):
+        from apps.core.cache import ResilientRedisCache, workspace_key
+
+        backend = ResilientRedisCache('redis://127.0.0.1:1/0', {
+            'KEY_PREFIX': 'spritetest',
+            'DEGRADED_RETRY_SECS': 60,
+            'OPTIONS': {'socket_connect_timeout': 0.2},
+        })
+        key = workspace_key('abc', 'dash', 'v')
+        self.assertEqual(key, 'ws:abc:dash:v')
+
+        self.assertTrue(backend.add(key, 1))
+        self.assertTrue(backend.degraded)
+        self.assertEqual(backend.incr(key), 2)
+        self.assertEqual(backend.get(key), 2)
+        self.assertIsNone(backend.get('missing'))
@@ -1,35 +1,39 @@
 from datetime import timedelta
 
-from django.db.models import Sum
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 
 from apps.testing.models import TestProject, TestRun
 
+from .models import WorkspaceDailyStats
 
-def get_runs_last_30_days(workspace):
-    end = timezone.now()
-    start = end - timedelta(days=30)
+
+def get_daily_stats(workspace, days=60):
+    """
+    Linhas do rollup diário dos últimos `days` dias, indexadas por data.
+    Uma única query — alimenta o gráfico de 30 dias e os cards de resumo.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = WorkspaceDailyStats.objects.filter(workspace=workspace, date__gte=since).values(
+        'date', 'runs', 'passed_runs', 'failed_runs', 'failed_cases',
+    )
+    return {row['date']: row for row in rows}
+
+
+def get_runs_last_30_days(workspace, daily=None):
+    if daily is None:
+        daily = get_daily_stats(workspace, days=30)
+    today = timezone.localdate()
     runs_by_day = []
-    for i in range(30):
-        day = start + timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        count = TestRun.objects.filter(
-            project__workspace=workspace,
-            created_at__gte=day_start,
-            created_at__lt=day_end,
-        ).count()
-        passed = TestRun.objects.filter(
-            project__workspace=workspace,
-            created_at__gte=day_start,
-            created_at__lt=day_end,
-            status='passed',
-        ).count()
+    for i in range(29, -1, -1):
+        day = today - timedelta(days=i)
+        row = daily.get(day, {})
         runs_by_day.append({
             'date': day.strftime('%d/%m'),
-            'total': count,
-            'passed': passed,
-            'failed': count - passed,
+            'total': row.get('runs', 0),
+            'passed': row.get('passed_runs', 0),
+            'failed': row.get('failed_runs', 0),
         })
     return runs_by_day
 
@@ -47,45 +51,55 @@ def get_pass_rate_trend(workspace):
 
 
 def get_top_failing_projects(workspace):
-    projects = TestProject.objects.filter(workspace=workspace, is_active=True)
-    result = []
-    for p in projects:
-        runs = TestRun.objects.filter(
-            project=p, status__in=['passed', 'failed']
-        ).order_by('-created_at')[:10]
-        if runs.exists():
-            avg_pass = sum(r.pass_rate for r in runs) / len(runs)
-            result.append({
-                'name': p.name,
-                'avg_pass_rate': round(avg_pass, 1),
-                'total_runs': runs.count(),
-            })
+    """Média de pass rate dos últimos 10 runs de cada projeto — uma query com ROW_NUMBER()."""
+    recent = TestRun.objects.filter(
+        project__workspace=workspace,
+        project__is_active=True,
+        status__in=['passed', 'failed'],
+    ).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('project_id')],
+            order_by=F('created_at').desc(),
+        ),
+    ).filter(position__lte=10).values('project_id', 'project__name', 'passed_cases', 'total_cases')
+
+    by_project = {}
+    for run in recent:
+        rate = round(run['passed_cases'] / run['total_cases'] * 100, 1) if run['total_cases'] else 0
+        by_project.setdefault(run['project_id'], (run['project__name'], []))[1].append(rate)
+
+    result = [
+        {
+            'name': name,
+            'avg_pass_rate': round(sum(rates) / len(rates), 1),
+            'total_runs': len(rates),
+        }
+        for name, rates in by_project.values()
+    ]
     return sorted(result, key=lambda x: x['avg_pass_rate'])[:5]
 
 
-def get_summary_stats(workspace):
-    total_runs = TestRun.objects.filter(project__workspace=workspace).count()
-    last_30 = TestRun.objects.filter(
-        project__workspace=workspace,
-        created_at__gte=timezone.now() - timedelta(days=30),
-    )
-    passed_30 = last_30.filter(status='passed').count()
-    total_30 = last_30.count()
+def get_summary_stats(workspace, daily=None):
+    if daily is None:
+        daily = get_daily_stats(workspace, days=60)
+    cutoff = timezone.localdate() - timedelta(days=29)
+
+    last_30 = [row for date, row in daily.items() if date >= cutoff]
+    prev_30 = [row for date, row in daily.items() if date < cutoff]
+
+    total_30 = sum(row['runs'] for row in last_30)
+    passed_30 = sum(row['passed_runs'] for row in last_30)
     pass_rate_30 = round(passed_30 / total_30 * 100) if total_30 > 0 else 0
 
-    prev_30 = TestRun.objects.filter(
-        project__workspace=workspace,
-        created_at__gte=timezone.now() - timedelta(days=60),
-        created_at__lt=timezone.now() - timedelta(days=30),
-    )
-    prev_total = prev_30.count()
-    prev_passed = prev_30.filter(status='passed').count()
+    prev_total = sum(row['runs'] for row in prev_30)
+    prev_passed = sum(row['passed_runs'] for row in prev_30)
     prev_rate = round(prev_passed / prev_total * 100) if prev_total > 0 else 0
     trend = pass_rate_30 - prev_rate
 
-    bugs_caught = last_30.aggregate(
-        total_failed=Sum('failed_cases')
-    )['total_failed'] or 0
+    total_runs = WorkspaceDailyStats.objects.filter(
+        workspace=workspace
+    ).aggregate(total=Sum('runs'))['total'] or 0
 
     return {
         'total_runs': total_runs,
@@ -95,5 +109,5 @@ def get_summary_stats(workspace):
         'total_projects': TestProject.objects.filter(
             workspace=workspace, is_active=True
         ).count(),
-        'bugs_caught': bugs_caught,
+        'bugs_caught': sum(row['failed_cases'] for row in last_30),
     }
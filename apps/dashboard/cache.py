@@ -0,0 +1,78 @@
+"""
+Cache do dashboard por workspace, com chaves versionadas.
+
+Cada workspace tem um número de versão em `ws:<id>:dash:v`; toda entrada é
+gravada sob a versão vigente. Um evento de escrita (run concluído, projeto ou
+membro alterado) só incrementa a versão — as entradas antigas deixam de ser
+endereçáveis na hora e expiram sozinhas pelo TTL.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.core.cache import workspace_key
+
+logger = logging.getLogger('spritetest.dashboard')
+
+HITS_KEY = 'dash:stats:hits'
+MISSES_KEY = 'dash:stats:misses'
+
+
+def _version_key(workspace_id):
+    return workspace_key(workspace_id, 'dash', 'v')
+
+
+def get_version(workspace_id) -> int:
+    version = cache.get(_version_key(workspace_id))
+    if version is None:
+        # Se a chave de versão foi despejada, recomeça de um valor maior que
+        # qualquer versão anterior — nunca reaponta para entradas antigas.
+        version = int(time.time() * 1000)
+        cache.add(_version_key(workspace_id), version, timeout=None)
+        version = cache.get(_version_key(workspace_id), version)
+    return version
+
+
+def invalidate_workspace(workspace_id) -> None:
+    try:
+        cache.incr(_version_key(workspace_id))
+    except ValueError:
+        get_version(workspace_id)
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def cached(workspace, name, compute, timeout=None):
+    """Retorna `compute()` do cache do workspace, calculando e gravando no miss."""
+    key = workspace_key(workspace.id, 'dash', get_version(workspace.id), name)
+    value = cache.get(key)
+    if value is not None:
+        _count(HITS_KEY)
+        return value
+    _count(MISSES_KEY)
+    value = compute()
+    cache.set(key, value, settings.DASHBOARD_CACHE_TTL if timeout is None else timeout)
+    return value
+
+
+def get_counters() -> dict:
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total * 100, 1) if total else 0,
+    }
+
+
+def reset_counters() -> None:
+    cache.delete_many([HITS_KEY, MISSES_KEY])
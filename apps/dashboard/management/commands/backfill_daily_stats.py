@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o rollup WorkspaceDailyStats a partir do histórico de TestRuns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workspace', help='Slug do workspace (padrão: todos)')
+
+    def handle(self, *args, **options):
+        from apps.dashboard.models import WorkspaceDailyStats
+        from apps.testing.models import TestRun
+
+        runs = TestRun.objects.filter(status__in=['passed', 'failed'])
+        stats = WorkspaceDailyStats.objects.all()
+        if options['workspace']:
+            runs = runs.filter(project__workspace__slug=options['workspace'])
+            stats = stats.filter(workspace__slug=options['workspace'])
+
+        rows = runs.annotate(day=TruncDate('created_at')).values(
+            'project__workspace_id', 'day',
+        ).annotate(
+            runs=Count('id'),
+            passed_runs=Count('id', filter=Q(status='passed')),
+            total=Sum('total_cases'),
+            failed=Sum('failed_cases'),
+        ).order_by()
+
+        with transaction.atomic():
+            stats.delete()
+            created = WorkspaceDailyStats.objects.bulk_create([
+                WorkspaceDailyStats(
+                    workspace_id=row['project__workspace_id'],
+                    date=row['day'],
+                    runs=row['runs'],
+                    passed_runs=row['passed_runs'],
+                    failed_runs=row['runs'] - row['passed_runs'],
+                    total_cases=row['total'] or 0,
+                    failed_cases=row['failed'] or 0,
+                )
+                for row in rows
+            ], batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} dias recalculados'))
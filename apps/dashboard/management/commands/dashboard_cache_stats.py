@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Mostra hits/misses do cache do dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zera os contadores depois de mostrar')
+
+    def handle(self, *args, **options):
+        from apps.dashboard.cache import get_counters, reset_counters
+
+        counters = get_counters()
+        self.stdout.write(
+            f"Hits: {counters['hits']}  Misses: {counters['misses']}  Hit rate: {counters['hit_rate']}%"
+        )
+        if options['reset']:
+            reset_counters()
+            self.stdout.write(self.style.SUCCESS('Contadores zerados'))
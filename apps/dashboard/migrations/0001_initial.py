@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('workspaces', '0005_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkspaceDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('passed_runs', models.PositiveIntegerField(default=0)),
+                ('failed_runs', models.PositiveIntegerField(default=0)),
+                ('total_cases', models.PositiveIntegerField(default=0)),
+                ('failed_cases', models.PositiveIntegerField(default=0)),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='workspaces.workspace')),
+            ],
+            options={
+                'verbose_name': 'Estatística diária',
+                'verbose_name_plural': 'Estatísticas diárias',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='workspacedailystats',
+            constraint=models.UniqueConstraint(fields=('workspace', 'date'), name='unique_workspace_daily_stats'),
+        ),
+    ]
@@ -1,3 +1,31 @@
 from django.db import models
 
-# Create your models here.
+
+class WorkspaceDailyStats(models.Model):
+    """
+    Rollup diário de runs concluídos por workspace (data local de criação do run).
+    Mantido incrementalmente pelo sinal run_completed; backfill via
+    `manage.py backfill_daily_stats`.
+    """
+    workspace = models.ForeignKey(
+        'workspaces.Workspace',
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+    )
+    date = models.DateField()
+    runs = models.PositiveIntegerField(default=0)
+    passed_runs = models.PositiveIntegerField(default=0)
+    failed_runs = models.PositiveIntegerField(default=0)
+    total_cases = models.PositiveIntegerField(default=0)
+    failed_cases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Estatística diária'
+        verbose_name_plural = 'Estatísticas diárias'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['workspace', 'date'], name='unique_workspace_daily_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.workspace_id} {self.date}: {self.passed_runs}/{self.runs}"
@@ -0,0 +1,84 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.testing.models import TestProject, TestRun
+from apps.testing.signals import run_completed
+from apps.workspaces.models import WorkspaceMembership
+
+from .cache import invalidate_workspace
+
+
+@receiver(run_completed)
+def update_daily_stats(sender, run, **kwargs):
+    """
+    Soma o run concluído no rollup do dia. Um único INSERT ... ON CONFLICT
+    (Postgres e SQLite) — atômico entre workers e sem leitura prévia. Só
+    runs passed/failed entram, como no backfill_daily_stats: um run fechado
+    como 'error' não tem resultado para contar.
+    """
+    from .models import WorkspaceDailyStats
+
+    if run.status not in ('passed', 'failed'):
+        return
+
+    opts = WorkspaceDailyStats._meta
+    table = connection.ops.quote_name(opts.db_table)
+    workspace_id = opts.get_field('workspace').target_field.get_db_prep_value(
+        run.project.workspace_id, connection,
+    )
+    passed = int(run.status == 'passed')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table}
+                (workspace_id, date, runs, passed_runs, failed_runs, total_cases, failed_cases)
+            VALUES (%s, %s, 1, %s, %s, %s, %s)
+            ON CONFLICT (workspace_id, date) DO UPDATE SET
+                runs = {table}.runs + 1,
+                passed_runs = {table}.passed_runs + EXCLUDED.passed_runs,
+                failed_runs = {table}.failed_runs + EXCLUDED.failed_runs,
+                total_cases = {table}.total_cases + EXCLUDED.total_cases,
+                failed_cases = {table}.failed_cases + EXCLUDED.failed_cases
+            """,
+            [
+                workspace_id,
+                timezone.localdate(run.created_at),
+                passed,
+                1 - passed,
+                run.total_cases,
+                run.failed_cases,
+            ],
+        )
+
+
+def _invalidate(workspace_id):
+    # Agora e de novo no commit: um leitor entre os dois veria dados ainda não
+    # commitados e os gravaria sob a versão nova.
+    invalidate_workspace(workspace_id)
+    transaction.on_commit(lambda: invalidate_workspace(workspace_id))
+
+
+@receiver(run_completed)
+def invalidate_on_run_completed(sender, run, **kwargs):
+    _invalidate(run.project.workspace_id)
+
+
+@receiver(post_save, sender=TestRun)
+def invalidate_on_run_created(sender, instance, created, **kwargs):
+    # Run novo muda "runs recentes" e o uso do mês antes mesmo de concluir
+    if created:
+        _invalidate(instance.project.workspace_id)
+
+
+@receiver(post_save, sender=TestProject)
+@receiver(post_delete, sender=TestProject)
+def invalidate_on_project_change(sender, instance, **kwargs):
+    _invalidate(instance.workspace_id)
+
+
+@receiver(post_save, sender=WorkspaceMembership)
+@receiver(post_delete, sender=WorkspaceMembership)
+def invalidate_on_membership_change(sender, instance, **kwargs):
+    _invalidate(instance.workspace_id)
@@ -1,3 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DailyStatsRollupTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+
+        self.user = User.objects.create_user(
+            username='stats', email='stats@test.com', password='STpass123!'
+        )
+        self.workspace = self.user.workspaces.first()
+        self.project = TestProject.objects.create(
+            workspace=self.workspace, created_by=self.user, name='S', base_url='https://example.com',
+        )
+
+    def _complete_run(self, outcomes):
+        from apps.testing.results import finalize_run
+        from apps.testing.services import materialize_run
+
+        run = materialize_run(self.project, self.user, [{'title': str(i)} for i in range(len(outcomes))])
+        cases = list(run.cases.all())
+        for case, outcome in zip(cases, outcomes):
+            case.status = outcome
+        finalize_run(run, cases, lambda r: '')
+        return run
+
+    def test_rollup_matches_backfill_and_dashboard_uses_it(self):
+        from apps.dashboard.analytics import get_daily_stats, get_summary_stats, get_top_failing_projects
+        from apps.dashboard.models import WorkspaceDailyStats
+
+        self._complete_run(['passed', 'passed'])
+        self._complete_run(['passed', 'failed', 'failed'])
+
+        row = WorkspaceDailyStats.objects.get(workspace=self.workspace)
+        self.assertEqual((row.runs, row.passed_runs, row.failed_runs, row.failed_cases), (2, 1, 1, 2))
+
+        incremental = list(WorkspaceDailyStats.objects.values('date', 'runs', 'passed_runs', 'failed_cases'))
+        call_command('backfill_daily_stats', stdout=open('/dev/null', 'w'))
+        self.assertEqual(
+            list(WorkspaceDailyStats.objects.values('date', 'runs', 'passed_runs', 'failed_cases')), incremental,
+        )
+
+        with self.assertNumQueries(3):
+            stats = get_summary_stats(self.workspace, get_daily_stats(self.workspace))
+        self.assertEqual((stats['runs_last_30'], stats['pass_rate_30'], stats['bugs_caught']), (2, 50, 2))
+
+        with self.assertNumQueries(1):
+            failing = get_top_failing_projects(self.workspace)
+        self.assertEqual(failing, [{'name': 'S', 'avg_pass_rate': 66.7, 'total_runs': 2}])
+
+
+    def test_error_runs_stay_out_of_rollup_and_backfill(self):
+        from apps.dashboard.models import WorkspaceDailyStats
+        from apps.testing.results import fail_run
+        from apps.testing.services import materialize_run
+
+        run = materialize_run(self.project, self.user, [{'title': 'x'}])
+        self.assertTrue(fail_run(run, 'worker caiu'))
+        # Já fechado: um segundo fechamento não anuncia de novo
+        self.assertFalse(fail_run(run, 'worker caiu'))
+        self.assertFalse(WorkspaceDailyStats.objects.exists())
+        call_command('backfill_daily_stats', stdout=open('/dev/null', 'w'))
+        self.assertFalse(WorkspaceDailyStats.objects.exists())
+
+
+class DashboardCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='dcache', email='dcache@test.com', password='DCpass123!'
+        )
+        self.workspace = self.user.workspaces.first()
+
+    def test_write_events_bump_version_and_counters_track_hits(self):
+        from apps.dashboard.cache import cached, get_counters
+        from apps.testing.models import TestProject
+        from apps.workspaces.quota import get_workspace_usage
+
+        def usage():
+            return cached(self.workspace, 'usage', lambda: get_workspace_usage(self.workspace))
+
+        self.assertEqual(usage()['total_projects'], 0)
+        with self.assertNumQueries(0):
+            usage()
+
+        TestProject.objects.create(
+            workspace=self.workspace, created_by=self.user, name='C', base_url='https://example.com',
+        )
+        self.assertEqual(usage()['total_projects'], 1)
+        self.assertEqual(get_counters(), {'hits': 1, 'misses': 2, 'hit_rate': 33.3})
+
+        self.user.onboarding_completed = True
+        self.user.save(update_fields=['onboarding_completed'])
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/dashboard/').status_code, 200)
+        self.assertEqual(self.client.get('/dashboard/').status_code, 200)
+        self.assertGreaterEqual(get_counters()['hits'], 4)
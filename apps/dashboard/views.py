@@ -4,11 +4,13 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 
 from apps.dashboard.analytics import (
+    get_daily_stats,
     get_pass_rate_trend,
     get_runs_last_30_days,
     get_summary_stats,
     get_top_failing_projects,
 )
+from apps.dashboard.cache import cached
 
 
 @login_required
@@ -34,14 +36,26 @@ def home(request):
         from apps.testing.models import TestRun
         from apps.workspaces.quota import get_workspace_usage
 
-        stats = get_summary_stats(workspace)
-        runs_chart = get_runs_last_30_days(workspace)
-        trend_chart = get_pass_rate_trend(workspace)
-        failing = get_top_failing_projects(workspace)
-        recent_runs = TestRun.objects.filter(
-            project__workspace=workspace
-        ).select_related('project').order_by('-created_at')[:8]
-        quota_usage = get_workspace_usage(workspace)
+        def charts():
+            daily = get_daily_stats(workspace, days=60)
+            return {
+                'stats': get_summary_stats(workspace, daily),
+                'runs_chart': get_runs_last_30_days(workspace, daily),
+                'trend_chart': get_pass_rate_trend(workspace),
+                'failing': get_top_failing_projects(workspace),
+            }
+
+        data = cached(workspace, 'charts', charts)
+        stats = data['stats']
+        runs_chart = data['runs_chart']
+        trend_chart = data['trend_chart']
+        failing = data['failing']
+        recent_runs = cached(workspace, 'recent_runs', lambda: list(
+            TestRun.objects.filter(
+                project__workspace=workspace
+            ).select_related('project').order_by('-created_at')[:8]
+        ))
+        quota_usage = cached(workspace, 'usage', lambda: get_workspace_usage(workspace))
         quota_limits = workspace.get_plan_limits()
 
     return render(request, 'dashboard/home.html', {
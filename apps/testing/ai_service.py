@@ -1,9 +1,15 @@
+import hashlib
 import json
 import logging
 import os
+import re
 
 logger = logging.getLogger(__name__)
 
+AI_MODEL = 'claude-sonnet-4-20250514'
+# Incrementar sempre que o prompt mudar — invalida todo o cache de geração
+PROMPT_VERSION = 2
+
 
 def _get_mock_test_cases(base_url, test_type):
     """Retorna casos de teste mock realistas quando não há API key."""
@@ -108,18 +114,177 @@ def _get_mock_test_cases(base_url, test_type):
     return cases
 
 
-def generate_test_cases(base_url, test_type, special_instructions=''):
+def _generation_cache_key(base_url, test_type, special_instructions, site_summary=''):
+    payload = json.dumps(
+        [base_url, test_type, special_instructions or '', site_summary or '', AI_MODEL, PROMPT_VERSION],
+    )
+    return f"ai:generation:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def invalidate_generation_cache(base_url, test_type, special_instructions='', site_summary=''):
+    from django.core.cache import cache
+
+    cache.delete(_generation_cache_key(base_url, test_type, special_instructions, site_summary))
+
+
+def _api_key():
+    return os.environ.get('ANTHROPIC_API_KEY', '').strip()
+
+
+class _CaseStreamParser:
+    """
+    Extrai os objetos de `test_cases` de um JSON que chega em pedaços.
+
+    Cada caso é devolvido assim que seu `}` de fechamento chega, então um
+    final truncado ou malformado não descarta os casos já completos.
+    """
+
+    _ARRAY_START = re.compile(r'"test_cases"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ''
+        self.done = False
+        self._pos = None
+        self._depth = 0
+        self._start = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        self.buffer += text
+        if self.done:
+            return []
+        if self._pos is None:
+            match = self._ARRAY_START.search(self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        found = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        case = json.loads(buf[self._start:i + 1])
+                    except json.JSONDecodeError as e:
+                        logger.warning("Caso malformado ignorado no stream: %s", e)
+                    else:
+                        if isinstance(case, dict):
+                            found.append(case)
+            elif ch == ']' and self._depth == 0:
+                self.done = True
+                i += 1
+                break
+            i += 1
+        self._pos = i
+        return found
+
+    def metadata(self):
+        """app_summary/test_strategy, mesmo que o JSON completo não seja válido."""
+        try:
+            data = json.loads(self.buffer)
+            return {key: data.get(key, '') for key in ('app_summary', 'test_strategy')}
+        except (json.JSONDecodeError, AttributeError):
+            pass
+        decoder = json.JSONDecoder()
+        meta = {}
+        for key in ('app_summary', 'test_strategy'):
+            match = re.search(rf'"{key}"\s*:\s*', self.buffer)
+            value = ''
+            if match:
+                try:
+                    value, _ = decoder.raw_decode(self.buffer, match.end())
+                except json.JSONDecodeError:
+                    pass
+            meta[key] = value if isinstance(value, str) else ''
+        return meta
+
+
+def _emit(cases, on_case):
+    if on_case is not None:
+        for index, case in enumerate(cases):
+            on_case(case, index)
+
+
+def _fallback_result(base_url, test_type, app_summary, model_used, on_case):
+    mock_cases = _get_mock_test_cases(base_url, test_type)
+    _emit(mock_cases, on_case)
+    return {
+        'test_cases': mock_cases,
+        'app_summary': app_summary,
+        'test_strategy': 'Fallback mock strategy.',
+        'model_used': model_used,
+    }
+
+
+def generate_for_project(project, regenerate=False, on_case=None):
+    """
+    Gera (ou reaproveita do cache) os casos de teste de um TestProject.
+
+    Com IA ativa, o site é rastreado antes (crawl em cache por projeto) e o
+    resumo de páginas/formulários vai no prompt — a chave de cache muda
+    quando o site muda.
+    """
+    site_summary = ''
+    if _api_key():
+        from .crawler import get_site_summary
+        site_summary = get_site_summary(project)
+
+    return generate_test_cases(
+        project.base_url,
+        project.test_type,
+        project.special_instructions,
+        use_cache=not regenerate,
+        site_summary=site_summary,
+        on_case=on_case,
+    )
+
+
+def generate_test_cases(base_url, test_type, special_instructions='', use_cache=True, site_summary='',
+                        on_case=None):
     """
     Gera casos de teste usando IA (Claude) ou retorna mock.
 
+    A resposta da IA é lida em streaming: cada caso é parseado assim que fica
+    completo e entregue a `on_case(case, index)`, se informado (mock e cache
+    também passam pelo callback). Se o stream quebrar no meio, os casos já
+    recebidos são mantidos; só sem nenhum caso cai no mock.
+
+    Respostas reais e completas ficam em cache, endereçadas pelo hash de
+    (base_url, test_type, special_instructions, site_summary, modelo, versão do prompt).
+    `use_cache=False` força uma nova geração e sobrescreve a entrada.
+    `site_summary` é o resumo do crawler; quando presente, a IA só gera casos
+    para páginas e formulários que existem de fato.
+
     Returns:
         dict com keys: test_cases (list), app_summary (str), test_strategy (str)
     """
-    api_key = os.environ.get('ANTHROPIC_API_KEY', '').strip()
+    from django.conf import settings
+    from django.core.cache import cache
+
+    api_key = _api_key()
 
     if not api_key:
         logger.info("ANTHROPIC_API_KEY not set — using mock test cases.")
         mock_cases = _get_mock_test_cases(base_url, test_type)
+        _emit(mock_cases, on_case)
         return {
             'test_cases': mock_cases,
             'app_summary': f'Mock analysis of {base_url} — running in demo mode without AI.',
@@ -127,6 +292,17 @@ def generate_test_cases(base_url, test_type, special_instructions=''):
             'model_used': 'mock',
         }
 
+    cache_key = _generation_cache_key(base_url, test_type, special_instructions, site_summary)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("AI generation cache hit: %s", base_url)
+            _emit(cached['test_cases'], on_case)
+            return cached
+
+    parser = _CaseStreamParser()
+    test_cases = []
+
     # Real AI call
     try:
         from anthropic import Anthropic
@@ -140,8 +316,16 @@ def generate_test_cases(base_url, test_type, special_instructions=''):
         if special_instructions:
             extra = f'\n\nAdditional instructions from the user:\n{special_instructions}'
 
-        message = client.messages.create(
-            model='claude-sonnet-4-20250514',
+        site_context = ''
+        if site_summary:
+            site_context = (
+                f'\n\nPages and forms found by crawling the application:\n{site_summary}\n'
+                f'Only write test cases for pages, forms and fields listed above, using '
+                f'their real paths and field names in the steps.'
+            )
+
+        with client.messages.stream(
+            model=AI_MODEL,
             max_tokens=4096,
             system=(
                 'You are a senior QA engineer. Generate test cases in pure JSON format. '
@@ -158,39 +342,42 @@ def generate_test_cases(base_url, test_type, special_instructions=''):
                         f'application at: {base_url}\n\n'
                         f'Cover these categories: Navigation, Authentication, Forms, UI, Performance.\n'
                         f'Each test case must have: title, description, category, '
-                        f'and detailed steps (list of strings).{extra}'
+                        f'and detailed steps (list of strings).{site_context}{extra}'
                     ),
                 }
             ],
-        )
-
-        raw = message.content[0].text
-        data = json.loads(raw)
-
-        return {
-            'test_cases': data.get('test_cases', []),
-            'app_summary': data.get('app_summary', ''),
-            'test_strategy': data.get('test_strategy', ''),
-            'model_used': 'claude-sonnet-4-20250514',
-        }
-
-    except json.JSONDecodeError as e:
-        logger.error("Failed to parse AI response as JSON: %s", e)
-        mock_cases = _get_mock_test_cases(base_url, test_type)
-        return {
-            'test_cases': mock_cases,
-            'app_summary': f'AI returned invalid JSON — falling back to mock cases for {base_url}.',
-            'test_strategy': 'Fallback mock strategy.',
-            'model_used': 'mock (json error fallback)',
-        }
+        ) as stream:
+            for text in stream.text_stream:
+                for case in parser.feed(text):
+                    if on_case is not None:
+                        on_case(case, len(test_cases))
+                    test_cases.append(case)
 
     except Exception as e:
         error_type = type(e).__name__
         logger.error("AI service error (%s): %s", error_type, e)
-        mock_cases = _get_mock_test_cases(base_url, test_type)
-        return {
-            'test_cases': mock_cases,
-            'app_summary': f'AI error ({error_type}) — falling back to mock cases for {base_url}.',
-            'test_strategy': 'Fallback mock strategy.',
-            'model_used': f'mock ({error_type} fallback)',
-        }
+        if not test_cases:
+            return _fallback_result(
+                base_url, test_type,
+                f'AI error ({error_type}) — falling back to mock cases for {base_url}.',
+                f'mock ({error_type} fallback)', on_case,
+            )
+
+    if not test_cases:
+        logger.error("AI response had no parseable test cases")
+        return _fallback_result(
+            base_url, test_type,
+            f'AI returned invalid JSON — falling back to mock cases for {base_url}.',
+            'mock (json error fallback)', on_case,
+        )
+
+    result = {
+        'test_cases': test_cases,
+        **parser.metadata(),
+        'model_used': AI_MODEL,
+    }
+    if parser.done:
+        cache.set(cache_key, result, settings.AI_GENERATION_CACHE_TTL)
+    else:
+        logger.warning("AI stream incompleto — mantendo %s casos já recebidos", len(test_cases))
+    return result
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TestingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.testing'
+
+    def ready(self):
+        import apps.testing.signals  # noqa: F401
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger('spritetest.playwright')
+
+try:
+    import psutil
+except ImportError:  # está no requirements; sem ele a reciclagem por memória fica desligada
+    psutil = None
+
+
+class _PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.runs = 0
+
+
+class BrowserPool:
+    """
+    Pool de browsers Chromium quentes, um por processo de worker Celery.
+
+    Os browsers vivem num event loop dedicado (thread própria), então sobrevivem
+    entre tasks. Cada run faz lease de um browser e cria contexts novos e isolados
+    nele. Browsers são reciclados após `max_runs` runs, quando falham no health
+    check ou quando a memória dos processos filhos cresce além do limite.
+    """
+
+    def __init__(self, size=1, max_runs=50, max_rss_growth_mb=0):
+        self.size = max(1, size)
+        self.max_runs = max_runs
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._idle = None
+        self._browsers = []
+        self._rss_baseline = None
+
+    @property
+    def started(self):
+        return self._loop is not None
+
+    def start(self):
+        if self.started:
+            return
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name='browser-pool', daemon=True)
+        thread.start()
+        self._loop, self._thread = loop, thread
+        try:
+            self.run(self._start())
+        except Exception:
+            self.shutdown()
+            raise
+        logger.info("Browser pool iniciado: %s browser(s)", self.size)
+
+    def run(self, coro, timeout=None):
+        """
+        Executa uma coroutine no loop do pool e bloqueia até o resultado. Se a
+        espera acabar (timeout, soft time limit do Celery...), a coroutine é
+        cancelada no loop — o browser não fica preso a um run abandonado.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def shutdown(self):
+        if not self.started:
+            return
+        try:
+            self.run(self._stop(), timeout=30)
+        except Exception as e:
+            logger.warning("Erro ao encerrar browser pool: %s", e)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = self._thread = None
+        logger.info("Browser pool encerrado")
+
+    async def _start(self):
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._launch())
+        self._rss_baseline = _children_rss_mb()
+        if self.max_rss_growth_mb and self._rss_baseline is None:
+            logger.warning("psutil indisponível — reciclagem por memória desligada")
+
+    async def _stop(self):
+        for pooled in list(self._browsers):
+            try:
+                await pooled.browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self):
+        browser = await self._playwright.chromium.launch(headless=True)
+        pooled = _PooledBrowser(browser)
+        self._browsers.append(pooled)
+        return pooled
+
+    async def _replace(self, pooled, reason):
+        logger.info("Reciclando browser (%s) após %s runs", reason, pooled.runs)
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+        return await self._launch()
+
+    async def _healthy(self, pooled):
+        if not pooled.browser.is_connected():
+            return False
+        try:
+            context = await pooled.browser.new_context()
+            await context.close()
+            return True
+        except Exception:
+            return False
+
+    def _recycle_reason(self, pooled):
+        if self.max_runs and pooled.runs >= self.max_runs:
+            return f'limite de {self.max_runs} runs'
+        if self.max_rss_growth_mb and self._rss_baseline is not None:
+            rss = _children_rss_mb()
+            if rss is not None and rss - self._rss_baseline > self.max_rss_growth_mb:
+                return f'memória cresceu para {rss:.0f}MB'
+        return ''
+
+    @asynccontextmanager
+    async def lease(self):
+        """Empresta um browser saudável; devolve (ou recicla) ao final do run."""
+        pooled = await self._idle.get()
+        try:
+            if not await self._healthy(pooled):
+                pooled = await self._replace(pooled, 'health check falhou')
+            yield pooled.browser
+        finally:
+            pooled.runs += 1
+            reason = self._recycle_reason(pooled)
+            if reason:
+                try:
+                    pooled = await self._replace(pooled, reason)
+                except Exception as e:
+                    logger.warning("Falha ao reciclar browser: %s", e)
+            self._idle.put_nowait(pooled)
+
+
+def _children_rss_mb():
+    if psutil is None:
+        return None
+    try:
+        children = psutil.Process().children(recursive=True)
+        return sum(child.memory_info().rss for child in children) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+_pool = None
+# Ligado no worker_process_init: só processos filhos do worker têm pool
+_enabled = False
+_start_lock = threading.Lock()
+
+
+def enable_pool():
+    """
+    Marca o processo como worker. O pool não sobe aqui: lançar o Chromium no
+    worker_process_init pode passar do worker_proc_alive_timeout do Celery
+    e o filho é morto e recriado em loop — ele sobe no primeiro get_pool().
+    """
+    global _enabled
+    _enabled = True
+
+
+def get_pool():
+    """
+    Retorna o pool do processo atual, iniciando-o na primeira chamada dentro
+    de um worker. None fora do worker (ex: web) ou se o pool não subiu.
+    """
+    if _pool is not None and _pool.started:
+        return _pool
+    if not _enabled:
+        return None
+    return start_pool()
+
+
+def start_pool():
+    global _pool
+    from django.conf import settings
+
+    if not settings.PLAYWRIGHT_POOL_SIZE:
+        return None
+    with _start_lock:
+        if _pool is not None and _pool.started:
+            return _pool
+        logger.info("Iniciando browser pool no processo %s (primeira execução)", os.getpid())
+        pool = BrowserPool(
+            size=settings.PLAYWRIGHT_POOL_SIZE,
+            max_runs=settings.PLAYWRIGHT_POOL_MAX_RUNS,
+            max_rss_growth_mb=settings.PLAYWRIGHT_POOL_MAX_RSS_GROWTH_MB,
+        )
+        try:
+            pool.start()
+        except Exception as e:
+            logger.warning("Browser pool indisponível (%s) — runs vão lançar Chromium sob demanda", e)
+            return None
+        _pool = pool
+        return pool
+
+
+def shutdown_pool():
+    global _pool, _enabled
+    _enabled = False
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
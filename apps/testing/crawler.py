@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import httpx
+
+logger = logging.getLogger('spritetest.crawler')
+
+_USER_AGENT = 'SpriteTest/1.0 Crawler'
+_SITEMAP_LOC = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+
+
+class _PageParser(HTMLParser):
+    """Extrai título, links, formulários e inputs de uma página HTML."""
+
+    def __init__(self):
+        super().__init__()
+        self.title = ''
+        self.links = []
+        self.forms = []
+        self.inputs = []
+        self._in_title = False
+        self._form = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'title':
+            self._in_title = True
+        elif tag == 'a' and attrs.get('href'):
+            self.links.append(attrs['href'])
+        elif tag == 'form':
+            self._form = {
+                'action': attrs.get('action') or '',
+                'method': (attrs.get('method') or 'get').upper(),
+                'inputs': [],
+            }
+            self.forms.append(self._form)
+        elif tag in ('input', 'textarea', 'select'):
+            kind = attrs.get('type') or ('text' if tag == 'input' else tag)
+            if kind in ('hidden', 'submit', 'button'):
+                return
+            name = attrs.get('name') or attrs.get('id') or attrs.get('placeholder') or '?'
+            field = f"{name}({kind})"
+            (self._form['inputs'] if self._form is not None else self.inputs).append(field)
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        elif tag == 'form':
+            self._form = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+
+def _same_origin(url, base_url):
+    return urlparse(url).netloc == urlparse(base_url).netloc
+
+
+def parse_page(url, html, base_url):
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+
+    links = []
+    for href in parser.links:
+        absolute = urldefrag(urljoin(url, href))[0]
+        if absolute.startswith('http') and _same_origin(absolute, base_url) and absolute not in links:
+            links.append(absolute)
+
+    return {
+        'url': url,
+        'title': ' '.join(parser.title.split())[:80],
+        'links': links[:50],
+        'forms': parser.forms,
+        'inputs': parser.inputs,
+    }
+
+
+async def _fetch(client, url, base_url, previous):
+    """GET condicional: reaproveita a entrada anterior quando o servidor responde 304."""
+    headers = {}
+    if previous:
+        if previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous.get('last_modified'):
+            headers['If-Modified-Since'] = previous['last_modified']
+
+    response = await client.get(url, headers=headers)
+    if response.status_code == 304 and previous:
+        return previous
+    if response.status_code >= 400 or 'html' not in response.headers.get('content-type', ''):
+        return None
+    return {
+        'etag': response.headers.get('etag', ''),
+        'last_modified': response.headers.get('last-modified', ''),
+        'page': parse_page(str(response.url), response.text, base_url),
+    }
+
+
+async def _fetch_sitemap(client, base_url):
+    try:
+        response = await client.get(urljoin(base_url, '/sitemap.xml'))
+    except httpx.HTTPError:
+        return []
+    if response.status_code != 200:
+        return []
+    return [u for u in _SITEMAP_LOC.findall(response.text) if _same_origin(u, base_url)]
+
+
+async def crawl(base_url, previous_entries=None, max_pages=8, concurrency=4, timeout=5.0, transport=None):
+    """
+    Crawl raso do site: página inicial + sitemap + links internos, até
+    `max_pages` páginas, com no máximo `concurrency` requests simultâneos.
+
+    Returns:
+        dict {url: {'etag', 'last_modified', 'page'}} — vazio se a página inicial falhar.
+    """
+    previous_entries = previous_entries or {}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async with httpx.AsyncClient(
+        timeout=timeout,
+        follow_redirects=True,
+        headers={'User-Agent': _USER_AGENT},
+        transport=transport,
+    ) as client:
+
+        async def fetch(url):
+            async with semaphore:
+                try:
+                    return url, await _fetch(client, url, base_url, previous_entries.get(url))
+                except httpx.HTTPError as e:
+                    logger.info("Crawl falhou em %s: %s", url, e)
+                    return url, None
+
+        _, root = await fetch(base_url)
+        if root is None:
+            return {}
+
+        candidates = []
+        for url in root['page']['links'] + await _fetch_sitemap(client, base_url):
+            if url != base_url and url not in candidates:
+                candidates.append(url)
+        fetched = await asyncio.gather(*(fetch(url) for url in candidates[:max_pages - 1]))
+
+    entries = {base_url: root}
+    entries.update({url: entry for url, entry in fetched if entry})
+    return entries
+
+
+def summarize(entries, max_chars=2500):
+    """Resumo compacto (texto) das páginas e formulários encontrados, para o prompt."""
+    pages, forms, loose = [], [], []
+    for url, entry in entries.items():
+        page = entry['page']
+        path = urlparse(url).path or '/'
+        pages.append(f"- {path}" + (f" — {page['title']}" if page['title'] else ''))
+        for form in page['forms']:
+            action = urlparse(urljoin(url, form['action'])).path or path
+            fields = ', '.join(form['inputs']) or 'sem campos'
+            forms.append(f"- {path}: {form['method']} {action} [{fields}]")
+        if page['inputs']:
+            loose.append(f"- {path}: {', '.join(page['inputs'])}")
+
+    lines = [f"Pages ({len(pages)}):", *pages]
+    lines += ['Forms:', *forms] if forms else ['Forms: none found']
+    if loose:
+        lines += ['Inputs outside forms:', *loose]
+    return '\n'.join(lines)[:max_chars]
+
+
+def get_site_summary(project) -> str:
+    """
+    Resumo do site do projeto, com cache por projeto. Dentro da janela de
+    frescor não há requests; depois dela o crawl revalida cada página com
+    ETag/Last-Modified. Retorna '' se o crawl estiver desligado ou falhar.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    from .executor import _is_local_url
+
+    if not settings.SITE_CRAWL_ENABLED or _is_local_url(project.base_url):
+        return ''
+
+    cache_key = f"crawl:{project.id}"
+    cached = cache.get(cache_key) or {}
+    if cached.get('fresh_until', 0) > time.time():
+        return cached['summary']
+
+    try:
+        entries = asyncio.run(crawl(
+            project.base_url,
+            previous_entries=cached.get('entries'),
+            max_pages=settings.SITE_CRAWL_MAX_PAGES,
+            concurrency=settings.SITE_CRAWL_CONCURRENCY,
+        ))
+    except Exception as e:
+        logger.warning("Crawl de %s falhou: %s", project.base_url, e)
+        entries = {}
+
+    if not entries:
+        return cached.get('summary', '')
+
+    summary = summarize(entries)
+    cache.set(cache_key, {
+        'entries': entries,
+        'summary': summary,
+        'fresh_until': time.time() + settings.SITE_CRAWL_FRESH_SECS,
+    }, settings.SITE_CRAWL_CACHE_TTL)
+    return summary
@@ -0,0 +1,311 @@
+import asyncio
+import json
+import logging
+import threading
+
+logger = logging.getLogger('spritetest.events')
+
+CHANNEL_PREFIX = 'spritetest:run:'
+TERMINAL_STATUSES = ('passed', 'failed', 'error')
+
+_client = None
+_lock = threading.Lock()
+
+
+def _redis_url():
+    from django.conf import settings
+
+    return settings.EVENTS_REDIS_URL
+
+
+def _get_client():
+    """Client Redis síncrono compartilhado pelo processo (publish)."""
+    global _client
+    if _client is None:
+        import redis
+
+        with _lock:
+            if _client is None:
+                _client = redis.Redis.from_url(_redis_url(), socket_connect_timeout=0.5, socket_timeout=0.5)
+    return _client
+
+
+def status_payload(run) -> dict:
+    """Snapshot do status de um run — mesmo formato no status, long-poll e SSE."""
+    return {
+        'run_id': str(run.id),
+        'status': run.status,
+        'pass_rate': run.pass_rate,
+        'total': run.total_cases,
+        'passed': run.passed_cases,
+        'failed': run.failed_cases,
+    }
+
+
+def publish(run_id, event: dict) -> bool:
+    """
+    Publica um evento do run no Redis. Sem Redis configurado (dev/testes) ou
+    com Redis fora do ar é um no-op — quem espera cai no polling do banco.
+    """
+    if not _redis_url():
+        return False
+    try:
+        _get_client().publish(f"{CHANNEL_PREFIX}{run_id}", json.dumps(event, default=str))
+    except Exception as e:
+        logger.debug("Publish de evento do run %s falhou: %s", run_id, e)
+        return False
+    return True
+
+
+def publish_run_status(run) -> bool:
+    return publish(run.id, {'type': 'status', **status_payload(run)})
+
+
+def _progress_key(run_id):
+    return f"run-progress:{run_id}"
+
+
+class RunProgress:
+    """
+    Progresso de um run em execução, caso a caso. Cada caso concluído vira um
+    evento 'case' e o acumulado fica no cache para quem abre a página no meio
+    da execução. Sem ORM — pode ser usado dentro do event loop do Playwright.
+    """
+
+    def __init__(self, run_id, total):
+        self.run_id = str(run_id)
+        self.total = total
+        self.cases = {}
+        self.passed = 0
+        self.failed = 0
+
+    def case_done(self, case_id, status, duration_ms=0, error='') -> dict:
+        from django.core.cache import cache
+
+        status = 'passed' if status == 'passed' else 'failed'
+        if status == 'passed':
+            self.passed += 1
+        else:
+            self.failed += 1
+        self.cases[str(case_id)] = {'status': status, 'duration_ms': duration_ms, 'error': error[:300]}
+        event = self._event(str(case_id))
+        try:
+            cache.set(_progress_key(self.run_id), self.cases, 60 * 60)
+        except Exception as e:
+            logger.debug("Progresso do run %s não foi para o cache: %s", self.run_id, e)
+        publish(self.run_id, {'type': 'case', **event})
+        return event
+
+    def _event(self, case_id):
+        return {
+            'case_id': case_id,
+            **self.cases[case_id],
+            'done': len(self.cases),
+            'total': self.total,
+            'passed': self.passed,
+            'failed': self.failed,
+        }
+
+    @classmethod
+    async def aload(cls, run_id, total):
+        """Progresso já publicado do run (eventos 'case' para replay na conexão)."""
+        from django.core.cache import cache
+
+        progress = cls(run_id, total)
+        for case_id, case in (await cache.aget(_progress_key(run_id)) or {}).items():
+            progress.cases[case_id] = case
+            if case['status'] == 'passed':
+                progress.passed += 1
+            else:
+                progress.failed += 1
+        return [progress._event(case_id) for case_id in progress.cases]
+
+
+async def load_status(run_id, workspace):
+    """Status atual do run no workspace (ou None) — uma query leve."""
+    from .models import TestRun
+
+    run = await TestRun.objects.filter(id=run_id, project__workspace=workspace).only(
+        'id', 'status', 'total_cases', 'passed_cases', 'failed_cases',
+    ).afirst()
+    return status_payload(run) if run else None
+
+
+class _Hub:
+    """
+    Uma assinatura Redis (PSUBSCRIBE) por processo/event loop, repassada para
+    filas asyncio locais. Mil conexões esperando o mesmo run custam uma
+    conexão Redis e nenhuma query.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.waiters = {}
+        self.task = None
+
+    def add(self, run_id):
+        queue = asyncio.Queue(maxsize=100)
+        self.waiters.setdefault(str(run_id), set()).add(queue)
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self._reader())
+        return queue
+
+    def remove(self, run_id, queue):
+        queues = self.waiters.get(str(run_id))
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.waiters[str(run_id)]
+
+    def _deliver(self, run_id, event):
+        for queue in self.waiters.get(run_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+    async def _reader(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(_redis_url())
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            async for message in pubsub.listen():
+                channel = message['channel'].decode()
+                run_id = channel[len(CHANNEL_PREFIX):]
+                if run_id in self.waiters:
+                    self._deliver(run_id, json.loads(message['data']))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Assinatura de eventos caiu: %s", e)
+            # Acorda todo mundo para reler o banco; o próximo add() reconecta
+            for run_id in list(self.waiters):
+                self._deliver(run_id, None)
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_hub = None
+
+
+def _get_hub():
+    global _hub
+    loop = asyncio.get_running_loop()
+    if _hub is None or _hub.loop is not loop:
+        _hub = _Hub(loop)
+    return _hub
+
+
+class Subscription:
+    """
+    Eventos de um run para uma view async. `get(timeout)` devolve o próximo
+    evento ou None quando o tempo acaba — nesse caso quem chama relê o estado
+    do banco. Sem Redis, get() só espera EVENTS_POLL_SECS (polling).
+
+        async with Subscription(run_id) as events:
+            event = await events.get(15)
+    """
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.hub = None
+        self.queue = None
+
+    async def __aenter__(self):
+        if _redis_url():
+            self.hub = _get_hub()
+            self.queue = self.hub.add(self.run_id)
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.queue is not None:
+            self.hub.remove(self.run_id, self.queue)
+
+    async def get(self, timeout):
+        if self.queue is None:
+            from django.conf import settings
+
+            await asyncio.sleep(min(timeout, settings.EVENTS_POLL_SECS))
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def _sse(event, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _event_data(event):
+    return {key: value for key, value in event.items() if key != 'type'}
+
+
+async def wait_for_status_change(run_id, workspace, payload, since_status, wait):
+    """
+    Long-poll: espera até `wait` segundos o status sair de `since_status`.
+    Retorna o status do momento em que acordou (ou do fim da espera).
+    """
+    from django.conf import settings
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    async with Subscription(run_id) as events:
+        while payload['status'] == since_status:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            event = await events.get(min(remaining, settings.EVENTS_HEARTBEAT_SECS))
+            if event and event.get('type') == 'status':
+                payload = _event_data(event)
+            elif event is None:
+                payload = await load_status(run_id, workspace) or payload
+    return payload
+
+
+async def event_stream(run_id, workspace, payload):
+    """
+    Gerador SSE: `status` no início e a cada mudança, `case` a cada caso
+    concluído (com replay do progresso já feito) e `end` quando o run termina.
+    """
+    from django.conf import settings
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.EVENTS_STREAM_MAX_SECS
+    async with Subscription(run_id) as events:
+        yield _sse('status', payload)
+        if payload['status'] == 'running':
+            for case in await RunProgress.aload(run_id, payload['total']):
+                yield _sse('case', case)
+        while payload['status'] not in TERMINAL_STATUSES and loop.time() < deadline:
+            event = await events.get(settings.EVENTS_HEARTBEAT_SECS)
+            if event is not None:
+                kind = event.get('type', 'status')
+                if kind == 'status':
+                    payload = _event_data(event)
+                yield _sse(kind, _event_data(event))
+                continue
+            # Sem evento (timeout ou sem Redis): confere o banco e mantém a conexão viva
+            fresh = await load_status(run_id, workspace)
+            if fresh is None:
+                break
+            if fresh != payload:
+                payload = fresh
+                yield _sse('status', payload)
+            else:
+                yield ': keepalive\n\n'
+    yield _sse('end', payload)
+
+
+def stream_response(run_id, workspace, payload):
+    from django.http import StreamingHttpResponse
+
+    response = StreamingHttpResponse(
+        event_stream(run_id, workspace, payload), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
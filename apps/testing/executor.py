@@ -63,52 +63,107 @@ _FIX_SUGGESTIONS = {
 }
 
 
+def _is_local_url(url) -> bool:
+    from urllib.parse import urlparse
+
+    hostname = urlparse(url).hostname or ''
+    return (
+        hostname in ('localhost', '127.0.0.1', '0.0.0.0')
+        or hostname.endswith('.local')
+    )
+
+
 def run_test_execution_smart(test_run) -> None:
     """
     Escolhe executor baseado em disponibilidade do Playwright.
     Real: se URL é acessível externamente.
     Mock: se URL é localhost ou Playwright indisponível.
+
+    Só executa com o lease do run (apps.testing.lease) — chamadas repetidas
+    para um run concluído ou já em execução não fazem nada.
     """
-    from urllib.parse import urlparse
+    from .lease import leased_runs, new_owner
 
-    url = test_run.project.base_url
-    parsed = urlparse(url)
-    hostname = parsed.hostname or ''
+    owner = new_owner()
+    with leased_runs([test_run], owner) as leased:
+        if leased:
+            _execute(test_run, owner)
 
-    is_local = (
-        hostname in ('localhost', '127.0.0.1', '0.0.0.0')
-        or hostname.endswith('.local')
-    )
 
-    if is_local:
+def _execute(test_run, owner=None) -> None:
+    url = test_run.project.base_url
+
+    if _is_local_url(url):
         logger.info(f"URL local detectada ({url}) — usando executor mock")
-        simulate_test_execution(test_run)
+        simulate_test_execution(test_run, owner)
         return
 
     try:
         from apps.testing.playwright_runner import run_playwright_sync
         logger.info(f"URL externa ({url}) — usando Playwright real")
-        run_playwright_sync(test_run)
+        run_playwright_sync(test_run, owner)
     except Exception as e:
         logger.warning(f"Playwright falhou ({e}) — fallback para mock")
-        simulate_test_execution(test_run)
+        simulate_test_execution(test_run, owner)
+
+
+def run_test_executions_smart(test_runs) -> None:
+    """
+    Versão em lote de run_test_execution_smart: os runs externos rodam juntos
+    no mesmo event loop/browser; locais (ou que falharem no Playwright) usam
+    mock. Cada run só executa com o seu lease, como no caminho de um run só.
+    """
+    from .lease import leased_runs, new_owner
+
+    owner = new_owner()
+    with leased_runs(test_runs, owner) as leased:
+        _execute_many(leased, owner)
+
 
+def _execute_many(test_runs, owner=None) -> None:
+    external = []
+    for test_run in test_runs:
+        if _is_local_url(test_run.project.base_url):
+            simulate_test_execution(test_run, owner)
+        else:
+            external.append(test_run)
+
+    if not external:
+        return
+
+    try:
+        from apps.testing.playwright_runner import run_playwright_many
+        logger.info(f"Playwright em lote: {len(external)} runs")
+        failures = run_playwright_many(external, owner)
+    except Exception as e:
+        failures = {str(r.id): e for r in external}
 
-def simulate_test_execution(test_run):
+    for test_run in external:
+        error = failures.get(str(test_run.id))
+        if error is not None:
+            logger.warning(f"Playwright falhou ({error}) — fallback para mock: run={test_run.id}")
+            simulate_test_execution(test_run, owner)
+
+
+def simulate_test_execution(test_run, owner=None):
     """
-    Simula a execução de todos os TestCases de um TestRun.
+    Simula a execução dos TestCases de um TestRun que ainda não terminaram.
     80% chance de passed, 20% chance de failed com erro realista.
+    `owner` é o dono do lease — o fechamento só vale se ainda for dele.
     """
-    test_run.status = 'running'
-    test_run.started_at = timezone.now()
-    test_run.save(update_fields=['status', 'started_at'])
+    from .events import RunProgress
+    from .results import FINISHED_CASE_STATUSES, finalize_run
 
-    cases = list(test_run.cases.all())
+    if test_run.status != 'running' or test_run.started_at is None:
+        test_run.status = 'running'
+        test_run.started_at = test_run.started_at or timezone.now()
+        test_run.save(update_fields=['status', 'started_at'])
 
-    for case in cases:
-        case.status = 'running'
-        case.save(update_fields=['status'])
+    cases = list(test_run.cases.all())
+    remaining = [case for case in cases if case.status not in FINISHED_CASE_STATUSES]
+    progress = RunProgress(test_run.id, len(remaining))
 
+    for case in remaining:
         # Simulate execution time (50-800ms)
         case.duration_ms = random.randint(50, 800)
 
@@ -121,43 +176,20 @@ def simulate_test_execution(test_run):
             fixes = _FIX_SUGGESTIONS.get(category, _FIX_SUGGESTIONS['UI'])
             case.error_message = random.choice(errors)
             case.ai_fix_suggestion = random.choice(fixes)
+        progress.case_done(case.id, case.status, case.duration_ms, case.error_message)
 
-        case.save(update_fields=['status', 'duration_ms', 'error_message', 'ai_fix_suggestion'])
-
-    # Recalculate summary
-    test_run.recalculate_summary()
-    test_run.refresh_from_db()
-
-    # Final status
-    if test_run.failed_cases == 0:
-        test_run.status = 'passed'
-    else:
-        test_run.status = 'failed'
+    finalize_run(test_run, cases, _simulation_summary, owner=owner)
+    return test_run
 
-    test_run.completed_at = timezone.now()
-    if test_run.started_at:
-        test_run.duration_secs = (test_run.completed_at - test_run.started_at).total_seconds()
 
-    test_run.ai_summary = (
+def _simulation_summary(test_run) -> str:
+    summary = (
         f"Executed {test_run.total_cases} test cases. "
         f"{test_run.passed_cases} passed, {test_run.failed_cases} failed. "
         f"Pass rate: {test_run.pass_rate}%. "
     )
     if test_run.failed_cases > 0:
-        test_run.ai_summary += "Review failed cases for AI fix suggestions."
+        summary += "Review failed cases for AI fix suggestions."
     else:
-        test_run.ai_summary += "All tests passed successfully."
-
-    test_run.save(update_fields=[
-        'status', 'completed_at', 'duration_secs', 'ai_summary',
-    ])
-
-    logger.info("TestRun %s completed: %s (pass rate: %s%%)", test_run.id, test_run.status, test_run.pass_rate)
-
-    try:
-        from apps.workspaces.notifications import send_run_notifications
-        send_run_notifications(test_run)
-    except Exception as e:
-        logging.getLogger('spritetest').warning(f"Notification failed: {e}")
-
-    return test_run
+        summary += "All tests passed successfully."
+    return summary
@@ -0,0 +1,187 @@
+"""
+Lease de execução por TestRun. Só quem tem o lease executa o run: ele é
+pego num UPDATE condicional (run não terminal e sem dono, ou com heartbeat
+vencido) e renovado por uma thread de heartbeat enquanto os casos rodam.
+Cliques repetidos, retries do Celery e dois workers com o mesmo run viram
+no-op; se o worker morrer, o lease expira em RUN_LEASE_TTL_SECS e o reaper
+(reap_stale_runs, no beat) reenfileira o run — a retomada pula os casos já
+gravados pelo checkpoint.
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger('spritetest.lease')
+
+# Status em que um run ainda pode ser executado
+RUNNABLE_STATUSES = ('pending', 'running')
+
+
+def new_owner() -> str:
+    """Identificador do executor: host, pid e um sufixo por execução."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _settings():
+    from django.conf import settings
+
+    return settings.RUN_LEASE_TTL_SECS, settings.RUN_LEASE_HEARTBEAT_SECS
+
+
+def acquire_lease(test_run, owner) -> bool:
+    """
+    Pega o lease do run num único UPDATE; marca 'running' e started_at (se
+    ainda não tiver). False se o run já terminou, ainda está gerando ou tem
+    outro dono com heartbeat em dia.
+    """
+    from .models import TestRun
+
+    from .signals import run_status_changed
+
+    ttl, _ = _settings()
+    now = timezone.now()
+    previous_status = test_run.status
+    acquired = TestRun.objects.filter(pk=test_run.pk, status__in=RUNNABLE_STATUSES).filter(
+        Q(lease_owner='') | Q(lease_owner=owner)
+        | Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=now - timedelta(seconds=ttl))
+    ).update(
+        lease_owner=owner, heartbeat_at=now, status='running', started_at=Coalesce('started_at', now),
+    ) == 1
+    if acquired:
+        test_run.lease_owner = owner
+        test_run.heartbeat_at = now
+        test_run.status = 'running'
+        test_run.started_at = test_run.started_at or now
+        if previous_status != 'running':
+            run_status_changed(test_run)
+    return acquired
+
+
+def renew_leases(run_ids, owner) -> int:
+    """Heartbeat: renova os leases ainda deste dono. Retorna quantos renovou."""
+    from .models import TestRun
+
+    return TestRun.objects.filter(pk__in=run_ids, lease_owner=owner).update(heartbeat_at=timezone.now())
+
+
+def release_leases(run_ids, owner) -> None:
+    from .models import TestRun
+
+    TestRun.objects.filter(pk__in=run_ids, lease_owner=owner).update(lease_owner='')
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, run_ids, owner, interval):
+        super().__init__(name='run-lease-heartbeat', daemon=True)
+        self.run_ids = run_ids
+        self.owner = owner
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        from django.db import connection
+
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    renewed = renew_leases(self.run_ids, self.owner)
+                except Exception as e:
+                    logger.warning("Heartbeat dos runs %s falhou: %s", self.run_ids, e)
+                    continue
+                if renewed < len(self.run_ids):
+                    logger.warning("Lease perdido em %s de %s runs (%s)", len(self.run_ids) - renewed,
+                                   len(self.run_ids), self.owner)
+        finally:
+            connection.close()
+
+
+@contextmanager
+def leased_runs(test_runs, owner=None):
+    """
+    Pega o lease de cada run e mantém o heartbeat enquanto o bloco roda.
+    Produz só os runs cujo lease foi obtido; os leases são soltos na saída
+    (com ou sem exceção) para um retry poder retomar na hora.
+
+        with leased_runs([run]) as runs:
+            for run in runs:
+                ...
+    """
+    owner = owner or new_owner()
+    leased = [test_run for test_run in test_runs if acquire_lease(test_run, owner)]
+    for test_run in test_runs:
+        if test_run not in leased:
+            logger.info("Run %s já concluído ou em execução em outro worker — ignorado", test_run.id)
+
+    run_ids = [test_run.pk for test_run in leased]
+    heartbeat = None
+    if run_ids:
+        heartbeat = _Heartbeat(run_ids, owner, _settings()[1])
+        heartbeat.start()
+    try:
+        yield leased
+    finally:
+        if heartbeat is not None:
+            heartbeat.stopped.set()
+            heartbeat.join()
+            release_leases(run_ids, owner)
+
+
+def reap_stale_runs(now=None) -> dict:
+    """
+    Runs presos em 'running' — com dono e heartbeat vencido (worker morreu ou
+    estourou o time limit) ou sem dono e na fila há mais de
+    RUN_REAPER_QUEUED_GRACE_SECS (task perdida no broker) — voltam para a
+    fila; a retomada só executa os casos que não foram gravados. Esperar na
+    fila ou por vaga do workspace não é queda: queued_at é renovado a cada
+    espera e o heartbeat só conta com o lease pego. Cada run é retomado no máximo
+    RUN_MAX_RESUMES vezes; depois disso fecha como 'error' com o que já
+    tiver de resultado. Os retomados no mesmo tick (ex: todos os runs de um
+    worker que caiu) vão juntos para a fila `rerun` via enqueue_runs.
+    """
+    from django.conf import settings
+    from django.db.models import F
+
+    from .models import TestRun
+    from .queues import RERUN, enqueue_runs
+    from .results import fail_run
+
+    now = now or timezone.now()
+    queued_before = now - timedelta(seconds=settings.RUN_REAPER_QUEUED_GRACE_SECS)
+    stale = Q(status='running') & (
+        (~Q(lease_owner='') & Q(heartbeat_at__lt=now - timedelta(seconds=settings.RUN_LEASE_TTL_SECS)))
+        | (Q(lease_owner='') & (
+            Q(queued_at__lt=queued_before) | Q(queued_at__isnull=True, created_at__lt=queued_before)
+        ))
+    )
+    claimed = []
+    failed = 0
+    for run in TestRun.objects.filter(stale).select_related('project__workspace'):
+        if run.resume_count >= settings.RUN_MAX_RESUMES:
+            run.recalculate_summary()
+            error_message = f'Execução interrompida {run.resume_count + 1} vezes (worker caiu ou estourou o tempo).'
+            failed += fail_run(run, error_message, stale, now=now)
+            continue
+        # Volta para a fila no claim: outro tick do reaper não pega o mesmo run
+        if not TestRun.objects.filter(stale, pk=run.pk, resume_count=run.resume_count).update(
+            resume_count=F('resume_count') + 1, lease_owner='', queued_at=now,
+        ):
+            continue
+        claimed.append(run)
+        logger.info("Run %s parado (heartbeat %s) — retomada %s", run.id, run.heartbeat_at, run.resume_count + 1)
+
+    if claimed:
+        try:
+            enqueue_runs(claimed, RERUN)
+        except Exception as e:
+            # Ficam na fila sem task: o reaper pega de novo depois da tolerância
+            logger.error("Runs %s não foram reenfileirados: %s", [run.id for run in claimed], e)
+            claimed = []
+    return {'resumed': len(claimed), 'failed': failed}
@@ -21,6 +21,7 @@ class Command(BaseCommand):
             if video_dir.exists():
                 shutil.rmtree(video_dir)
                 run.video_path = ''
-                run.save(update_fields=['video_path'])
+                run.video_paths = []
+                run.save(update_fields=['video_path', 'video_paths'])
                 count += 1
         self.stdout.write(self.style.SUCCESS(f'{count} vídeos removidos'))
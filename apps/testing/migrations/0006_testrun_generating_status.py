@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0005_testrun_video_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='testrun',
+            name='status',
+            field=models.CharField(choices=[('generating', 'Generating'), ('pending', 'Pending'), ('running', 'Running'), ('passed', 'Passed'), ('failed', 'Failed'), ('error', 'Error')], default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0006_testrun_generating_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testrun',
+            index=models.Index(fields=['project', '-created_at'], name='testing_tes_project_ccdfa3_idx'),
+        ),
+    ]
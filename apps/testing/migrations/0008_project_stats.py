@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0007_testrun_project_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testproject',
+            name='avg_pass_rate',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testproject',
+            name='completed_runs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testproject',
+            name='last_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='testing.testrun'),
+        ),
+        migrations.AddField(
+            model_name='testproject',
+            name='last_run_status',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='testproject',
+            name='total_runs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    TestProject = apps.get_model('testing', 'TestProject')
+    TestRun = apps.get_model('testing', 'TestRun')
+
+    for project in TestProject.objects.all().iterator():
+        runs = list(TestRun.objects.filter(project=project).order_by('-created_at').values(
+            'id', 'status', 'passed_cases', 'total_cases',
+        ))
+        completed = [r for r in runs if r['status'] in ('passed', 'failed')]
+        rates = [r['passed_cases'] / r['total_cases'] * 100 if r['total_cases'] else 0 for r in completed]
+        TestProject.objects.filter(pk=project.pk).update(
+            total_runs=len(runs),
+            completed_runs=len(completed),
+            avg_pass_rate=sum(rates) / len(rates) if rates else 0,
+            last_run_id=runs[0]['id'] if runs else None,
+            last_run_status=runs[0]['status'] if runs else '',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0008_project_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0009_backfill_project_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledtest',
+            name='cron_expression',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='scheduledtest',
+            name='frequency',
+            field=models.CharField(choices=[('hourly', 'A cada hora'), ('daily', 'Diário'), ('weekly', 'Semanal'), ('monthly', 'Mensal'), ('cron', 'Cron')], default='daily', max_length=20),
+        ),
+    ]
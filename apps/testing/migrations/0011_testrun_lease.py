@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0010_scheduledtest_cron_expression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrun',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testrun',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
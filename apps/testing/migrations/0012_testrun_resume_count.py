@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0011_testrun_lease'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrun',
+            name='resume_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='testrun',
+            index=models.Index(fields=['status', 'heartbeat_at'], name='testing_tes_status_63cbad_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0012_testrun_resume_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrun',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0013_testrun_queued_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrun',
+            name='video_paths',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
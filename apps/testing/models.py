@@ -33,6 +33,19 @@ class TestProject(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Estatísticas desnormalizadas (mantidas por signals e finalize_run)
+    total_runs = models.PositiveIntegerField(default=0)
+    completed_runs = models.PositiveIntegerField(default=0)
+    avg_pass_rate = models.FloatField(default=0)
+    last_run = models.ForeignKey(
+        'TestRun',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    last_run_status = models.CharField(max_length=10, blank=True, default='')
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Test Project'
@@ -41,11 +54,45 @@ class TestProject(models.Model):
     def __str__(self):
         return f"{self.name} ({self.base_url})"
 
+    @property
+    def average_pass_rate(self):
+        """Média de pass rate dos runs concluídos, ou None se ainda não há nenhum."""
+        if not self.completed_runs:
+            return None
+        return round(self.avg_pass_rate, 1)
+
+    def record_completed_run(self, run):
+        """Soma um run concluído na média móvel — um UPDATE atômico, sem ler os runs."""
+        TestProject.objects.filter(pk=self.pk).update(
+            avg_pass_rate=(
+                (models.F('avg_pass_rate') * models.F('completed_runs') + run.pass_rate)
+                / (models.F('completed_runs') + 1)
+            ),
+            completed_runs=models.F('completed_runs') + 1,
+        )
+
+    def refresh_stats(self):
+        """Recalcula as estatísticas a partir dos runs (backfill/seed)."""
+        runs = list(self.runs.order_by('-created_at').values(
+            'id', 'status', 'passed_cases', 'total_cases',
+        ))
+        completed = [r for r in runs if r['status'] in ('passed', 'failed')]
+        rates = [r['passed_cases'] / r['total_cases'] * 100 if r['total_cases'] else 0 for r in completed]
+        self.total_runs = len(runs)
+        self.completed_runs = len(completed)
+        self.avg_pass_rate = sum(rates) / len(rates) if rates else 0
+        self.last_run_id = runs[0]['id'] if runs else None
+        self.last_run_status = runs[0]['status'] if runs else ''
+        self.save(update_fields=[
+            'total_runs', 'completed_runs', 'avg_pass_rate', 'last_run', 'last_run_status',
+        ])
+
 
 class TestRun(models.Model):
     """Execução de um conjunto de testes."""
 
     STATUS_CHOICES = [
+        ('generating', 'Generating'),
         ('pending', 'Pending'),
         ('running', 'Running'),
         ('passed', 'Passed'),
@@ -75,7 +122,17 @@ class TestRun(models.Model):
     duration_secs = models.FloatField(null=True, blank=True)
     error_message = models.TextField(blank=True, default='')
     celery_task_id = models.CharField(max_length=255, blank=True, default='')
+    # Lease de execução (apps.testing.lease): quem está rodando e último heartbeat
+    lease_owner = models.CharField(max_length=100, blank=True, default='')
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Última vez que o run foi para a fila (enqueue, espera por vaga ou retry)
+    queued_at = models.DateTimeField(null=True, blank=True)
+    # Quantas vezes o reaper já retomou o run (teto em RUN_MAX_RESUMES)
+    resume_count = models.PositiveSmallIntegerField(default=0)
     video_path = models.CharField(max_length=500, blank=True, default='')
+    # Um vídeo por browser context quando os casos rodam em paralelo (a
+    # ordem dos contexts); video_path guarda o primeiro
+    video_paths = models.JSONField(default=list, blank=True)
     share_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     is_public = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -84,6 +141,10 @@ class TestRun(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Test Run'
         verbose_name_plural = 'Test Runs'
+        indexes = [
+            models.Index(fields=['project', '-created_at']),
+            models.Index(fields=['status', 'heartbeat_at']),
+        ]
 
     def __str__(self):
         return f"Run {self.id} — {self.status}"
@@ -94,11 +155,20 @@ class TestRun(models.Model):
             return 0
         return round((self.passed_cases / self.total_cases) * 100, 1)
 
+    @property
+    def videos(self):
+        """Todas as gravações do run (runs antigos só têm video_path)."""
+        return self.video_paths or ([self.video_path] if self.video_path else [])
+
     def recalculate_summary(self):
-        cases = self.cases.all()
-        self.total_cases = cases.count()
-        self.passed_cases = cases.filter(status='passed').count()
-        self.failed_cases = cases.filter(status='failed').count()
+        totals = self.cases.aggregate(
+            total=models.Count('id'),
+            passed=models.Count('id', filter=models.Q(status='passed')),
+            failed=models.Count('id', filter=models.Q(status='failed')),
+        )
+        self.total_cases = totals['total']
+        self.passed_cases = totals['passed']
+        self.failed_cases = totals['failed']
         self.save(update_fields=['total_cases', 'passed_cases', 'failed_cases'])
 
 
@@ -144,6 +214,7 @@ class ScheduleFrequency(models.TextChoices):
     DAILY = 'daily', 'Diário'
     WEEKLY = 'weekly', 'Semanal'
     MONTHLY = 'monthly', 'Mensal'
+    CRON = 'cron', 'Cron'
 
 
 class ScheduledTest(models.Model):
@@ -155,6 +226,8 @@ class ScheduledTest(models.Model):
     frequency = models.CharField(
         max_length=20, choices=ScheduleFrequency.choices, default=ScheduleFrequency.DAILY
     )
+    # Só com frequency='cron': `m h dom mon dow`, no fuso do projeto
+    cron_expression = models.CharField(max_length=100, blank=True, default='')
     is_active = models.BooleanField(default=True)
     notify_email = models.BooleanField(default=True)
     notify_on_failure_only = models.BooleanField(default=True)
@@ -163,19 +236,16 @@ class ScheduledTest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def calculate_next_run(self):
-        from datetime import timedelta
+    def next_run_after(self, now):
+        """Próxima execução a partir de `now` (sem gravar) — ver apps.testing.scheduling."""
+        from .scheduling import next_run_for
 
+        return next_run_for(self, now)
+
+    def calculate_next_run(self):
         from django.utils import timezone
 
-        now = timezone.now()
-        delta = {
-            'hourly': timedelta(hours=1),
-            'daily': timedelta(days=1),
-            'weekly': timedelta(weeks=1),
-            'monthly': timedelta(days=30),
-        }
-        self.next_run_at = now + delta.get(self.frequency, timedelta(days=1))
+        self.next_run_at = self.next_run_after(timezone.now())
         self.save(update_fields=['next_run_at'])
 
     class Meta:
@@ -1,117 +1,393 @@
+import asyncio
 import logging
-import os
+import re
 import time
+from html.parser import HTMLParser
+from pathlib import Path
 
-from django.utils import timezone
 
 logger = logging.getLogger('spritetest.playwright')
 
 
-def _run_browser_tests(cases_data: list, base_url: str, run_id: str = None) -> list:
+def _run_browser_tests(cases_data: list, base_url: str, run_id: str = None, concurrency: int = 1) -> list:
     """
-    Executa os testes no Playwright (sync API).
+    Executa os testes no Playwright.
     Recebe e retorna dados puros (dicts) — sem tocar no Django ORM.
+
+    `concurrency` define quantos browser contexts rodam casos em paralelo
+    (1 = execução serial, comportamento original).
+
+    Dentro de um worker Celery usa o browser pool quente do processo; fora
+    dele (fallback síncrono na web) lança um Chromium só para este run. A
+    espera pelo pool não passa do soft time limit das tasks.
     """
-    from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
-
-    results = []
-
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=True)
-
-        # Video recording setup
-        context_kwargs = {
-            'viewport': {'width': 1280, 'height': 720},
-            'user_agent': 'SpriteTest/1.0 Playwright',
-        }
-        video_dir = None
-        if run_id:
-            from django.conf import settings
-            from pathlib import Path
-            video_dir = Path(settings.MEDIA_ROOT) / 'videos' / str(run_id)
-            video_dir.mkdir(parents=True, exist_ok=True)
-            context_kwargs['record_video_dir'] = str(video_dir)
-            context_kwargs['record_video_size'] = {'width': 1280, 'height': 720}
-
-        context = browser.new_context(**context_kwargs)
-        page = context.new_page()
-
-        for case_data in cases_data:
-            result = {'status': 'passed', 'error': '', 'duration_ms': 0, 'fix_suggestion': ''}
-            start = time.monotonic()
-            category = (case_data.get('category') or '').lower()
+    from django.conf import settings
+
+    from .browser_pool import get_pool
+
+    pool = get_pool()
+    if pool is not None:
+        return pool.run(
+            _run_browser_tests_pooled(pool, cases_data, base_url, run_id, concurrency),
+            timeout=settings.CELERY_TASK_SOFT_TIME_LIMIT,
+        )
+    return asyncio.run(_run_browser_tests_async(cases_data, base_url, run_id, concurrency))
+
+
+async def _run_browser_tests_pooled(pool, cases_data, base_url, run_id, concurrency):
+    async with pool.lease() as browser:
+        results = await _run_cases_in_pool(browser, cases_data, base_url, run_id, concurrency)
+    return _with_video_marker(results, run_id)
+
+
+async def _run_browser_tests_async(cases_data, base_url, run_id, concurrency):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True)
+        try:
+            results = await _run_cases_in_pool(browser, cases_data, base_url, run_id, concurrency)
+        finally:
+            await browser.close()
+    return _with_video_marker(results, run_id)
+
+
+def _with_video_marker(results, run_id):
+    # Videos are flushed when each context closes
+    videos = _find_videos(run_id)
+    if videos:
+        results.append({'_video_paths': videos})
+    return results
+
 
+async def _run_cases_in_pool(browser, cases_data, base_url, run_id, concurrency):
+    """
+    Pool de browser contexts: cada slot tem seu próprio context + page (e vídeo)
+    e consome casos de uma fila compartilhada. Resultados voltam na ordem original;
+    cada caso concluído é publicado na hora (RunProgress) para a página do run
+    e gravado em lotes (ResultCheckpoint) para sobreviver a uma queda do worker.
+
+    A landing page é carregada uma única vez (snapshot) no primeiro slot; casos
+    que só inspecionam o DOM rodam contra o snapshot, os demais navegam de novo.
+    """
+    from .events import RunProgress
+    from .results import ResultCheckpoint
+
+    slots = max(1, min(int(concurrency or 1), len(cases_data)))
+    progress = RunProgress(run_id, len(cases_data)) if run_id else None
+    checkpoint = ResultCheckpoint(run_id) if run_id else None
+    queue = asyncio.Queue()
+    for index, case_data in enumerate(cases_data):
+        queue.put_nowait((index, case_data))
+
+    results = [None] * len(cases_data)
+    pages = []
+    contexts = []
+
+    async def worker(page):
+        while True:
             try:
-                page.goto(base_url, wait_until='networkidle', timeout=30000)
-
-                if 'navigation' in category:
-                    _test_navigation(page, base_url)
-                elif 'auth' in category or 'authentication' in category:
-                    _test_auth_elements(page)
-                elif 'performance' in category:
-                    _test_performance(page)
-                elif 'form' in category:
-                    _test_forms(page)
-                else:
-                    _test_ui_elements(page)
-
-                result['status'] = 'passed'
-
-            except PlaywrightTimeout as e:
-                result['status'] = 'failed'
-                result['error'] = f"Timeout: {str(e)[:200]}"
-                result['fix_suggestion'] = (
-                    "Elemento não respondeu no tempo esperado. "
-                    "Verifique se o seletor está correto e adicione wait explícito."
-                )
-            except Exception as e:
-                result['status'] = 'failed'
-                result['error'] = str(e)[:300]
-                result['fix_suggestion'] = (
-                    f"Erro inesperado. Verifique se a URL {base_url} está acessível "
-                    f"e o elemento existe."
-                )
-            finally:
-                elapsed = time.monotonic() - start
-                result['duration_ms'] = int(elapsed * 1000)
-
-            # Capture screenshot
-            screenshot_rel = ''
-            if run_id:
-                try:
-                    from django.conf import settings
-                    from pathlib import Path
-                    screenshot_dir = Path(settings.MEDIA_ROOT) / 'screenshots' / str(run_id)
-                    screenshot_dir.mkdir(parents=True, exist_ok=True)
-                    screenshot_file = screenshot_dir / f"{case_data['id']}.png"
-                    page.screenshot(path=str(screenshot_file), full_page=False)
-                    screenshot_rel = f"screenshots/{run_id}/{case_data['id']}.png"
-                except Exception:
-                    screenshot_rel = ''
-
-            result['case_id'] = case_data['id']
-            result['screenshot_path'] = screenshot_rel
-            results.append(result)
-
-        browser.close()
-
-        # Capture video path after browser close
-        if video_dir and video_dir.exists():
-            video_files = list(video_dir.glob('*.webm'))
-            if video_files:
-                results.append({'_video_path': f"videos/{run_id}/{video_files[0].name}"})
+                index, case_data = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if snapshot and not _needs_navigation(case_data, base_url, snapshot['url']):
+                results[index] = _run_case_on_snapshot(snapshot, case_data, base_url)
+            else:
+                results[index] = await _run_case(page, case_data, base_url, run_id)
+            if progress is not None:
+                result = results[index]
+                progress.case_done(result['case_id'], result['status'], result['duration_ms'], result['error'])
+                await checkpoint.add(result)
 
+    try:
+        for slot in range(slots):
+            context = await browser.new_context(**_context_kwargs(run_id, slot, slots))
+            contexts.append(context)
+            pages.append(await context.new_page())
+        snapshot = await _capture_snapshot(pages[0], base_url, run_id)
+        await asyncio.gather(*(worker(page) for page in pages))
+    finally:
+        if checkpoint is not None:
+            await checkpoint.flush()
+        for context in contexts:
+            await context.close()
     return results
 
 
-def _test_navigation(page, base_url):
-    links = page.query_selector_all('a[href]')
+def _context_kwargs(run_id, slot, slots):
+    context_kwargs = {
+        'viewport': {'width': 1280, 'height': 720},
+        'user_agent': 'SpriteTest/1.0 Playwright',
+    }
+    if run_id:
+        # Video recording setup — um diretório por context quando há mais de um
+        from django.conf import settings
+        video_dir = Path(settings.MEDIA_ROOT) / 'videos' / str(run_id)
+        if slots > 1:
+            video_dir = video_dir / f'ctx-{slot}'
+        video_dir.mkdir(parents=True, exist_ok=True)
+        context_kwargs['record_video_dir'] = str(video_dir)
+        context_kwargs['record_video_size'] = {'width': 1280, 'height': 720}
+    return context_kwargs
+
+
+def _find_videos(run_id) -> list:
+    """Um vídeo por context (ctx-0, ctx-1, ...), na ordem dos slots."""
+    if not run_id:
+        return []
+    from django.conf import settings
+    media_root = Path(settings.MEDIA_ROOT)
+    video_dir = media_root / 'videos' / str(run_id)
+    if not video_dir.exists():
+        return []
+    videos = sorted(video_dir.rglob('*.webm'), key=lambda path: _natural_key(path.relative_to(video_dir).as_posix()))
+    return [path.relative_to(media_root).as_posix() for path in videos]
+
+
+def _natural_key(text):
+    # ctx-2 antes de ctx-10
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', text)]
+
+
+async def _run_case(page, case_data, base_url, run_id):
+    from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+    result = {'status': 'passed', 'error': '', 'duration_ms': 0, 'fix_suggestion': ''}
+    start = time.monotonic()
+    category = (case_data.get('category') or '').lower()
+
+    try:
+        # Página reaproveitada entre casos: sempre recomeça na URL de início do caso
+        await page.goto(_start_url(case_data, base_url), wait_until='networkidle', timeout=30000)
+
+        if 'navigation' in category:
+            await _test_navigation(page, base_url)
+        elif 'auth' in category or 'authentication' in category:
+            await _test_auth_elements(page)
+        elif 'performance' in category:
+            await _test_performance(page)
+        elif 'form' in category:
+            await _test_forms(page)
+        else:
+            await _test_ui_elements(page)
+
+        result['status'] = 'passed'
+
+    except PlaywrightTimeout as e:
+        result['status'] = 'failed'
+        result['error'] = f"Timeout: {str(e)[:200]}"
+        result['fix_suggestion'] = (
+            "Elemento não respondeu no tempo esperado. "
+            "Verifique se o seletor está correto e adicione wait explícito."
+        )
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)[:300]
+        result['fix_suggestion'] = (
+            f"Erro inesperado. Verifique se a URL {base_url} está acessível "
+            f"e o elemento existe."
+        )
+    finally:
+        elapsed = time.monotonic() - start
+        result['duration_ms'] = int(elapsed * 1000)
+
+    result['case_id'] = case_data['id']
+    result['screenshot_path'] = await _capture_screenshot(page, run_id, case_data['id'])
+    return result
+
+
+async def _capture_screenshot(page, run_id, name) -> str:
+    if not run_id:
+        return ''
+    try:
+        from django.conf import settings
+        screenshot_dir = Path(settings.MEDIA_ROOT) / 'screenshots' / str(run_id)
+        screenshot_dir.mkdir(parents=True, exist_ok=True)
+        await page.screenshot(path=str(screenshot_dir / f"{name}.png"), full_page=False)
+        return f"screenshots/{run_id}/{name}.png"
+    except Exception:
+        return ''
+
+
+# ---------------------------------------------------------------------------
+# Page snapshot: uma navegação por run, checks de DOM sem recarregar a página
+# ---------------------------------------------------------------------------
+
+def _start_url(case_data, base_url) -> str:
+    """
+    URL onde o caso começa: a primeira URL absoluta dos passos, senão a
+    base do projeto.
+    """
+    for step in case_data.get('steps') or []:
+        urls = re.findall(r'https?://[^\s\'"<>]+', str(step))
+        if urls:
+            return urls[0].rstrip('.,;)')
+    return base_url
+
+
+def _same_page(url_a, url_b) -> bool:
+    from urllib.parse import urlsplit
+
+    a, b = urlsplit(url_a), urlsplit(url_b)
+    return (
+        (a.scheme.lower(), a.netloc.lower(), a.path.rstrip('/'), a.query)
+        == (b.scheme.lower(), b.netloc.lower(), b.path.rstrip('/'), b.query)
+    )
+
+
+def _needs_navigation(case_data, base_url, snapshot_url=None) -> bool:
+    """
+    O snapshot só serve para casos que começam na página capturada (URL de
+    início igual à da landing, ou à URL final dela após redirects). Os demais
+    navegam — e sempre a partir do zero (_run_case reinicia na URL de início).
+    """
+    start = _start_url(case_data, base_url)
+    return not (_same_page(start, base_url) or (snapshot_url and _same_page(start, snapshot_url)))
+
+
+async def _capture_snapshot(page, base_url, run_id):
+    """
+    Carrega a landing page uma vez e captura DOM, árvore de acessibilidade e
+    log de rede. Retorna None se o modo snapshot estiver desligado ou a página
+    não carregar (aí cada caso navega por conta própria, como antes).
+    """
+    from django.conf import settings
+
+    if not settings.PLAYWRIGHT_SNAPSHOT_MODE:
+        return None
+
+    network = []
+
+    def on_response(response):
+        network.append({'url': response.url, 'status': response.status})
+
+    page.on('response', on_response)
+    start = time.monotonic()
+    try:
+        await page.goto(base_url, wait_until='networkidle', timeout=30000)
+        load_ms = int((time.monotonic() - start) * 1000)
+        html = await page.content()
+        accessibility = await page.accessibility.snapshot()
+    except Exception as e:
+        logger.info(f"Snapshot indisponível ({str(e)[:120]}) — casos vão navegar individualmente")
+        return None
+    finally:
+        page.remove_listener('response', on_response)
+
+    return {
+        'url': page.url,
+        'dom': _index_dom(html),
+        'accessibility': accessibility,
+        'network': network,
+        'load_ms': load_ms,
+        'screenshot_path': await _capture_screenshot(page, run_id, 'snapshot'),
+    }
+
+
+class _DomIndex(HTMLParser):
+    """Índice mínimo do DOM com o que os checks precisam."""
+
+    def __init__(self):
+        super().__init__()
+        self.has_body = False
+        self.links = 0
+        self.forms = 0
+        self.inputs = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'body':
+            self.has_body = True
+        elif tag == 'a' and attrs.get('href') is not None:
+            self.links += 1
+        elif tag == 'form':
+            self.forms += 1
+        elif tag == 'input':
+            self.inputs.append(attrs)
+
+
+def _index_dom(html):
+    parser = _DomIndex()
+    parser.feed(html)
+    parser.close()
+    return {
+        'has_body': parser.has_body,
+        'links': parser.links,
+        'forms': parser.forms,
+        'inputs': parser.inputs,
+    }
+
+
+def _run_case_on_snapshot(snapshot, case_data, base_url):
+    result = {'status': 'passed', 'error': '', 'duration_ms': 0, 'fix_suggestion': ''}
+    start = time.monotonic()
+    category = (case_data.get('category') or '').lower()
+    dom = snapshot['dom']
+
+    try:
+        if 'navigation' in category:
+            _check_navigation(dom)
+        elif 'auth' in category or 'authentication' in category:
+            _check_auth_elements(dom)
+        elif 'performance' in category:
+            _check_performance(snapshot)
+        elif 'form' in category:
+            _check_forms(dom)
+        else:
+            _check_ui_elements(dom)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)[:300]
+        result['fix_suggestion'] = (
+            f"Erro inesperado. Verifique se a URL {base_url} está acessível "
+            f"e o elemento existe."
+        )
+    finally:
+        result['duration_ms'] = int((time.monotonic() - start) * 1000)
+
+    result['case_id'] = case_data['id']
+    result['screenshot_path'] = snapshot['screenshot_path']
+    return result
+
+
+def _check_navigation(dom):
+    if not dom['links']:
+        raise Exception("Nenhum link encontrado na página")
+
+
+def _check_auth_elements(dom):
+    for attrs in dom['inputs']:
+        if attrs.get('type') in ('email', 'password') or attrs.get('name') in ('email', 'username'):
+            return
+    raise Exception("Campos de autenticação não encontrados na página")
+
+
+def _check_forms(dom):
+    if not dom['forms']:
+        raise Exception("Nenhum formulário encontrado na página")
+    if not any(attrs.get('type') != 'hidden' for attrs in dom['inputs']):
+        raise Exception("Nenhum campo de input encontrado nos formulários")
+
+
+def _check_performance(snapshot):
+    elapsed = snapshot['load_ms'] / 1000
+    if elapsed > 10:
+        raise Exception(f"Página demorou {elapsed:.1f}s para carregar (limite: 10s)")
+
+
+def _check_ui_elements(dom):
+    if not dom['has_body']:
+        raise Exception("Página sem body — possível erro de renderização")
+
+
+async def _test_navigation(page, base_url):
+    links = await page.query_selector_all('a[href]')
     if not links:
         raise Exception("Nenhum link encontrado na página")
-    page.wait_for_load_state('networkidle')
+    await page.wait_for_load_state('networkidle')
 
 
-def _test_auth_elements(page):
+async def _test_auth_elements(page):
     selectors = [
         'input[type=email]',
         'input[type=password]',
@@ -120,7 +396,7 @@ def _test_auth_elements(page):
     ]
     found = False
     for sel in selectors:
-        el = page.query_selector(sel)
+        el = await page.query_selector(sel)
         if el:
             found = True
             break
@@ -128,80 +404,151 @@ def _test_auth_elements(page):
         raise Exception("Campos de autenticação não encontrados na página")
 
 
-def _test_forms(page):
-    forms = page.query_selector_all('form')
+async def _test_forms(page):
+    forms = await page.query_selector_all('form')
     if not forms:
         raise Exception("Nenhum formulário encontrado na página")
-    inputs = page.query_selector_all('input:not([type=hidden])')
+    inputs = await page.query_selector_all('input:not([type=hidden])')
     if not inputs:
         raise Exception("Nenhum campo de input encontrado nos formulários")
 
 
-def _test_performance(page):
+async def _test_performance(page):
     start = time.time()
-    page.wait_for_load_state('networkidle')
+    await page.wait_for_load_state('networkidle')
     elapsed = time.time() - start
     if elapsed > 10:
         raise Exception(f"Página demorou {elapsed:.1f}s para carregar (limite: 10s)")
 
 
-def _test_ui_elements(page):
-    body = page.query_selector('body')
+async def _test_ui_elements(page):
+    body = await page.query_selector('body')
     if not body:
         raise Exception("Página sem body — possível erro de renderização")
-    page.wait_for_load_state('domcontentloaded')
+    await page.wait_for_load_state('domcontentloaded')
 
 
-def run_playwright_sync(test_run) -> None:
-    """Executa todos os TestCases de um TestRun com Playwright real (API síncrona)."""
-    base_url = test_run.project.base_url
-    logger.info(f"Playwright iniciando: run={test_run.id} url={base_url}")
+def _prepare_job(test_run):
+    """
+    Prefetch case data BEFORE entering Playwright context
+    (Django ORM calls are not allowed inside greenlet/async context).
+    Casos já concluídos (execução retomada) ficam fora do job.
+    """
+    from .results import FINISHED_CASE_STATUSES
 
-    # 1) Prefetch case data BEFORE entering Playwright context
-    #    (Django ORM calls are not allowed inside greenlet/async context)
     cases = list(test_run.cases.all().order_by('order'))
-    cases_data = [{'id': str(c.id), 'category': c.category, 'title': c.title} for c in cases]
-    cases_map = {str(c.id): c for c in cases}
+    job = {
+        'run_id': str(test_run.id),
+        'base_url': test_run.project.base_url,
+        'cases_data': [
+            {'id': str(c.id), 'category': c.category, 'title': c.title, 'steps': c.steps}
+            for c in cases if c.status not in FINISHED_CASE_STATUSES
+        ],
+        'concurrency': test_run.project.workspace.plan_limits.get('browser_contexts', 1),
+    }
+    return job, {str(c.id): c for c in cases}
+
+
+def run_playwright_sync(test_run, owner=None) -> None:
+    """Executa todos os TestCases de um TestRun com Playwright real."""
+    logger.info(f"Playwright iniciando: run={test_run.id} url={test_run.project.base_url}")
+
+    # 1) Prefetch (ORM)
+    job, cases_map = _prepare_job(test_run)
 
     # 2) Run browser tests (pure Playwright, no ORM)
-    results = _run_browser_tests(cases_data, base_url, run_id=str(test_run.id))
+    results = _run_browser_tests(
+        job['cases_data'], job['base_url'], run_id=job['run_id'], concurrency=job['concurrency'],
+    ) if job['cases_data'] else []
 
     # 3) Save results back to DB (outside Playwright context)
-    for result in results:
-        # Handle video path marker
-        if '_video_path' in result:
-            test_run.video_path = result['_video_path']
-            test_run.save(update_fields=['video_path'])
+    _save_results(test_run, cases_map, results, owner)
+
+
+def run_playwright_many(test_runs, owner=None) -> dict:
+    """
+    Executa vários TestRuns num único event loop: cada run tem seus próprios
+    contexts, todos no mesmo browser (do pool do worker, se houver). Os
+    resultados são coletados como dicts puros e gravados no banco só depois
+    que o Playwright termina.
+
+    Returns:
+        dict {run_id: exception} com os runs que falharam no browser
+        (os demais já estão gravados).
+    """
+    prepared = []
+    for test_run in test_runs:
+        logger.info(f"Playwright (lote) iniciando: run={test_run.id} url={test_run.project.base_url}")
+        job, cases_map = _prepare_job(test_run)
+        if not job['cases_data']:
+            # Retomado com todos os casos já concluídos: só fecha o run
+            _save_results(test_run, cases_map, [], owner)
+            continue
+        prepared.append((test_run, job, cases_map))
+
+    outcomes = _run_many_browser_tests([job for _, job, _ in prepared]) if prepared else []
+
+    failures = {}
+    for (test_run, job, cases_map), outcome in zip(prepared, outcomes):
+        if isinstance(outcome, BaseException):
+            failures[job['run_id']] = outcome
             continue
-        case = cases_map[result['case_id']]
-        case.status = 'passed' if result['status'] == 'passed' else 'failed'
-        case.error_message = result.get('error', '')
-        case.ai_fix_suggestion = result.get('fix_suggestion', '')
-        case.duration_ms = result.get('duration_ms', 0)
-        case.screenshot_path = result.get('screenshot_path', '')
-        case.save(update_fields=['status', 'error_message', 'ai_fix_suggestion', 'duration_ms', 'screenshot_path'])
-
-    # 4) Recalculate summary
-    test_run.recalculate_summary()
-    test_run.refresh_from_db()
-
-    test_run.status = 'passed' if test_run.failed_cases == 0 else 'failed'
-    test_run.completed_at = timezone.now()
-
-    if test_run.started_at:
-        test_run.duration_secs = int((test_run.completed_at - test_run.started_at).total_seconds())
-    else:
-        test_run.duration_secs = 0
-
-    test_run.ai_summary = (
-        f"Playwright executou {test_run.total_cases} testes reais em {test_run.duration_secs}s. "
+        _save_results(test_run, cases_map, outcome, owner)
+    return failures
+
+
+def _run_many_browser_tests(jobs: list) -> list:
+    from django.conf import settings
+
+    from .browser_pool import get_pool
+
+    pool = get_pool()
+    if pool is not None:
+        return pool.run(_run_jobs_pooled(pool, jobs), timeout=settings.CELERY_TASK_SOFT_TIME_LIMIT)
+    return asyncio.run(_run_jobs_async(jobs))
+
+
+async def _run_jobs_pooled(pool, jobs):
+    async with pool.lease() as browser:
+        return await _run_jobs(browser, jobs)
+
+
+async def _run_jobs_async(jobs):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True)
+        try:
+            return await _run_jobs(browser, jobs)
+        finally:
+            await browser.close()
+
+
+async def _run_jobs(browser, jobs):
+    """Roda os jobs em paralelo (limitado); a falha de um run não derruba os outros."""
+    from django.conf import settings
+
+    semaphore = asyncio.Semaphore(max(1, settings.PLAYWRIGHT_MAX_PARALLEL_RUNS))
+
+    async def run_job(job):
+        async with semaphore:
+            results = await _run_cases_in_pool(
+                browser, job['cases_data'], job['base_url'], job['run_id'], job['concurrency'],
+            )
+        return _with_video_marker(results, job['run_id'])
+
+    return await asyncio.gather(*(run_job(job) for job in jobs), return_exceptions=True)
+
+
+def _save_results(test_run, cases_map, results, owner=None) -> None:
+    from .results import apply_results, finalize_run
+
+    _, video_paths = apply_results(cases_map, results)
+    finalize_run(test_run, list(cases_map.values()), _playwright_summary, video_paths=video_paths, owner=owner)
+
+
+def _playwright_summary(test_run) -> str:
+    return (
+        f"Playwright executou {test_run.total_cases} testes reais em {test_run.duration_secs:.0f}s. "
         f"{test_run.passed_cases} passaram, {test_run.failed_cases} falharam."
     )
-    test_run.save(update_fields=['status', 'completed_at', 'duration_secs', 'ai_summary'])
-    logger.info(f"Playwright concluído: run={test_run.id} pass_rate={test_run.pass_rate}%")
-
-    try:
-        from apps.workspaces.notifications import send_run_notifications
-        send_run_notifications(test_run)
-    except Exception as e:
-        logging.getLogger('spritetest').warning(f"Notification failed: {e}")
@@ -0,0 +1,145 @@
+"""
+Filas de execução. "Rodar agora" (web e API) vai para `interactive`, re-runs
+de falhas para `rerun` e agendados para `scheduled` — o worker consome nessa
+ordem (CELERY_BROKER_TRANSPORT_OPTIONS), então uma rajada de agendados nunca
+segura um clique. Dentro de cada fila, a prioridade vem do plano. A geração
+de casos (clique em "gerar") também vai para `interactive`; a fila `default`
+fica com o housekeeping, num worker separado. Vários runs de uma vez
+(enqueue_runs) seguem as mesmas filas, em lotes que um worker roda num só
+event loop.
+
+Além disso cada workspace tem um teto de runs simultâneos (plano,
+'concurrent_runs'): a task pega uma vaga antes de abrir o browser e, sem
+vaga, volta para a fila (defer_for_slot) — um tenant não ocupa a frota toda.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+from apps.core.cache import workspace_key
+
+logger = logging.getLogger('spritetest.queues')
+
+INTERACTIVE = 'interactive'
+RERUN = 'rerun'
+SCHEDULED = 'scheduled'
+
+# Redis: 0 é a maior prioridade
+PLAN_PRIORITY = {
+    'enterprise': 0,
+    'pro': 3,
+    'free': 6,
+}
+
+
+def plan_priority(plan) -> int:
+    return PLAN_PRIORITY.get(plan, PLAN_PRIORITY['free'])
+
+
+def mark_queued(*run_ids):
+    """
+    Carimba queued_at: o run está na fila, não executando. O reaper só
+    considera perdido um run na fila há mais de RUN_REAPER_QUEUED_GRACE_SECS.
+    """
+    from django.utils import timezone
+
+    from .models import TestRun
+
+    TestRun.objects.filter(pk__in=run_ids).update(queued_at=timezone.now())
+
+
+def enqueue_run(run, queue=INTERACTIVE):
+    """
+    Enfileira a execução do run na fila pedida, com a prioridade do plano do
+    workspace. Levanta a exceção do broker se ele estiver fora — quem chama
+    decide o fallback.
+    """
+    from .tasks import run_test_execution
+
+    mark_queued(run.pk)
+    return run_test_execution.apply_async(
+        args=[str(run.id)], queue=queue, priority=plan_priority(run.project.workspace.plan),
+    )
+
+
+def enqueue_runs(runs, queue=INTERACTIVE):
+    """
+    Enfileira vários runs de uma vez na fila pedida. Runs do mesmo plano
+    (mesma prioridade) vão juntos para testing.run_test_execution_batch, em
+    lotes de até PLAYWRIGHT_MAX_PARALLEL_RUNS que o worker roda num só event
+    loop; um run sozinho vai por enqueue_run. Levanta a exceção do broker,
+    como enqueue_run.
+    """
+    from django.conf import settings
+
+    from .tasks import run_test_execution_batch
+
+    size = max(1, settings.PLAYWRIGHT_MAX_PARALLEL_RUNS)
+    by_priority = {}
+    for run in runs:
+        by_priority.setdefault(plan_priority(run.project.workspace.plan), []).append(run)
+
+    results = []
+    for priority, group in sorted(by_priority.items()):
+        for start in range(0, len(group), size):
+            batch = group[start:start + size]
+            if len(batch) == 1:
+                results.append(enqueue_run(batch[0], queue))
+                continue
+            mark_queued(*[run.pk for run in batch])
+            results.append(run_test_execution_batch.apply_async(
+                args=[[str(run.id) for run in batch]], queue=queue, priority=priority,
+            ))
+    return results
+
+
+def defer_for_slot(task, *args, deferrals=0, keep_id=True):
+    """
+    Devolve a task para a mesma fila/prioridade daqui a WORKSPACE_SLOT_RETRY_SECS
+    porque o workspace está no teto. Reenvia com o mesmo task id (o
+    celery_task_id do run continua valendo) mas sem passar por self.retry():
+    esperar vaga não gasta as tentativas de erro (max_retries) — as esperas
+    são contadas à parte, no kwarg `deferrals`. `keep_id=False` manda uma
+    task nova (parte de um lote que segue executando).
+    """
+    from django.conf import settings
+
+    delivery = task.request.delivery_info or {}
+    logger.info("%s%s adiada: workspace no teto (%s espera(s))", task.name, args, deferrals + 1)
+    return task.apply_async(
+        args=list(args), kwargs={'deferrals': deferrals + 1},
+        countdown=settings.WORKSPACE_SLOT_RETRY_SECS, task_id=task.request.id if keep_id else None,
+        queue=delivery.get('routing_key'), priority=delivery.get('priority'),
+    )
+
+
+def _slot_keys(workspace):
+    limit = max(workspace.plan_limits.get('concurrent_runs', 1), 1)
+    return [workspace_key(workspace.id, 'exec-slot', n) for n in range(limit)]
+
+
+@contextmanager
+def execution_slot(workspace, owner):
+    """
+    Uma vaga de execução do workspace enquanto o bloco roda. Cada vaga é uma
+    chave no cache (add atômico) que expira com o time limit do Celery, então
+    um worker morto não prende a vaga para sempre. Produz False se o
+    workspace já está no teto.
+
+        with execution_slot(workspace, run_id) as acquired:
+            if not acquired:
+                raise self.retry(...)
+    """
+    from django.conf import settings
+
+    ttl = settings.CELERY_TASK_TIME_LIMIT + 60
+    owner = str(owner)
+    acquired = next((key for key in _slot_keys(workspace) if cache.add(key, owner, ttl)), None)
+    if acquired is None:
+        logger.info("Workspace %s no teto de execuções simultâneas", workspace.id)
+    try:
+        yield acquired is not None
+    finally:
+        if acquired is not None and cache.get(acquired) == owner:
+            cache.delete(acquired)
@@ -0,0 +1,176 @@
+import logging
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TestCase
+from .signals import run_completed
+
+logger = logging.getLogger('spritetest.results')
+
+CASE_RESULT_FIELDS = ['status', 'error_message', 'ai_fix_suggestion', 'duration_ms', 'screenshot_path']
+# Casos com resultado — uma execução retomada não roda de novo
+FINISHED_CASE_STATUSES = ('passed', 'failed')
+
+
+def apply_results(cases_map: dict, results: list):
+    """
+    Aplica os dicts de resultado do executor nos TestCases, só em memória.
+
+    Returns:
+        (lista de casos atualizados, lista de vídeos — um por context)
+    """
+    updated = []
+    video_paths = []
+    for result in results:
+        # Handle video paths marker
+        if '_video_paths' in result:
+            video_paths = result['_video_paths']
+            continue
+        updated.append(_apply_result(cases_map[result['case_id']], result))
+    return updated, video_paths
+
+
+def _apply_result(case, result):
+    case.status = 'passed' if result['status'] == 'passed' else 'failed'
+    case.error_message = result.get('error', '')
+    case.ai_fix_suggestion = result.get('fix_suggestion', '')
+    case.duration_ms = result.get('duration_ms', 0)
+    case.screenshot_path = result.get('screenshot_path', '')
+    return case
+
+
+def save_case_results(results: list) -> None:
+    """Grava resultados de casos (dicts do executor) num bulk_update, sem ler os casos."""
+    cases = [_apply_result(TestCase(pk=result['case_id']), result) for result in results]
+    TestCase.objects.bulk_update(cases, CASE_RESULT_FIELDS)
+
+
+class ResultCheckpoint:
+    """
+    Checkpoint dos resultados de um run durante a execução no Playwright:
+    junta os casos concluídos e grava em lotes pequenos (até
+    RUN_CHECKPOINT_BATCH_SIZE casos ou RUN_CHECKPOINT_MAX_SECS). Se o worker
+    morrer ou estourar o time limit, a retomada só roda o que não foi gravado.
+    Usado dentro do event loop — o ORM roda via sync_to_async.
+    """
+
+    def __init__(self, run_id):
+        from django.conf import settings
+
+        self.run_id = run_id
+        self.batch_size = settings.RUN_CHECKPOINT_BATCH_SIZE
+        self.max_secs = settings.RUN_CHECKPOINT_MAX_SECS
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    async def add(self, result: dict) -> None:
+        self.pending.append(result)
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.max_secs:
+            await self.flush()
+
+    async def flush(self) -> None:
+        from asgiref.sync import sync_to_async
+
+        batch, self.pending = self.pending, []
+        self.last_flush = time.monotonic()
+        if not batch:
+            return
+        try:
+            await sync_to_async(save_case_results)(batch)
+        except Exception as e:
+            # Checkpoint é best-effort: o finalize_run grava tudo no fim
+            logger.warning("Checkpoint do run %s falhou (%s casos): %s", self.run_id, len(batch), e)
+
+
+def finalize_run(test_run, cases: list, summarize, video_paths: list = (), owner=None) -> bool:
+    """
+    Grava todos os casos num único bulk_update e fecha o run num único UPDATE.
+    Os totais são calculados em memória — número constante de queries por run.
+
+    `cases` deve conter todos os TestCases do run; `summarize(test_run)` monta o
+    ai_summary depois que totais, status e duração já foram preenchidos.
+
+    O UPDATE só fecha um run ainda em execução e, com `owner`, só se o lease
+    ainda for dele: se o reaper passou o run para outro worker, quem perdeu o
+    lease não grava nada (nem estatísticas, sinal ou notificações). Retorna
+    False nesse caso.
+    """
+    from .lease import RUNNABLE_STATUSES
+    from .models import TestRun
+    from .signals import run_status_changed
+
+    test_run.total_cases = len(cases)
+    test_run.passed_cases = sum(1 for c in cases if c.status == 'passed')
+    test_run.failed_cases = sum(1 for c in cases if c.status == 'failed')
+    test_run.status = 'passed' if test_run.failed_cases == 0 else 'failed'
+    test_run.completed_at = timezone.now()
+    if test_run.started_at:
+        test_run.duration_secs = (test_run.completed_at - test_run.started_at).total_seconds()
+    else:
+        test_run.duration_secs = 0
+    test_run.ai_summary = summarize(test_run)
+
+    update_fields = [
+        'total_cases', 'passed_cases', 'failed_cases', 'status',
+        'completed_at', 'duration_secs', 'ai_summary',
+    ]
+    if video_paths:
+        test_run.video_paths = list(video_paths)
+        test_run.video_path = test_run.video_paths[0]
+        update_fields += ['video_path', 'video_paths']
+
+    claim = {'lease_owner': owner} if owner else {}
+    with transaction.atomic():
+        closed = TestRun.objects.filter(pk=test_run.pk, status__in=RUNNABLE_STATUSES, **claim).update(
+            **{field: getattr(test_run, field) for field in update_fields},
+        )
+        if closed:
+            TestCase.objects.bulk_update(cases, CASE_RESULT_FIELDS)
+            test_run.project.record_completed_run(test_run)
+            run_status_changed(test_run)
+
+    if not closed:
+        logger.warning("TestRun %s já fechado ou com o lease em outro worker — resultado descartado", test_run.id)
+        return False
+    logger.info("TestRun %s completed: %s (pass rate: %s%%)", test_run.id, test_run.status, test_run.pass_rate)
+    announce_completed_run(test_run)
+    return True
+
+
+def announce_completed_run(test_run) -> None:
+    """Sinal run_completed (rollups do dashboard) e notificações do run já gravado."""
+    for receiver, response in run_completed.send_robust(sender=test_run.__class__, run=test_run):
+        if isinstance(response, Exception):
+            logger.warning("run_completed receiver %s falhou: %s", receiver.__name__, response)
+
+    try:
+        from apps.workspaces.notifications import enqueue_run_notifications
+        enqueue_run_notifications(test_run)
+    except Exception as e:
+        logging.getLogger('spritetest').warning(f"Notification failed: {e}")
+
+
+def fail_run(test_run, error_message, *conditions, now=None) -> bool:
+    """
+    Fecha como 'error' um run ainda em execução (reaper, task sem mais
+    tentativas) num UPDATE condicional; `conditions` restringe o UPDATE (ex:
+    o filtro de runs parados do reaper). Como em finalize_run, só quem fechou
+    atualiza o projeto, publica o status e anuncia a conclusão.
+    """
+    from .lease import RUNNABLE_STATUSES
+    from .models import TestRun
+    from .signals import run_status_changed
+
+    now = now or timezone.now()
+    closed = TestRun.objects.filter(*conditions, pk=test_run.pk, status__in=RUNNABLE_STATUSES).update(
+        status='error', lease_owner='', completed_at=now, error_message=error_message,
+    )
+    if not closed:
+        return False
+    test_run.status, test_run.lease_owner = 'error', ''
+    test_run.completed_at, test_run.error_message = now, error_message
+    run_status_changed(test_run)
+    announce_completed_run(test_run)
+    return True
@@ -0,0 +1,208 @@
+"""
+Disparo dos ScheduledTests. O beat só reivindica os agendamentos vencidos —
+SELECT ... FOR UPDATE SKIP LOCKED e next_run_at avançado na mesma transação,
+então dois ticks sobrepostos nunca pegam o mesmo agendamento — e cada um vira
+uma task própria (testing.execute_scheduled_test), distribuída entre os workers.
+
+Posicionamento: cada agendamento tem um deslocamento fixo dentro do período,
+derivado do id (hourly/daily/weekly alinhados à epoch, monthly por mês de
+calendário), então agendamentos criados no mesmo minuto caem espalhados em
+vez de no mesmo tick. Cron (`m h dom mon dow`) roda no horário pedido. Cada
+tick enfileira no máximo tick_budget() agendamentos — o que passar disso
+(os mais recentes) fica para o próximo tick.
+"""
+import hashlib
+import logging
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+
+logger = logging.getLogger('spritetest.scheduling')
+
+# Agendamentos reivindicados por transação (o beat repete até esvaziar)
+CLAIM_BATCH_SIZE = 200
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+PERIOD_SECS = {
+    'hourly': 60 * 60,
+    'daily': 60 * 60 * 24,
+    'weekly': 60 * 60 * 24 * 7,
+}
+# Dia do mês no máximo 28 — existe em todo mês
+MONTH_SPREAD_SECS = 60 * 60 * 24 * 28
+# Até onde procurar a próxima data de um cron (cobre 29/02)
+CRON_SEARCH_DAYS = 366 * 4 + 1
+
+
+def jitter(schedule_id, period_secs) -> int:
+    """Deslocamento estável (0 <= s < period_secs) do agendamento no período."""
+    digest = hashlib.sha256(str(schedule_id).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % period_secs
+
+
+def _next_periodic(schedule_id, period_secs, now):
+    offset = jitter(schedule_id, period_secs)
+    elapsed = int((now - EPOCH).total_seconds())
+    slot = EPOCH + timedelta(seconds=elapsed - elapsed % period_secs + offset)
+    if slot <= now:
+        slot += timedelta(seconds=period_secs)
+    return slot
+
+
+def _next_monthly(schedule_id, now):
+    """Mesmo dia/hora (até o dia 28) todo mês de calendário, no fuso do projeto."""
+    from django.utils import timezone
+
+    offset = timedelta(seconds=jitter(schedule_id, MONTH_SPREAD_SECS))
+    local = timezone.localtime(now)
+    year, month = local.year, local.month
+    while True:
+        start = timezone.make_aware(datetime(year, month, 1))
+        slot = start + offset
+        if slot > now:
+            return slot
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def parse_cron(expression):
+    """
+    `m h dom mon dow` (sintaxe do crontab, dow 0 = domingo) em conjuntos de
+    valores. ValueError se a expressão for inválida.
+    """
+    from celery.schedules import crontab_parser
+
+    fields = (expression or '').split()
+    if len(fields) != 5:
+        raise ValueError('Use 5 campos: minuto hora dia-do-mês mês dia-da-semana.')
+    minute, hour, day_of_month, month, day_of_week = fields
+    try:
+        return {
+            'minute': sorted(crontab_parser(60).parse(minute)),
+            'hour': sorted(crontab_parser(24).parse(hour)),
+            'day_of_month': crontab_parser(31, 1).parse(day_of_month),
+            'month': crontab_parser(12, 1).parse(month),
+            'day_of_week': crontab_parser(7).parse(day_of_week),
+            # Como no cron: com dia do mês e da semana restritos, vale qualquer um
+            'any_day': day_of_month != '*' and day_of_week != '*',
+        }
+    except (ValueError, crontab_parser.ParseException) as e:
+        raise ValueError(f'Expressão cron inválida: {e}') from e
+
+
+def _cron_matches_day(spec, day: date) -> bool:
+    if day.month not in spec['month']:
+        return False
+    in_month = day.day in spec['day_of_month']
+    in_week = day.isoweekday() % 7 in spec['day_of_week']
+    return (in_month or in_week) if spec['any_day'] else (in_month and in_week)
+
+
+def next_cron_run(expression, now):
+    """Próximo horário (> now) da expressão cron, no fuso do projeto."""
+    from django.utils import timezone
+
+    spec = parse_cron(expression)
+    local = timezone.localtime(now)
+    day = local.date()
+    for _ in range(CRON_SEARCH_DAYS):
+        if _cron_matches_day(spec, day):
+            for hour in spec['hour']:
+                for minute in spec['minute']:
+                    slot = timezone.make_aware(datetime.combine(day, time(hour, minute)))
+                    if slot > now:
+                        return slot
+        day += timedelta(days=1)
+    raise ValueError('Expressão cron nunca dispara.')
+
+
+def next_run_for(schedule, now):
+    """Próxima execução do agendamento a partir de `now`."""
+    if schedule.frequency == 'cron':
+        return next_cron_run(schedule.cron_expression, now)
+    if schedule.frequency == 'monthly':
+        return _next_monthly(schedule.id, now)
+    return _next_periodic(schedule.id, PERIOD_SECS.get(schedule.frequency, PERIOD_SECS['daily']), now)
+
+
+def tick_budget() -> int:
+    """
+    Quantos agendamentos um tick do beat enfileira: o que os workers dão
+    conta de executar até o próximo tick.
+    """
+    from django.conf import settings
+
+    slots = settings.SCHEDULER_WORKER_SLOTS * settings.SCHEDULER_TICK_SECS
+    return max(1, slots // settings.SCHEDULER_EXPECTED_RUN_SECS)
+
+
+def claim_due_schedules(now, limit=CLAIM_BATCH_SIZE) -> list:
+    """
+    Reivindica até `limit` agendamentos vencidos: grava last_run_at e o
+    próximo next_run_at antes de soltar os locks. Retorna os ids.
+    """
+    from .models import ScheduledTest
+
+    with transaction.atomic():
+        schedules = list(
+            ScheduledTest.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, next_run_at__lte=now)
+            .order_by('next_run_at')[:limit]
+        )
+        for schedule in schedules:
+            schedule.last_run_at = now
+            schedule.next_run_at = schedule.next_run_after(now)
+        ScheduledTest.objects.bulk_update(schedules, ['last_run_at', 'next_run_at'])
+    return [schedule.id for schedule in schedules]
+
+
+def enqueue_due_schedules(now, budget=None) -> int:
+    """
+    Reivindica os vencidos (mais antigos primeiro) até o orçamento do tick e
+    enfileira uma task por agendamento.
+    """
+    from .models import ScheduledTest
+    from .queues import SCHEDULED, plan_priority
+    from .tasks import execute_scheduled_test
+
+    budget = tick_budget() if budget is None else budget
+    total = 0
+    while total < budget:
+        limit = min(CLAIM_BATCH_SIZE, budget - total)
+        ids = claim_due_schedules(now, limit)
+        plans = dict(ScheduledTest.objects.filter(id__in=ids).values_list('id', 'project__workspace__plan'))
+        for schedule_id in ids:
+            try:
+                execute_scheduled_test.apply_async(
+                    args=[str(schedule_id)], queue=SCHEDULED, priority=plan_priority(plans.get(schedule_id)),
+                )
+            except Exception:
+                # Broker fora do ar: executa aqui mesmo, um agendamento por vez —
+                # a falha (ou Retry sem vaga) de um não pula os demais
+                try:
+                    execute_scheduled_test(str(schedule_id))
+                except Exception as e:
+                    logger.error("Agendamento %s não executou inline: %s", schedule_id, e)
+        total += len(ids)
+        if len(ids) < limit:
+            return total
+    logger.info("Orçamento do tick (%s) esgotado; o restante fica para o próximo tick", budget)
+    return total
+
+
+def execute_schedule(schedule) -> object:
+    """Gera os casos e executa um run do agendamento. Retorna o run ou None."""
+    from .ai_service import generate_for_project
+    from .executor import run_test_execution_smart
+    from .services import create_run_from_ai
+
+    project = schedule.project
+    ai_result = generate_for_project(project)
+    if 'error' in ai_result:
+        logger.error("Geração do agendamento %s falhou: %s", schedule.id, ai_result['error'])
+        return None
+
+    run = create_run_from_ai(project, schedule.created_by or project.created_by, ai_result)
+    run_test_execution_smart(run)
+    return run
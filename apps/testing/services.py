@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import TestCase, TestRun
+
+
+def _consume_quota(project, enforce_quota):
+    from apps.workspaces.quota import QuotaExceeded, consume_run_quota
+
+    limit = project.workspace.get_plan_limits()['runs'] if enforce_quota else None
+    if not consume_run_quota(project.workspace_id, limit):
+        raise QuotaExceeded(limit)
+
+
+def materialize_run(project, triggered_by, test_cases: list, enforce_quota=False, **run_fields) -> TestRun:
+    """
+    Cria o TestRun e todos os TestCases (bulk_create) numa única transação.
+
+    `test_cases` é uma lista de dicts no formato do generate_test_cases
+    (title, description, category, steps e, opcionalmente, order).
+    Retorna o run já com total_cases preenchido.
+
+    O run entra no contador de quota do mês; com `enforce_quota` levanta
+    QuotaExceeded (atomicamente) se o plano não tiver mais runs.
+    """
+    run_fields.setdefault('status', 'pending')
+    with transaction.atomic():
+        _consume_quota(project, enforce_quota)
+        run = TestRun.objects.create(
+            project=project,
+            triggered_by=triggered_by,
+            total_cases=len(test_cases),
+            **run_fields,
+        )
+        TestCase.objects.bulk_create([
+            TestCase(
+                run=run,
+                title=tc.get('title') or f'Test Case {i + 1}',
+                description=tc.get('description', ''),
+                category=tc.get('category', ''),
+                steps=tc.get('steps', []),
+                order=tc.get('order', i),
+            )
+            for i, tc in enumerate(test_cases)
+        ])
+    return run
+
+
+def create_run_from_ai(project, triggered_by, ai_result: dict, enforce_quota=False) -> TestRun:
+    """Materializa um run a partir do retorno de generate_test_cases."""
+    return materialize_run(
+        project,
+        triggered_by,
+        ai_result.get('test_cases', []),
+        enforce_quota=enforce_quota,
+        ai_model_used=ai_result.get('model_used', ''),
+        ai_summary=ai_result.get('test_strategy', ''),
+    )
+
+
+def create_rerun(original_run, triggered_by):
+    """
+    Cria um novo run só com os casos falhos de `original_run`.
+    Retorna None se não houver casos para re-executar.
+    """
+    source_cases = list(
+        original_run.cases.filter(status='failed').values(
+            'title', 'description', 'category', 'steps', 'order',
+        )
+    )
+    if not source_cases:
+        return None
+    return materialize_run(
+        original_run.project,
+        triggered_by,
+        source_cases,
+        ai_summary=f'Re-run de falhos do run {str(original_run.id)[:8]}',
+    )
+
+
+def start_generation(project, triggered_by) -> TestRun:
+    """Cria um run vazio em 'generating'; os casos chegam via generate_into_run."""
+    with transaction.atomic():
+        _consume_quota(project, enforce_quota=False)
+        return TestRun.objects.create(project=project, triggered_by=triggered_by, status='generating')
+
+
+def generate_into_run(run, regenerate=False) -> TestRun:
+    """
+    Gera os casos do run em streaming, gravando cada um assim que a IA o
+    completa — o run_detail já mostra os casos enquanto a geração continua.
+    Ao final o run vai para 'pending', pronto para executar.
+    """
+    from .ai_service import generate_for_project
+
+    def on_case(case, index):
+        TestCase.objects.create(
+            run=run,
+            title=case.get('title') or f'Test Case {index + 1}',
+            description=case.get('description', ''),
+            category=case.get('category', ''),
+            steps=case.get('steps', []),
+            order=index,
+        )
+        TestRun.objects.filter(pk=run.pk).update(total_cases=F('total_cases') + 1)
+
+    result = generate_for_project(run.project, regenerate=regenerate, on_case=on_case)
+
+    run.total_cases = len(result.get('test_cases', []))
+    run.ai_model_used = result.get('model_used', '')
+    run.ai_summary = result.get('test_strategy', '')
+    run.status = 'pending'
+    run.save(update_fields=['total_cases', 'ai_model_used', 'ai_summary', 'status'])
+    return run
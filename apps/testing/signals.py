@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+
+# Enviado por results.announce_completed_run depois que o run foi gravado como
+# passed/failed, ou por results.fail_run quando fecha o run como error (reaper,
+# task sem mais tentativas). kwargs: run (TestRun com totais já preenchidos).
+run_completed = Signal()
+
+
+@receiver(post_save, sender='testing.TestRun')
+def update_project_last_run(sender, instance, created, update_fields=None, **kwargs):
+    """Mantém total_runs/last_run/last_run_status do projeto em um UPDATE."""
+    from .models import TestProject
+
+    if created:
+        TestProject.objects.filter(pk=instance.project_id).update(
+            total_runs=F('total_runs') + 1,
+            last_run=instance.pk,
+            last_run_status=instance.status,
+        )
+    elif update_fields is None or 'status' in update_fields:
+        TestProject.objects.filter(pk=instance.project_id, last_run=instance.pk).update(
+            last_run_status=instance.status,
+        )
+
+
+@receiver(post_save, sender='testing.TestRun')
+def notify_run_waiters(sender, instance, created, update_fields=None, **kwargs):
+    """Acorda quem espera o run (SSE/long-poll) quando o status muda, após o commit."""
+    if created or update_fields is None or 'status' in update_fields:
+        from .events import publish_run_status
+
+        transaction.on_commit(lambda: publish_run_status(instance))
+
+
+def run_status_changed(run):
+    """
+    Mesmo efeito dos receivers acima para quem muda o status num UPDATE
+    condicional (lease, clique em executar, reaper) — .update() não dispara
+    post_save. `run` já deve estar com o status novo em memória.
+    """
+    for handler in (update_project_last_run, notify_run_waiters):
+        handler(sender=type(run), instance=run, created=False, update_fields=['status'])
@@ -7,80 +7,159 @@ logger = logging.getLogger('spritetest.tasks')
 
 
 @shared_task(bind=True, max_retries=3, name='testing.run_test_execution')
-def run_test_execution(self, run_id: str):
-    """Executa testes de forma assíncrona via Celery."""
+def run_test_execution(self, run_id: str, deferrals: int = 0):
+    """Executa testes de forma assíncrona via Celery (fila escolhida por enqueue_run)."""
     from .executor import run_test_execution_smart
     from .models import TestRun
+    from .queues import defer_for_slot, execution_slot, mark_queued
+    from .results import fail_run
 
     try:
-        run = TestRun.objects.get(id=run_id)
+        run = TestRun.objects.select_related('project__workspace').get(id=run_id)
     except TestRun.DoesNotExist:
         logger.error("TestRun %s não encontrado", run_id)
         return
 
     try:
-        logger.info("Iniciando execução async: %s", run_id)
-        run_test_execution_smart(run)
+        with execution_slot(run.project.workspace, run_id) as acquired:
+            if not acquired:
+                # Workspace no teto de runs simultâneos: volta para a fila
+                mark_queued(run_id)
+                defer_for_slot(self, run_id, deferrals=deferrals)
+                return
+            logger.info("Iniciando execução async: %s", run_id)
+            run_test_execution_smart(run)
         logger.info("Execução concluída: %s status=%s", run_id, run.status)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            # O lease já foi solto: o retry retoma só os casos que faltam
+            logger.warning("Erro na execução %s, nova tentativa: %s", run_id, exc)
+            mark_queued(run_id)
+            raise self.retry(exc=exc, countdown=10)
+        fail_run(run, str(exc))
+        logger.error("Erro na execução %s: %s", run_id, exc)
+
+
+@shared_task(bind=True, max_retries=3, name='testing.run_test_execution_batch')
+def run_test_execution_batch(self, run_ids: list, deferrals: int = 0):
+    """
+    Executa vários TestRuns no mesmo processo, multiplexados num event loop
+    (fila e prioridade escolhidas por enqueue_runs). Cada run pega uma vaga
+    do seu workspace; os que ficam sem vaga voltam para a fila num lote
+    próprio, sem segurar os demais.
+    """
+    from contextlib import ExitStack
+
+    from .executor import run_test_executions_smart
+    from .models import TestRun
+    from .queues import defer_for_slot, execution_slot, mark_queued
+    from .results import fail_run
+
+    runs = list(TestRun.objects.select_related('project__workspace').filter(id__in=run_ids))
+    ready = runs
+    try:
+        with ExitStack() as slots:
+            ready = [run for run in runs if slots.enter_context(execution_slot(run.project.workspace, run.id))]
+            waiting = [str(run.id) for run in runs if run not in ready]
+            if waiting:
+                # Lote todo no teto: a mesma task volta; senão só os que esperam, numa task nova
+                mark_queued(*waiting)
+                defer_for_slot(self, waiting, deferrals=deferrals, keep_id=not ready)
+            if not ready:
+                return
+            logger.info("Iniciando execução em lote: %s runs", len(ready))
+            run_test_executions_smart(ready)
+    except Exception as exc:
+        ready_ids = [str(run.id) for run in ready]
+        if self.request.retries < self.max_retries:
+            logger.warning("Erro na execução em lote %s, nova tentativa: %s", ready_ids, exc)
+            mark_queued(*ready_ids)
+            raise self.retry(args=[ready_ids], exc=exc, countdown=10)
+        for run in ready:
+            fail_run(run, str(exc))
+        logger.error("Erro na execução em lote %s: %s", ready_ids, exc)
+        return
+    return f"Executados {len(ready)} runs"
+
+
+@shared_task(name='testing.generate_run_cases')
+def generate_run_cases(run_id: str, regenerate: bool = False):
+    """Gera os casos de um run em 'generating', gravando-os conforme chegam do stream."""
+    from .models import TestRun
+    from .services import generate_into_run
+
+    run = TestRun.objects.select_related('project').filter(id=run_id, status='generating').first()
+    if run is None:
+        logger.error("TestRun %s não encontrado ou já gerado", run_id)
+        return
+
+    try:
+        generate_into_run(run, regenerate=regenerate)
     except Exception as exc:
         run.status = 'error'
         run.error_message = str(exc)
-        run.completed_at = timezone.now()
-        run.save(update_fields=['status', 'error_message', 'completed_at'])
-        logger.error("Erro na execução %s: %s", run_id, exc)
-        raise self.retry(exc=exc, countdown=10)
+        run.save(update_fields=['status', 'error_message'])
+        logger.error("Erro na geração %s: %s", run_id, exc)
+        return
+    logger.info("Geração concluída: %s (%s casos)", run_id, run.total_cases)
 
 
 @shared_task(name='testing.run_scheduled_tests')
 def run_scheduled_tests():
-    """Executa todos os testes agendados com next_run_at <= agora."""
-    from apps.testing.ai_service import generate_test_cases
-    from apps.testing.executor import run_test_execution_smart
-    from apps.testing.models import ScheduledTest, TestCase, TestRun
+    """
+    Tick do beat: só reivindica os agendamentos vencidos e enfileira uma
+    testing.execute_scheduled_test por agendamento.
+    """
+    from .scheduling import enqueue_due_schedules
+
+    enqueued = enqueue_due_schedules(timezone.now())
+    logger.info("Scheduled: %s agendamentos enfileirados", enqueued)
+    return f"Enfileirados {enqueued} agendamentos"
+
+
+@shared_task(bind=True, name='testing.execute_scheduled_test')
+def execute_scheduled_test(self, schedule_id: str, deferrals: int = 0):
+    """Executa um agendamento já reivindicado pelo beat (gera casos + roda + notifica)."""
+    from .models import ScheduledTest
+    from .queues import defer_for_slot, execution_slot
+    from .scheduling import execute_schedule
+
+    schedule = ScheduledTest.objects.select_related(
+        'project__workspace', 'created_by',
+    ).filter(id=schedule_id, is_active=True).first()
+    if schedule is None:
+        logger.info("Agendamento %s removido ou pausado antes de executar", schedule_id)
+        return
 
-    now = timezone.now()
-    schedules = ScheduledTest.objects.filter(is_active=True, next_run_at__lte=now)
-    logger.info(f"Scheduled: {schedules.count()} testes para executar")
+    with execution_slot(schedule.project.workspace, schedule_id) as acquired:
+        if not acquired:
+            defer_for_slot(self, schedule_id, deferrals=deferrals)
+            return
+        try:
+            run = execute_schedule(schedule)
+        except Exception as e:
+            logger.error(f"Erro no scheduled test {schedule_id}: {e}")
+            return
+    if run is None:
+        return
 
-    for schedule in schedules:
+    if schedule.notify_email:
         try:
-            project = schedule.project
-            ai_result = generate_test_cases(
-                project.base_url, project.test_type, project.special_instructions
-            )
-
-            if 'error' not in ai_result:
-                run = TestRun.objects.create(
-                    project=project,
-                    triggered_by=schedule.created_by or project.created_by,
-                    status='pending',
-                    ai_model_used='claude-opus-4-6',
-                )
-
-                for i, tc in enumerate(ai_result.get('test_cases', [])):
-                    TestCase.objects.create(
-                        run=run,
-                        title=tc.get('title', ''),
-                        description=tc.get('description', ''),
-                        category=tc.get('category', ''),
-                        steps=tc.get('steps', []),
-                        order=i,
-                    )
-
-                run.total_cases = run.cases.count()
-                run.save(update_fields=['total_cases'])
-
-                run_test_execution_smart(run)
-
-                schedule.last_run_at = now
-                schedule.calculate_next_run()
-
-                if schedule.notify_email:
-                    send_run_notification.delay(str(run.id))
+            send_run_notification.delay(str(run.id))
         except Exception as e:
-            logger.error(f"Erro no scheduled test {schedule.id}: {e}")
+            logger.error(f"Erro ao agendar notificação do run {run.id}: {e}")
+    return f"Agendamento {schedule_id}: run {run.id} {run.status}"
+
+
+@shared_task(name='testing.reap_stale_runs')
+def reap_stale_runs():
+    """Beat: retoma runs parados em 'running' (heartbeat vencido)."""
+    from .lease import reap_stale_runs as reap
 
-    return f"Processados {schedules.count()} agendamentos"
+    outcome = reap()
+    if outcome['resumed'] or outcome['failed']:
+        logger.info("Reaper: %s runs retomados, %s fechados como erro", outcome['resumed'], outcome['failed'])
+    return outcome
 
 
 @shared_task(name='testing.cleanup_videos')
@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from apps.workspaces.models import Workspace, WorkspaceMembership, WorkspaceRole
 
@@ -64,3 +64,1000 @@ class TestingModelsTest(TestCase):
         result = generate_test_cases('https://example.com', 'ui', '')
         self.assertIn('test_cases', result)
         self.assertGreater(len(result['test_cases']), 0)
+
+
+class _FakeAccessibility:
+    async def snapshot(self):
+        return {'role': 'WebArea', 'name': 'Example'}
+
+
+class _FakePage:
+    url = 'https://example.com/'
+    accessibility = _FakeAccessibility()
+    html = (
+        '<html><body><a href="/about">About</a>'
+        '<form><input type="email" name="email"><input type="hidden"></form></body></html>'
+    )
+
+    def __init__(self):
+        self.gotos = 0
+
+    def on(self, event, handler):
+        return None
+
+    def remove_listener(self, event, handler):
+        return None
+
+    async def goto(self, url, **kwargs):
+        self.gotos += 1
+        return None
+
+    async def content(self):
+        return self.html
+
+    async def query_selector_all(self, selector):
+        return ['el']
+
+    async def query_selector(self, selector):
+        return 'el'
+
+    async def wait_for_load_state(self, state='load'):
+        return None
+
+    async def screenshot(self, **kwargs):
+        return None
+
+
+class _FakeContext:
+    pages = []
+
+    async def new_page(self):
+        page = _FakePage()
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        return None
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.contexts = 0
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **kwargs):
+        self.contexts += 1
+        return _FakeContext()
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakePlaywright:
+    def __init__(self):
+        self.launched = []
+        self.chromium = self
+
+    async def launch(self, **kwargs):
+        browser = _FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+    async def stop(self):
+        return None
+
+
+class ContextPoolTest(TestCase):
+    def test_parallel_pool_keeps_case_order(self):
+        import asyncio
+        from apps.testing.playwright_runner import _run_cases_in_pool
+
+        browser = _FakeBrowser()
+        cases = [{'id': str(i), 'category': 'Forms'} for i in range(7)]
+        results = asyncio.run(
+            _run_cases_in_pool(browser, cases, 'https://example.com', None, concurrency=3)
+        )
+        self.assertEqual(browser.contexts, 3)
+        self.assertEqual([r['case_id'] for r in results], [c['id'] for c in cases])
+        self.assertTrue(all(r['status'] == 'passed' for r in results))
+
+    def test_every_context_video_is_kept(self):
+        import tempfile
+        from pathlib import Path
+        from apps.testing.models import TestRun
+        from apps.testing.playwright_runner import _find_videos
+        from apps.testing.results import apply_results
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            for slot in (0, 2, 10):
+                video_dir = Path(media) / 'videos' / 'run-1' / f'ctx-{slot}'
+                video_dir.mkdir(parents=True)
+                (video_dir / 'rec.webm').write_bytes(b'')
+            videos = _find_videos('run-1')
+        self.assertEqual(videos, [f'videos/run-1/ctx-{slot}/rec.webm' for slot in (0, 2, 10)])
+        self.assertEqual(apply_results({}, [{'_video_paths': videos}]), ([], videos))
+        self.assertEqual(TestRun(video_paths=videos).videos, videos)
+        self.assertEqual(TestRun(video_path='videos/old.webm').videos, ['videos/old.webm'])
+
+    def test_browser_contexts_per_plan(self):
+        from apps.workspaces.models import PLAN_LIMITS, Plan
+        self.assertEqual(PLAN_LIMITS[Plan.FREE]['browser_contexts'], 1)
+        self.assertGreater(PLAN_LIMITS[Plan.ENTERPRISE]['browser_contexts'], 1)
+
+
+class BrowserPoolTest(TestCase):
+    def test_browser_recycled_after_max_runs(self):
+        from apps.testing.browser_pool import BrowserPool
+
+        async def use(pool):
+            async with pool.lease() as browser:
+                return browser
+
+        fake = _FakePlaywright()
+        pool = BrowserPool(size=1, max_runs=2)
+        pool._playwright = fake
+        pool.start()
+        try:
+            first = pool.run(use(pool))
+            self.assertIs(pool.run(use(pool)), first)
+            third = pool.run(use(pool))
+        finally:
+            pool.shutdown()
+        self.assertIsNot(third, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(len(fake.launched), 2)
+
+    def test_pool_starts_lazily_in_worker_processes_only(self):
+        from unittest import mock
+        from apps.testing import browser_pool
+
+        with mock.patch.object(browser_pool.BrowserPool, 'start') as start, \
+                mock.patch.object(browser_pool.BrowserPool, 'started', new_callable=mock.PropertyMock) as started:
+            started.return_value = True
+            # Web: sem worker_process_init, nunca sobe pool
+            self.assertIsNone(browser_pool.get_pool())
+            browser_pool.enable_pool()
+            start.assert_not_called()
+            try:
+                pool = browser_pool.get_pool()
+                self.assertIsNotNone(pool)
+                self.assertIs(browser_pool.get_pool(), pool)
+                start.assert_called_once()
+            finally:
+                browser_pool._pool = None
+                browser_pool._enabled = False
+
+    def test_abandoned_run_is_cancelled_on_timeout(self):
+        import asyncio
+        import concurrent.futures
+        from apps.testing.browser_pool import BrowserPool
+
+        cancelled = asyncio.Event()
+
+        async def stuck():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        pool = BrowserPool(size=1)
+        pool._playwright = _FakePlaywright()
+        pool.start()
+        try:
+            with self.assertRaises(concurrent.futures.TimeoutError):
+                pool.run(stuck(), timeout=0.05)
+            pool.run(asyncio.wait_for(cancelled.wait(), 1))
+        finally:
+            pool.shutdown()
+
+
+class MultiRunEngineTest(TestCase):
+    def test_runs_share_browser_and_fail_independently(self):
+        import asyncio
+        from apps.testing.playwright_runner import _run_jobs
+
+        browser = _FakeBrowser()
+        jobs = [
+            {'run_id': None, 'base_url': 'https://a.example.com',
+             'cases_data': [{'id': 'a1', 'category': 'UI'}, {'id': 'a2', 'category': 'UI'}],
+             'concurrency': 2},
+            {'run_id': None, 'base_url': 'https://b.example.com',
+             'cases_data': None, 'concurrency': 1},
+            {'run_id': None, 'base_url': 'https://c.example.com',
+             'cases_data': [{'id': 'c1', 'category': 'Navigation'}], 'concurrency': 1},
+        ]
+        outcomes = asyncio.run(_run_jobs(browser, jobs))
+        self.assertEqual([r['case_id'] for r in outcomes[0]], ['a1', 'a2'])
+        self.assertIsInstance(outcomes[1], Exception)
+        self.assertEqual([r['case_id'] for r in outcomes[2]], ['c1'])
+        self.assertEqual(browser.contexts, 3)
+
+
+class PageSnapshotTest(TestCase):
+    def test_dom_only_cases_reuse_single_navigation(self):
+        import asyncio
+        from apps.testing.playwright_runner import _run_cases_in_pool
+
+        _FakeContext.pages = []
+        cases = [
+            {'id': '1', 'category': 'Navigation', 'steps': ['Navigate to https://example.com']},
+            {'id': '2', 'category': 'Authentication', 'steps': ['Check email field exists']},
+            {'id': '3', 'category': 'Forms', 'steps': []},
+            {'id': '4', 'category': 'Navigation', 'steps': ['Open https://example.com/pricing']},
+        ]
+        results = asyncio.run(
+            _run_cases_in_pool(_FakeBrowser(), cases, 'https://example.com', None, concurrency=1)
+        )
+        self.assertEqual(_FakeContext.pages[0].gotos, 2)
+        self.assertTrue(all(r['status'] == 'passed' for r in results))
+
+    def test_snapshot_checks_report_missing_elements(self):
+        from apps.testing.playwright_runner import _index_dom, _run_case_on_snapshot
+
+        snapshot = {'dom': _index_dom('<html><body><p>hi</p></body></html>'),
+                    'load_ms': 200, 'screenshot_path': ''}
+        result = _run_case_on_snapshot(snapshot, {'id': 'x', 'category': 'Forms'}, 'https://e.com')
+        self.assertEqual(result['status'], 'failed')
+        self.assertIn('formulário', result['error'])
+
+    def test_needs_navigation(self):
+        from apps.testing.playwright_runner import _needs_navigation
+
+        base = 'https://example.com'
+        self.assertFalse(_needs_navigation({'steps': ['Navigate to https://example.com/']}, base))
+        self.assertFalse(_needs_navigation({'steps': ['Submit the form']}, base))
+        self.assertTrue(_needs_navigation({'steps': ['Go to https://example.com/login.']}, base))
+        self.assertTrue(_needs_navigation({'steps': ['Visit https://example.com/app?tab=1']}, base))
+        # Landing que redireciona: a URL final do snapshot também conta
+        self.assertFalse(_needs_navigation({'steps': ['Open https://www.example.com']}, base,
+                                           'https://www.example.com/'))
+
+
+class BulkResultWriterTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+        self.user = User.objects.create_user(
+            username='bulk', email='bulk@test.com', password='BKpass123!'
+        )
+        self.project = TestProject.objects.create(
+            workspace=self.user.workspaces.first(), created_by=self.user,
+            name='Bulk', base_url='http://localhost:8000',
+        )
+
+    def _run_with_cases(self, n):
+        from apps.testing.models import TestCase as Case, TestRun
+        run = TestRun.objects.create(project=self.project, triggered_by=self.user)
+        for i in range(n):
+            Case.objects.create(run=run, title=f'Case {i}', category='UI', order=i)
+        return TestRun.objects.select_related('project__workspace').get(pk=run.pk)
+
+    def _count_queries(self, run):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.testing.executor import simulate_test_execution
+        with CaptureQueriesContext(connection) as ctx:
+            simulate_test_execution(run)
+        return len(ctx.captured_queries)
+
+    def test_simulation_query_count_is_constant(self):
+        small = self._count_queries(self._run_with_cases(2))
+        large = self._count_queries(self._run_with_cases(12))
+        self.assertEqual(small, large)
+
+    def test_totals_match_case_statuses(self):
+        run = self._run_with_cases(6)
+        self._count_queries(run)
+        run.refresh_from_db()
+        self.assertEqual(run.total_cases, 6)
+        self.assertEqual(run.passed_cases, run.cases.filter(status='passed').count())
+        self.assertEqual(run.passed_cases + run.failed_cases, 6)
+        self.assertEqual(run.status, 'passed' if run.failed_cases == 0 else 'failed')
+
+
+class RunMaterializationTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+        self.user = User.objects.create_user(
+            username='mat', email='mat@test.com', password='MTpass123!'
+        )
+        self.project = TestProject.objects.create(
+            workspace=self.user.workspaces.first(), created_by=self.user,
+            name='Mat', base_url='https://example.com',
+        )
+
+    def test_run_created_with_cases_in_constant_queries(self):
+        from apps.testing.ai_service import _get_mock_test_cases
+        from apps.testing.services import create_run_from_ai
+
+        ai_result = {'test_cases': _get_mock_test_cases('https://example.com', 'ui'), 'model_used': 'mock'}
+        with self.assertNumQueries(6):  # savepoint + quota + run + project stats + bulk cases + release
+            run = create_run_from_ai(self.project, self.user, ai_result)
+        self.assertEqual(run.total_cases, len(ai_result['test_cases']))
+        self.assertEqual(run.cases.count(), run.total_cases)
+        self.assertEqual(list(run.cases.values_list('order', flat=True)), list(range(run.total_cases)))
+
+    def test_rerun_copies_only_failed_cases(self):
+        from apps.testing.services import create_rerun, materialize_run
+
+        run = materialize_run(self.project, self.user, [{'title': 'a'}, {'title': 'b'}, {'title': 'c'}])
+        self.assertIsNone(create_rerun(run, self.user))
+        run.cases.filter(title__in=['b', 'c']).update(status='failed')
+        rerun = create_rerun(run, self.user)
+        self.assertEqual(rerun.total_cases, 2)
+        self.assertEqual(sorted(rerun.cases.values_list('title', flat=True)), ['b', 'c'])
+
+
+class GenerationCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def _fake_client(self, body=None, chunk_size=7):
+        import json
+        from contextlib import contextmanager
+        from unittest import mock
+
+        if body is None:
+            body = json.dumps({'test_cases': [{'title': 'Home', 'category': 'UI', 'steps': []}]})
+
+        @contextmanager
+        def stream(**kwargs):
+            chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+            yield mock.Mock(text_stream=iter(chunks))
+
+        client = mock.Mock()
+        client.messages.stream.side_effect = stream
+        return client
+
+    def test_cached_until_regenerate_or_invalidated(self):
+        import os
+        from unittest import mock
+        from apps.testing.ai_service import generate_test_cases, invalidate_generation_cache
+
+        client = self._fake_client()
+        with mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'sk-test'}), \
+                mock.patch('anthropic.Anthropic', return_value=client):
+            first = generate_test_cases('https://example.com', 'ui', 'x')
+            generate_test_cases('https://example.com', 'ui', 'x')
+            self.assertEqual(client.messages.stream.call_count, 1)
+
+            generate_test_cases('https://example.com', 'ui', 'y')
+            self.assertEqual(client.messages.stream.call_count, 2)
+
+            generate_test_cases('https://example.com', 'ui', 'x', use_cache=False)
+            self.assertEqual(client.messages.stream.call_count, 3)
+
+            invalidate_generation_cache('https://example.com', 'ui', 'x')
+            generate_test_cases('https://example.com', 'ui', 'x')
+            self.assertEqual(client.messages.stream.call_count, 4)
+        self.assertEqual(first['test_cases'][0]['title'], 'Home')
+
+    def test_stream_keeps_complete_cases_when_tail_is_malformed(self):
+        import os
+        from unittest import mock
+        from apps.testing.models import TestProject
+        from apps.testing.services import generate_into_run, start_generation
+
+        body = (
+            '{"app_summary": "Loja", "test_strategy": "Fluxos {principais}", "test_cases": ['
+            '{"title": "Login \\"ok\\"", "category": "Auth", "steps": ["a}"]},'
+            '{"title": "Busca", "category": "UI", "steps": []},'
+            '{"title": "Checko'
+        )
+        client = self._fake_client(body, chunk_size=5)
+        user = User.objects.create_user(username='gen', email='gen@test.com', password='GNpass123!')
+        project = TestProject.objects.create(
+            workspace=user.workspaces.first(), created_by=user, name='P', base_url='https://example.com',
+        )
+
+        run = start_generation(project, user)
+        with mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'sk-test'}), \
+                mock.patch('anthropic.Anthropic', return_value=client), \
+                mock.patch('apps.testing.crawler.get_site_summary', return_value=''):
+            generate_into_run(run)
+            generate_into_run(start_generation(project, user))
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'pending')
+        self.assertEqual(run.total_cases, 2)
+        self.assertEqual(run.ai_summary, 'Fluxos {principais}')
+        self.assertEqual(list(run.cases.values_list('title', flat=True)), ['Login "ok"', 'Busca'])
+        # Stream incompleto não vai para o cache
+        self.assertEqual(client.messages.stream.call_count, 2)
+
+
+class SiteCrawlerTest(TestCase):
+    HOME = (
+        '<html><head><title>Loja</title></head><body>'
+        '<a href="/login">Entrar</a><a href="https://other.com/x">fora</a>'
+        '<input name="q" type="search"></body></html>'
+    )
+    LOGIN = (
+        '<html><title>Login</title><form method="post" action="/session">'
+        '<input name="email" type="email"><input name="password" type="password">'
+        '<input type="hidden" name="csrf"></form></html>'
+    )
+
+    def _transport(self, requests):
+        import httpx
+
+        def handler(request):
+            requests.append((request.url.path, request.headers.get('if-none-match')))
+            if request.url.path == '/sitemap.xml':
+                return httpx.Response(404)
+            if request.headers.get('if-none-match') == '"v1"':
+                return httpx.Response(304)
+            body = self.HOME if request.url.path == '/' else self.LOGIN
+            return httpx.Response(200, text=body, headers={'content-type': 'text/html', 'etag': '"v1"'})
+
+        return httpx.MockTransport(handler)
+
+    def test_crawl_summarizes_and_revalidates_with_etag(self):
+        import asyncio
+        from apps.testing.crawler import crawl, summarize
+
+        requests = []
+        entries = asyncio.run(crawl('https://shop.test/', transport=self._transport(requests)))
+        summary = summarize(entries)
+
+        self.assertEqual(set(entries), {'https://shop.test/', 'https://shop.test/login'})
+        self.assertIn('/login — Login', summary)
+        self.assertIn('POST /session [email(email), password(password)]', summary)
+        self.assertIn('q(search)', summary)
+        self.assertNotIn('other.com', summary)
+
+        requests.clear()
+        again = asyncio.run(crawl('https://shop.test/', previous_entries=entries,
+                                  transport=self._transport(requests)))
+        self.assertEqual(summarize(again), summary)
+        self.assertTrue(all(etag == '"v1"' for path, etag in requests if path != '/sitemap.xml'))
+
+
+class ProjectStatsTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+        self.user = User.objects.create_user(
+            username='pstats', email='pstats@test.com', password='PSpass123!'
+        )
+        self.user.onboarding_completed = True
+        self.user.save(update_fields=['onboarding_completed'])
+        self.workspace = self.user.workspaces.first()
+        self.projects = [
+            TestProject.objects.create(
+                workspace=self.workspace, created_by=self.user, name=f'P{i}', base_url='https://example.com',
+            )
+            for i in range(3)
+        ]
+
+    def _complete(self, project, outcomes):
+        from apps.testing.results import finalize_run
+        from apps.testing.services import materialize_run
+
+        run = materialize_run(project, self.user, [{'title': str(i)} for i in range(len(outcomes))])
+        cases = list(run.cases.all())
+        for case, outcome in zip(cases, outcomes):
+            case.status = outcome
+        finalize_run(run, cases, lambda r: '')
+        return run
+
+    def test_stats_maintained_incrementally_and_match_refresh(self):
+        project = self.projects[0]
+        self._complete(project, ['passed', 'passed'])
+        last = self._complete(project, ['passed', 'failed'])
+        project.refresh_from_db()
+        self.assertEqual((project.total_runs, project.completed_runs), (2, 2))
+        self.assertEqual(project.average_pass_rate, 75.0)
+        self.assertEqual((project.last_run_id, project.last_run_status), (last.id, 'failed'))
+
+        incremental = (project.total_runs, project.completed_runs, project.avg_pass_rate, project.last_run_id)
+        project.refresh_stats()
+        self.assertEqual(
+            (project.total_runs, project.completed_runs, project.avg_pass_rate, project.last_run_id), incremental,
+        )
+
+    def test_project_list_query_count_does_not_grow_with_projects(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_login(self.user)
+        for project in self.projects:
+            self._complete(project, ['passed', 'failed'])
+        self.client.get('/testing/projects/')  # sessão/workspace já resolvidos
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get('/testing/projects/').status_code, 200)
+
+        from apps.testing.models import TestProject
+        for i in range(3):
+            self._complete(TestProject.objects.create(
+                workspace=self.workspace, created_by=self.user, name=f'Q{i}', base_url='https://example.com',
+            ), ['passed'])
+        with CaptureQueriesContext(connection) as more:
+            self.assertEqual(self.client.get('/testing/projects/').status_code, 200)
+        self.assertEqual(len(few.captured_queries), len(more.captured_queries))
+
+
+@override_settings(EVENTS_REDIS_URL='', EVENTS_STREAM_MAX_SECS=0)
+class RunProgressEventsTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+        from apps.testing.services import materialize_run
+        self.user = User.objects.create_user(
+            username='live', email='live@test.com', password='LVpass123!'
+        )
+        self.user.onboarding_completed = True
+        self.user.save(update_fields=['onboarding_completed'])
+        project = TestProject.objects.create(
+            workspace=self.user.workspaces.first(), created_by=self.user,
+            name='Live', base_url='http://localhost:8000',
+        )
+        self.run = materialize_run(project, self.user, [{'title': str(i)} for i in range(3)])
+        self.case_ids = [str(pk) for pk in self.run.cases.values_list('id', flat=True)]
+
+    def test_simulation_publishes_one_event_per_case(self):
+        from unittest import mock
+        from apps.testing.executor import simulate_test_execution
+
+        with mock.patch('apps.testing.events.publish') as publish:
+            simulate_test_execution(self.run)
+        events = [call.args[1] for call in publish.call_args_list if call.args[1]['type'] == 'case']
+        self.assertEqual([event['done'] for event in events], [1, 2, 3])
+        self.assertEqual(sorted(event['case_id'] for event in events), sorted(self.case_ids))
+        self.assertEqual(events[-1]['passed'] + events[-1]['failed'], 3)
+
+    async def test_stream_replays_progress_for_late_subscribers(self):
+        from asgiref.sync import sync_to_async
+        from apps.testing.events import RunProgress
+
+        progress = RunProgress(self.run.id, 3)
+        progress.case_done(self.case_ids[0], 'passed', 10)
+        progress.case_done(self.case_ids[1], 'failed', 20, 'boom')
+        self.run.status = 'running'
+        await sync_to_async(self.run.save)(update_fields=['status'])
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(f'/testing/runs/{self.run.id}/events/')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(body.count('event: case'), 2)
+        self.assertIn('"error": "boom"', body)
+        self.assertIn('"done": 2', body)
+
+
+class ScheduledFanOutTest(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.testing.models import ScheduledTest, TestProject
+        self.user = User.objects.create_user(
+            username='sched', email='sched@test.com', password='SCpass123!'
+        )
+        project = TestProject.objects.create(
+            workspace=self.user.workspaces.first(), created_by=self.user,
+            name='Sched', base_url='http://localhost:8000',
+        )
+        now = timezone.now()
+        self.due = [
+            ScheduledTest.objects.create(project=project, created_by=self.user, next_run_at=now - timedelta(minutes=i))
+            for i in range(3)
+        ]
+        ScheduledTest.objects.create(project=project, created_by=self.user, next_run_at=now + timedelta(hours=1))
+
+    def test_beat_claims_each_due_schedule_once(self):
+        from unittest import mock
+        from apps.testing.tasks import run_scheduled_tests
+
+        with mock.patch('apps.testing.tasks.execute_scheduled_test.apply_async') as apply_async:
+            run_scheduled_tests()
+            run_scheduled_tests()
+        self.assertEqual(
+            sorted(call.kwargs['args'][0] for call in apply_async.call_args_list), sorted(str(s.id) for s in self.due)
+        )
+        self.assertEqual({call.kwargs['queue'] for call in apply_async.call_args_list}, {'scheduled'})
+        for schedule in self.due:
+            schedule.refresh_from_db()
+            self.assertIsNotNone(schedule.last_run_at)
+            self.assertGreater(schedule.next_run_at, schedule.last_run_at)
+
+    def test_broker_down_fallback_runs_every_claimed_schedule(self):
+        from unittest import mock
+        from celery.exceptions import Retry
+        from django.utils import timezone
+        from apps.testing.scheduling import enqueue_due_schedules
+
+        task = mock.Mock()
+        task.apply_async.side_effect = ConnectionError('broker offline')
+        task.side_effect = [Retry('sem vaga'), RuntimeError('boom'), None]
+        with mock.patch('apps.testing.tasks.execute_scheduled_test', task):
+            self.assertEqual(enqueue_due_schedules(timezone.now()), 3)
+        self.assertEqual(task.call_count, 3)
+
+    def test_execute_scheduled_test_creates_and_runs(self):
+        from unittest import mock
+        from apps.testing.tasks import execute_scheduled_test
+
+        with mock.patch('apps.testing.tasks.send_run_notification.delay') as notify:
+            execute_scheduled_test(str(self.due[0].id))
+        run = self.due[0].project.runs.get()
+        self.assertIn(run.status, ('passed', 'failed'))
+        notify.assert_called_once_with(str(run.id))
+
+
+class SchedulePlacementTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+        self.user = User.objects.create_user(
+            username='place', email='place@test.com', password='PLpass123!'
+        )
+        self.project = TestProject.objects.create(
+            workspace=self.user.workspaces.first(), created_by=self.user,
+            name='Place', base_url='http://localhost:8000',
+        )
+
+    def _schedule(self, **kwargs):
+        from apps.testing.models import ScheduledTest
+        return ScheduledTest.objects.create(project=self.project, created_by=self.user, **kwargs)
+
+    def test_daily_schedules_spread_and_stay_put(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+        schedules = [self._schedule(frequency='daily') for _ in range(20)]
+        slots = [schedule.next_run_after(now) for schedule in schedules]
+        self.assertTrue(all(now < slot <= now + timedelta(days=1) for slot in slots))
+        self.assertGreater(len({slot.replace(second=0) for slot in slots}), 15)
+        # Depois de disparar, o próximo cai no mesmo horário do dia seguinte
+        self.assertEqual(schedules[0].next_run_after(slots[0]), slots[0] + timedelta(days=1))
+
+    def test_monthly_uses_calendar_months(self):
+        from datetime import datetime
+        from django.utils import timezone
+
+        schedule = self._schedule(frequency='monthly')
+        first = schedule.next_run_after(timezone.make_aware(datetime(2025, 1, 31, 23, 59)))
+        second = schedule.next_run_after(first)
+        self.assertEqual((first.month, timezone.localtime(second).month), (2, 3))
+        self.assertEqual(timezone.localtime(first).day, timezone.localtime(second).day)
+
+    def test_cron_expression(self):
+        from datetime import datetime
+        from django.utils import timezone
+        from apps.testing.scheduling import next_cron_run
+
+        friday = timezone.make_aware(datetime(2025, 3, 7, 7, 0))
+        self.assertEqual(next_cron_run('30 6 * * 1-5', friday), timezone.make_aware(datetime(2025, 3, 10, 6, 30)))
+        self.assertEqual(next_cron_run('*/15 * * * *', friday), timezone.make_aware(datetime(2025, 3, 7, 7, 15)))
+        with self.assertRaises(ValueError):
+            next_cron_run('61 * * * *', friday)
+
+    @override_settings(SCHEDULER_WORKER_SLOTS=1, SCHEDULER_TICK_SECS=300, SCHEDULER_EXPECTED_RUN_SECS=150)
+    def test_tick_budget_defers_overflow(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from apps.testing.scheduling import enqueue_due_schedules
+
+        now = timezone.now()
+        due = [self._schedule(next_run_at=now - timedelta(minutes=i)) for i in range(3)]
+        with mock.patch('apps.testing.tasks.execute_scheduled_test.apply_async') as apply_async:
+            self.assertEqual(enqueue_due_schedules(now), 2)
+            self.assertEqual(
+                [call.kwargs['args'][0] for call in apply_async.call_args_list], [str(due[2].id), str(due[1].id)]
+            )
+            self.assertEqual(enqueue_due_schedules(now), 1)
+
+
+class ExecutionQueueTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject, TestRun
+        self.user = User.objects.create_user(
+            username='queues', email='queues@test.com', password='QUpass123!'
+        )
+        self.workspace = self.user.workspaces.first()
+        project = TestProject.objects.create(
+            workspace=self.workspace, created_by=self.user,
+            name='Queues', base_url='http://localhost:8000',
+        )
+        self.run = TestRun.objects.create(project=project, triggered_by=self.user)
+
+    def test_enqueue_run_uses_queue_and_plan_priority(self):
+        from unittest import mock
+        from apps.testing.queues import RERUN, enqueue_run
+
+        self.workspace.plan = 'enterprise'
+        self.workspace.save()
+        self.run.project.workspace = self.workspace
+        with mock.patch('apps.testing.tasks.run_test_execution.apply_async') as apply_async:
+            enqueue_run(self.run, RERUN)
+        apply_async.assert_called_once_with(args=[str(self.run.id)], queue='rerun', priority=0)
+
+    @override_settings(PLAYWRIGHT_MAX_PARALLEL_RUNS=2)
+    def test_enqueue_runs_batches_by_plan_priority(self):
+        from unittest import mock
+        from apps.testing.models import TestRun
+        from apps.testing.queues import RERUN, enqueue_runs
+
+        runs = [self.run] + [TestRun.objects.create(project=self.run.project, triggered_by=self.user) for _ in range(2)]
+        with mock.patch('apps.testing.tasks.run_test_execution_batch.apply_async') as batch, \
+                mock.patch('apps.testing.tasks.run_test_execution.apply_async') as single:
+            enqueue_runs(runs, RERUN)
+        batch.assert_called_once_with(args=[[str(runs[0].id), str(runs[1].id)]], queue='rerun', priority=6)
+        single.assert_called_once_with(args=[str(runs[2].id)], queue='rerun', priority=6)
+        self.assertFalse(TestRun.objects.filter(pk__in=[r.pk for r in runs], queued_at__isnull=True).exists())
+
+    def test_batch_runs_under_slots_and_leases_and_defers_the_rest(self):
+        from unittest import mock
+        from apps.testing.models import TestRun
+        from apps.testing.services import materialize_run
+        from apps.testing.tasks import run_test_execution_batch
+
+        # Plano free: uma vaga por workspace — o segundo run do lote espera
+        runs = [materialize_run(self.run.project, self.user, [{'title': 'x'}]) for _ in range(2)]
+        with mock.patch.object(run_test_execution_batch, 'apply_async') as apply_async:
+            run_test_execution_batch.apply(args=[[str(run.id) for run in runs]])
+        statuses = dict(TestRun.objects.filter(pk__in=[r.pk for r in runs]).values_list('id', 'status'))
+        done = [run for run in runs if statuses[run.id] in ('passed', 'failed')]
+        self.assertEqual(len(done), 1)
+        waiting = next(run for run in runs if run not in done)
+        self.assertEqual(statuses[waiting.id], 'pending')
+        self.assertEqual(apply_async.call_args.kwargs['args'], [[str(waiting.id)]])
+        self.assertEqual(apply_async.call_args.kwargs['kwargs'], {'deferrals': 1})
+        # Parte de um lote que executou: task nova, não a mesma
+        self.assertIsNone(apply_async.call_args.kwargs['task_id'])
+        self.assertEqual(TestRun.objects.get(pk=done[0].pk).lease_owner, '')
+
+    def test_workspace_cap_defers_execution(self):
+        from unittest import mock
+        from apps.testing.queues import execution_slot
+        from apps.testing.tasks import run_test_execution
+
+        with execution_slot(self.workspace, 'other-run') as acquired:
+            self.assertTrue(acquired)
+            with mock.patch.object(run_test_execution, 'apply_async') as apply_async:
+                run_test_execution(str(self.run.id), deferrals=4)
+        self.assertEqual(apply_async.call_args.kwargs['kwargs'], {'deferrals': 5})
+        self.assertNotIn('retries', apply_async.call_args.kwargs)
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, 'pending')
+        # Espera por vaga renova o carimbo de fila (o reaper não a conta como queda)
+        self.assertIsNotNone(self.run.queued_at)
+        # Vaga devolvida ao sair do bloco
+        with execution_slot(self.workspace, self.run.id) as acquired:
+            self.assertTrue(acquired)
+
+    def test_deferrals_do_not_use_up_error_retries(self):
+        from unittest import mock
+        from apps.testing.queues import execution_slot
+        from apps.testing.tasks import run_test_execution
+
+        # Várias esperas por vaga, cada uma reenviada com as opções da anterior
+        options = {'kwargs': {}}
+        with execution_slot(self.workspace, 'other-run'):
+            with mock.patch.object(run_test_execution, 'apply_async') as apply_async:
+                for _ in range(4):
+                    run_test_execution.apply(
+                        args=[str(self.run.id)], kwargs=options['kwargs'], retries=options.get('retries', 0),
+                    )
+                    options = apply_async.call_args.kwargs
+        self.assertEqual(options['kwargs'], {'deferrals': 4})
+
+        # A falha depois disso ainda tem todas as novas tentativas
+        with mock.patch('apps.testing.executor.run_test_execution_smart', side_effect=RuntimeError('boom')) as smart:
+            run_test_execution.apply(
+                args=[str(self.run.id)], kwargs=options['kwargs'], retries=options.get('retries', 0),
+            )
+        self.assertEqual(smart.call_count, 1 + run_test_execution.max_retries)
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.status, self.run.error_message), ('error', 'boom'))
+
+
+class RunLeaseTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+        from apps.testing.services import materialize_run
+        self.user = User.objects.create_user(
+            username='lease', email='lease@test.com', password='LSpass123!'
+        )
+        self.user.onboarding_completed = True
+        self.user.save(update_fields=['onboarding_completed'])
+        project = TestProject.objects.create(
+            workspace=self.user.workspaces.first(), created_by=self.user,
+            name='Lease', base_url='http://localhost:8000',
+        )
+        self.run = materialize_run(project, self.user, [{'title': str(i)} for i in range(3)])
+
+    def test_lease_is_exclusive_until_heartbeat_expires(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.testing.lease import acquire_lease
+        from apps.testing.models import TestRun
+
+        self.assertTrue(acquire_lease(self.run, 'worker-a'))
+        self.assertFalse(acquire_lease(self.run, 'worker-b'))
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.status, self.run.lease_owner), ('running', 'worker-a'))
+        self.assertIsNotNone(self.run.started_at)
+
+        TestRun.objects.filter(pk=self.run.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+        self.assertTrue(acquire_lease(self.run, 'worker-b'))
+
+    def test_lease_claim_publishes_running_status(self):
+        from unittest import mock
+        from apps.testing.lease import acquire_lease
+
+        with mock.patch('apps.testing.events.publish_run_status') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(acquire_lease(self.run, 'worker-a'))
+            # Renovar o próprio lease não é mudança de status
+            self.assertTrue(acquire_lease(self.run, 'worker-a'))
+        publish.assert_called_once()
+        self.run.project.refresh_from_db()
+        self.assertEqual(self.run.project.last_run_status, 'running')
+
+    def test_worker_that_lost_the_lease_does_not_finalize(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from apps.testing.executor import simulate_test_execution
+        from apps.testing.lease import acquire_lease
+        from apps.testing.models import TestRun
+
+        stalled = TestRun.objects.select_related('project__workspace').get(pk=self.run.pk)
+        self.assertTrue(acquire_lease(stalled, 'worker-a'))
+        # Heartbeat de A parou; o reaper devolveu o run e B pegou o lease
+        TestRun.objects.filter(pk=self.run.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+        current = TestRun.objects.select_related('project__workspace').get(pk=self.run.pk)
+        self.assertTrue(acquire_lease(current, 'worker-b'))
+
+        with mock.patch('apps.workspaces.notifications.enqueue_run_notifications') as notify:
+            simulate_test_execution(current, 'worker-b')
+            simulate_test_execution(stalled, 'worker-a')
+        notify.assert_called_once()
+        current.project.refresh_from_db()
+        self.assertEqual(current.project.completed_runs, 1)
+
+    def test_execution_resumes_and_is_idempotent(self):
+        from apps.testing.executor import run_test_execution_smart
+
+        done = self.run.cases.first()
+        done.status, done.duration_ms = 'passed', 1234
+        done.save(update_fields=['status', 'duration_ms'])
+
+        run_test_execution_smart(self.run)
+        done.refresh_from_db()
+        self.assertEqual(done.duration_ms, 1234)
+        self.assertFalse(self.run.cases.filter(status='pending').exists())
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.lease_owner, '')
+        completed_at = self.run.completed_at
+
+        run_test_execution_smart(self.run)
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.completed_at, completed_at)
+
+    def test_repeated_execute_clicks_enqueue_once(self):
+        from unittest import mock
+
+        self.client.force_login(self.user)
+        with mock.patch('apps.testing.queues.enqueue_run') as enqueue_run:
+            enqueue_run.return_value.id = 'task-1'
+            for _ in range(2):
+                self.client.post(f'/testing/runs/{self.run.id}/execute/')
+        enqueue_run.assert_called_once()
+
+
+class RunRecoveryTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+        from apps.testing.services import materialize_run
+        self.user = User.objects.create_user(
+            username='reaper', email='reaper@test.com', password='RPpass123!'
+        )
+        project = TestProject.objects.create(
+            workspace=self.user.workspaces.first(), created_by=self.user,
+            name='Reaper', base_url='https://example.com',
+        )
+        self.run = materialize_run(project, self.user, [{'title': str(i)} for i in range(3)])
+        self.case_ids = [str(pk) for pk in self.run.cases.values_list('id', flat=True)]
+
+    @override_settings(RUN_CHECKPOINT_BATCH_SIZE=2, RUN_CHECKPOINT_MAX_SECS=3600)
+    async def test_checkpoint_writes_in_batches(self):
+        from apps.testing.models import TestCase as Case
+        from apps.testing.results import ResultCheckpoint
+
+        checkpoint = ResultCheckpoint(str(self.run.id))
+        for case_id in self.case_ids:
+            await checkpoint.add({'case_id': case_id, 'status': 'passed', 'error': '', 'duration_ms': 7})
+        self.assertEqual(await Case.objects.filter(run_id=self.run.id, status='passed').acount(), 2)
+        await checkpoint.flush()
+        self.assertEqual(await Case.objects.filter(run_id=self.run.id, status='passed').acount(), 3)
+
+    def _stale(self, **fields):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.testing.models import TestRun
+
+        TestRun.objects.filter(pk=self.run.pk).update(
+            status='running', lease_owner='dead-worker', started_at=timezone.now() - timedelta(minutes=30),
+            heartbeat_at=timezone.now() - timedelta(minutes=10), **fields,
+        )
+
+    @override_settings(RUN_MAX_RESUMES=2)
+    def test_reaper_requeues_stale_runs_until_cap(self):
+        from unittest import mock
+        from apps.testing.lease import reap_stale_runs
+
+        self._stale()
+        with mock.patch('apps.testing.queues.enqueue_run') as enqueue_run:
+            self.assertEqual(reap_stale_runs(), {'resumed': 1, 'failed': 0})
+            # Volta para a fila no claim: o tick seguinte não pega de novo
+            self.assertEqual(reap_stale_runs(), {'resumed': 0, 'failed': 0})
+        enqueue_run.assert_called_once()
+        self.assertEqual(enqueue_run.call_args.args[1], 'rerun')
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.resume_count, self.run.lease_owner), (1, ''))
+
+        self.run.cases.filter(id=self.case_ids[0]).update(status='passed')
+        self._stale(resume_count=2)
+        self.assertEqual(reap_stale_runs(), {'resumed': 0, 'failed': 1})
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.status, self.run.passed_cases), ('error', 1))
+
+    def test_reaper_resumes_a_crashed_workers_runs_together(self):
+        from unittest import mock
+        from apps.testing.lease import reap_stale_runs
+        from apps.testing.models import TestRun
+        from apps.testing.services import materialize_run
+
+        other = materialize_run(self.run.project, self.user, [{'title': 'x'}])
+        self._stale()
+        TestRun.objects.filter(pk=other.pk).update(
+            status='running', lease_owner='dead-worker', heartbeat_at=TestRun.objects.get(pk=self.run.pk).heartbeat_at,
+        )
+        with mock.patch('apps.testing.queues.enqueue_runs') as enqueue_runs:
+            self.assertEqual(reap_stale_runs(), {'resumed': 2, 'failed': 0})
+        enqueue_runs.assert_called_once()
+        self.assertEqual({run.pk for run in enqueue_runs.call_args.args[0]}, {self.run.pk, other.pk})
+        self.assertEqual(enqueue_runs.call_args.args[1], 'rerun')
+
+    @override_settings(RUN_LEASE_TTL_SECS=60, RUN_REAPER_QUEUED_GRACE_SECS=3600)
+    def test_reaper_ignores_queue_and_slot_waits(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from apps.testing import queues
+        from apps.testing.lease import reap_stale_runs
+        from apps.testing.models import TestRun
+
+        # Clique em executar há horas; o run espera vaga desde então, sem lease
+        long_ago = timezone.now() - timedelta(hours=3)
+        TestRun.objects.filter(pk=self.run.pk).update(created_at=long_ago, status='running')
+        with mock.patch('apps.testing.tasks.run_test_execution.apply_async'):
+            queues.enqueue_run(self.run)
+        later = timezone.now() + timedelta(minutes=30)
+        with mock.patch('apps.testing.queues.enqueue_run') as enqueue_run:
+            self.assertEqual(reap_stale_runs(later), {'resumed': 0, 'failed': 0})
+            # Retomado e ainda na fila depois do TTL: não é retomado de novo
+            self._stale()
+            self.assertEqual(reap_stale_runs(), {'resumed': 1, 'failed': 0})
+            self.assertEqual(reap_stale_runs(later), {'resumed': 0, 'failed': 0})
+            # Na fila além da tolerância: task perdida no broker
+            self.assertEqual(reap_stale_runs(later + timedelta(hours=1)), {'resumed': 1, 'failed': 0})
+        self.assertEqual(enqueue_run.call_count, 2)
+
+    def test_reaper_error_close_updates_project_and_notifies(self):
+        from unittest import mock
+        from apps.testing.lease import reap_stale_runs
+
+        self._stale(resume_count=2)
+        with mock.patch('apps.testing.events.publish_run_status') as publish, \
+                mock.patch('apps.workspaces.notifications.enqueue_run_notifications') as notify, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reap_stale_runs(), {'resumed': 0, 'failed': 1})
+        self.assertEqual(publish.call_args.args[0].status, 'error')
+        notify.assert_called_once()
+        self.run.project.refresh_from_db()
+        self.assertEqual(self.run.project.last_run_status, 'error')
@@ -9,7 +9,9 @@ urlpatterns = [
     path('projects/', views.project_list, name='project_list'),
     path('projects/<uuid:project_id>/', views.project_detail, name='project_detail'),
     path('projects/<uuid:project_id>/delete/', views.project_delete, name='project_delete'),
+    path('projects/<uuid:project_id>/regenerate/', views.project_regenerate, name='project_regenerate'),
     path('runs/<uuid:run_id>/', views.run_detail, name='run_detail'),
+    path('runs/<uuid:run_id>/events/', views.run_events, name='run_events'),
     path('runs/<uuid:run_id>/execute/', views.execute_run, name='execute_run'),
     path('runs/<uuid:run_id>/report/', views.run_report, name='run_report'),
     path('runs/<uuid:run_id>/share/', views.toggle_share, name='toggle_share'),
@@ -4,14 +4,34 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Avg
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
 from django.views.decorators.http import require_POST
 
 from django_ratelimit.decorators import ratelimit
 from apps.core.analytics import track
-from .ai_service import generate_test_cases
 from .executor import run_test_execution_smart
 from .forms import TestProjectForm
-from .models import ScheduleFrequency, ScheduledTest, TestCase, TestProject, TestRun
+from .models import ScheduleFrequency, ScheduledTest, TestProject, TestRun
+from .scheduling import next_cron_run
+from .services import create_rerun, generate_into_run, start_generation
+from .signals import run_status_changed
+
+
+def _generate_run(project, user, regenerate=False):
+    """
+    Cria o run em 'generating' e gera os casos em background (streaming);
+    sem broker, gera de forma síncrona. Retorna (run, em_background).
+    """
+    run = start_generation(project, user)
+    try:
+        from .tasks import generate_run_cases
+        task = generate_run_cases.delay(str(run.id), regenerate)
+        run.celery_task_id = task.id
+        run.save(update_fields=['celery_task_id'])
+        return run, True
+    except Exception:
+        # Redis offline: fallback síncrono
+        return generate_into_run(run, regenerate=regenerate), False
 
 
 @login_required
@@ -37,35 +57,7 @@ def new_test(request):
             project.save()
 
             # Generate test cases via AI / mock
-            result = generate_test_cases(
-                base_url=project.base_url,
-                test_type=project.test_type,
-                special_instructions=project.special_instructions,
-            )
-
-            # Create TestRun
-            run = TestRun.objects.create(
-                project=project,
-                triggered_by=request.user,
-                status='pending',
-                ai_model_used=result.get('model_used', ''),
-                ai_summary=result.get('test_strategy', ''),
-            )
-
-            # Create TestCases
-            test_cases = result.get('test_cases', [])
-            for i, tc in enumerate(test_cases):
-                TestCase.objects.create(
-                    run=run,
-                    title=tc.get('title', f'Test Case {i + 1}'),
-                    description=tc.get('description', ''),
-                    category=tc.get('category', ''),
-                    steps=tc.get('steps', []),
-                    order=i,
-                )
-
-            run.total_cases = len(test_cases)
-            run.save(update_fields=['total_cases'])
+            run, in_background = _generate_run(project, request.user)
 
             track(str(request.user.id), 'test_run_created', {
                 'test_type': project.test_type,
@@ -77,7 +69,10 @@ def new_test(request):
                 request.user.onboarding_completed = True
                 request.user.save(update_fields=['onboarding_completed'])
 
-            messages.success(request, f'{len(test_cases)} test cases generated for "{project.name}".')
+            if in_background:
+                messages.info(request, f'Gerando casos de teste para "{project.name}"...')
+            else:
+                messages.success(request, f'{run.total_cases} test cases generated for "{project.name}".')
             return redirect('testing:run_detail', run_id=run.id)
     else:
         form = TestProjectForm()
@@ -113,6 +108,21 @@ def run_detail(request, run_id):
     })
 
 
+async def run_events(request, run_id):
+    """Stream SSE do run para a página de detalhe — substitui o auto-refresh durante a execução."""
+    from django.http import Http404, HttpResponse
+
+    from .events import load_status, stream_response
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    payload = await load_status(run_id, request.workspace)
+    if payload is None:
+        raise Http404
+    return stream_response(run_id, request.workspace, payload)
+
+
 @login_required
 @ratelimit(key='user', rate='10/m', block=True)
 def execute_run(request, run_id):
@@ -127,18 +137,28 @@ def execute_run(request, run_id):
         project__workspace=workspace,
     )
 
+    if run.status == 'generating':
+        messages.info(request, 'Os casos ainda estão sendo gerados.')
+        return redirect('testing:run_detail', run_id=run.id)
+
     from apps.workspaces.quota import check_quota
     quota = check_quota(workspace, 'runs')
     if quota['exceeded']:
         messages.error(request, f'Limite de {quota["limit"]} {quota["label"]} atingido este mês. Faça upgrade para continuar.')
         return redirect('billing:pricing')
 
+    # Só o primeiro clique enfileira; os repetidos encontram o run fora de 'pending'
+    if not TestRun.objects.filter(id=run.id, status='pending').update(status='running'):
+        messages.info(request, 'Este run já está em execução.')
+        return redirect('testing:run_detail', run_id=run.id)
+    run.status = 'running'
+    run_status_changed(run)
+
     try:
-        from .tasks import run_test_execution
-        task = run_test_execution.delay(str(run.id))
+        from .queues import INTERACTIVE, enqueue_run
+        task = enqueue_run(run, INTERACTIVE)
         run.celery_task_id = task.id
-        run.status = 'running'
-        run.save(update_fields=['celery_task_id', 'status'])
+        run.save(update_fields=['celery_task_id'])
         messages.info(request, 'Execução iniciada em background...')
     except Exception:
         # Redis offline: fallback síncrono
@@ -163,23 +183,17 @@ def project_list(request):
 
     projects = TestProject.objects.filter(
         workspace=workspace, is_active=True,
-    ).prefetch_related('runs')
-
-    # Enrich with stats
-    project_data = []
-    for project in projects:
-        runs = project.runs.all()
-        total_runs = runs.count()
-        completed_runs = runs.exclude(status__in=['pending', 'running'])
-        avg_pass_rate = None
-        if completed_runs.exists():
-            total = sum(r.pass_rate for r in completed_runs)
-            avg_pass_rate = round(total / completed_runs.count(), 1)
-        project_data.append({
+    ).select_related('last_run').prefetch_related('schedules')
+
+    # Stats desnormalizadas no próprio projeto — sem query por projeto
+    project_data = [
+        {
             'project': project,
-            'total_runs': total_runs,
-            'avg_pass_rate': avg_pass_rate,
-        })
+            'total_runs': project.total_runs,
+            'avg_pass_rate': project.average_pass_rate,
+        }
+        for project in projects
+    ]
 
     return render(request, 'testing/project_list.html', {
         'project_data': project_data,
@@ -246,21 +260,34 @@ def project_detail(request, project_id):
         for r in reversed(runs_list)
     ]
     stats = {
-        'total_runs': runs.count(),
+        'total_runs': project.total_runs,
         'avg_pass_rate': round(sum(r.pass_rate for r in runs_list) / len(runs_list)) if runs_list else 0,
-        'last_run': runs.first(),
+        'last_run': runs_list[0] if runs_list else None,
         'best_run': max(runs_list, key=lambda r: r.pass_rate) if runs_list else None,
     }
     schedules = ScheduledTest.objects.filter(project=project)
     return render(request, 'testing/project_detail.html', {
         'project': project,
-        'runs': runs,
+        'runs': runs_list,
         'stats': stats,
         'schedules': schedules,
         'pass_rate_history_json': json.dumps(pass_rate_history),
     })
 
 
+@login_required
+@require_POST
+def project_regenerate(request, project_id):
+    """Gera um novo conjunto de casos ignorando o cache de geração da IA."""
+    project = get_object_or_404(TestProject, id=project_id, workspace=request.workspace)
+    run, in_background = _generate_run(project, request.user, regenerate=True)
+    if in_background:
+        messages.info(request, f'Regenerando casos de teste para "{project.name}"...')
+    else:
+        messages.success(request, f'{run.total_cases} test cases regenerated for "{project.name}".')
+    return redirect('testing:run_detail', run_id=run.id)
+
+
 @login_required
 @require_POST
 def project_delete(request, project_id):
@@ -284,27 +311,46 @@ def schedule_create(request, project_id):
     project = get_object_or_404(TestProject, id=project_id, workspace=request.workspace)
     if request.method == 'POST':
         frequency = request.POST.get('frequency', 'daily')
+        if frequency not in ScheduleFrequency.values:
+            frequency = ScheduleFrequency.DAILY
+        cron_expression = request.POST.get('cron_expression', '').strip() if frequency == 'cron' else ''
         notify_email = request.POST.get('notify_email') == 'on'
         notify_failure_only = request.POST.get('notify_on_failure_only') == 'on'
+        if frequency == 'cron':
+            try:
+                next_cron_run(cron_expression, timezone.now())
+            except ValueError as e:
+                messages.error(request, str(e))
+                return render(request, 'testing/schedule_form.html', {
+                    'project': project,
+                    'frequencies': ScheduleFrequency.choices,
+                    'frequency': frequency,
+                    'cron_expression': cron_expression,
+                })
         schedule, created = ScheduledTest.objects.get_or_create(
             project=project,
             defaults={
                 'created_by': request.user,
                 'frequency': frequency,
+                'cron_expression': cron_expression,
                 'notify_email': notify_email,
                 'notify_on_failure_only': notify_failure_only,
             },
         )
         if not created:
             schedule.frequency = frequency
+            schedule.cron_expression = cron_expression
             schedule.notify_email = notify_email
             schedule.notify_on_failure_only = notify_failure_only
             schedule.save()
         schedule.calculate_next_run()
         messages.success(request, f'Agendamento {frequency} configurado!')
         return redirect('testing:schedule_list')
+    schedule = project.schedules.first()
     return render(request, 'testing/schedule_form.html', {
         'project': project,
+        'frequency': schedule.frequency if schedule else ScheduleFrequency.DAILY,
+        'cron_expression': schedule.cron_expression if schedule else '',
         'frequencies': ScheduleFrequency.choices,
     })
 
@@ -314,38 +360,19 @@ def schedule_create(request, project_id):
 def rerun_failed(request, run_id):
     """Cria novo run com apenas os casos falhos do run original."""
     original_run = get_object_or_404(TestRun, id=run_id, project__workspace=request.workspace)
-    failed_cases = original_run.cases.filter(status='failed')
-    if not failed_cases.exists():
+    new_run = create_rerun(original_run, request.user)
+    if new_run is None:
         messages.warning(request, 'Nenhum teste falho para re-executar.')
         return redirect('testing:run_detail', run_id=run_id)
 
-    new_run = TestRun.objects.create(
-        project=original_run.project,
-        triggered_by=request.user,
-        status='pending',
-        total_cases=failed_cases.count(),
-        passed_cases=0,
-        failed_cases=0,
-        ai_summary=f'Re-run de falhos do run {str(original_run.id)[:8]}',
-    )
-    for case in failed_cases:
-        TestCase.objects.create(
-            run=new_run,
-            title=case.title,
-            description=case.description,
-            category=case.category,
-            steps=case.steps,
-            status='pending',
-            order=case.order,
-        )
     try:
-        from .tasks import run_test_execution
-        run_test_execution.delay(str(new_run.id))
+        from .queues import RERUN, enqueue_run
+        enqueue_run(new_run, RERUN)
         new_run.celery_task_id = 'queued'
         new_run.save(update_fields=['celery_task_id'])
     except Exception:
         run_test_execution_smart(new_run)
-    messages.success(request, f'Re-executando {failed_cases.count()} teste(s) falho(s).')
+    messages.success(request, f'Re-executando {new_run.total_cases} teste(s) falho(s).')
     return redirect('testing:run_detail', run_id=new_run.id)
 
 
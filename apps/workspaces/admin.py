@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Workspace, WorkspaceInvitation, WorkspaceMembership
+from .models import NotificationOutbox, Workspace, WorkspaceInvitation, WorkspaceMembership
 
 
 class WorkspaceMembershipInline(admin.TabularInline):
@@ -30,3 +30,10 @@ class WorkspaceInvitationAdmin(admin.ModelAdmin):
     list_display = ('email', 'workspace', 'role', 'accepted', 'expires_at')
     list_filter = ('accepted', 'role')
     raw_id_fields = ('workspace', 'invited_by')
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'workspace', 'status', 'attempts', 'latency_ms', 'created_at', 'sent_at')
+    list_filter = ('status', 'channel')
+    raw_id_fields = ('workspace', 'run')
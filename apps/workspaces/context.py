@@ -0,0 +1,85 @@
+"""
+Contexto do workspace resolvido uma vez por request (middleware): workspace,
+role do usuário e limites do plano. Workspace e role ficam no cache
+compartilhado — uma ida ao cache por request em vez de duas queries — e são
+invalidados pelos signals de Workspace/WorkspaceMembership (plano, nome,
+entrada/saída de membros, troca de role).
+"""
+from django.core.cache import cache
+
+from apps.core.cache import workspace_key
+
+# Só a sessão/usuário é resolvida nesses paths — nada de workspace
+SKIP_PREFIXES = ('/static/', '/media/', '/health', '/favicon.ico')
+
+CONTEXT_TTL = 60 * 10
+
+
+def _workspace_cache_key(workspace_id):
+    return workspace_key(workspace_id, 'ctx', 'workspace')
+
+
+def _role_cache_key(workspace_id, user_id):
+    return workspace_key(workspace_id, 'ctx', 'role', user_id)
+
+
+class WorkspaceContext:
+    """O que as views precisam saber do workspace atual sem voltar ao banco."""
+
+    __slots__ = ('workspace', 'role', 'limits')
+
+    def __init__(self, workspace, role):
+        self.workspace = workspace
+        self.role = role
+        self.limits = workspace.get_plan_limits()
+
+    @property
+    def is_owner(self):
+        return self.role == 'owner'
+
+    @property
+    def is_admin_or_owner(self):
+        return self.role in ('owner', 'admin')
+
+
+def _build(user, workspace, role, store=True):
+    if store:
+        cache.set_many({
+            _workspace_cache_key(workspace.id): workspace,
+            _role_cache_key(workspace.id, user.pk): role,
+        }, CONTEXT_TTL)
+    workspace.remember_member_role(user, role)
+    return WorkspaceContext(workspace, role)
+
+
+def resolve_workspace_context(user, workspace_id=None):
+    """
+    Contexto do workspace `workspace_id` (da sessão) se o usuário ainda for
+    membro; senão do primeiro workspace dele (o pessoal). None se não houver.
+    """
+    from .models import WorkspaceMembership
+
+    if workspace_id:
+        workspace_ck, role_ck = _workspace_cache_key(workspace_id), _role_cache_key(workspace_id, user.pk)
+        cached = cache.get_many([workspace_ck, role_ck])
+        if workspace_ck in cached and role_ck in cached:
+            return _build(user, cached[workspace_ck], cached[role_ck], store=False)
+
+        membership = WorkspaceMembership.objects.select_related('workspace').filter(
+            workspace_id=workspace_id, user=user,
+        ).first()
+        if membership:
+            return _build(user, membership.workspace, membership.role)
+
+    membership = user.memberships.select_related('workspace').first()
+    if membership:
+        return _build(user, membership.workspace, membership.role)
+    return None
+
+
+def invalidate_workspace_context(workspace_id, user_id=None):
+    """Sem user_id: o workspace (plano, nome...); com user_id: o role desse membro."""
+    if user_id is None:
+        cache.delete(_workspace_cache_key(workspace_id))
+    else:
+        cache.delete(_role_cache_key(workspace_id, user_id))
@@ -1,35 +1,30 @@
-class CurrentWorkspaceMiddleware:
+from django.utils.deprecation import MiddlewareMixin
+
+
+class CurrentWorkspaceMiddleware(MiddlewareMixin):
     """
     Resolve o workspace atual da requisição.
     Prioridade: session > primeiro workspace do user.
-    Injeta request.workspace para uso em views e templates.
+    Injeta request.workspace e request.workspace_context (workspace, role e
+    limites do plano, ver context.py) para uso em views e templates.
+    Paths de arquivos estáticos/health não resolvem nada.
     """
-    def __init__(self, get_response):
-        self.get_response = get_response
+    def process_request(self, request):
+        from .context import SKIP_PREFIXES, resolve_workspace_context
 
-    def __call__(self, request):
         request.workspace = None
+        request.workspace_context = None
 
-        if request.user.is_authenticated:
-            # Tentar recuperar da sessão
-            workspace_id = request.session.get('current_workspace_id')
-
-            if workspace_id:
-                from apps.workspaces.models import Workspace
-                try:
-                    request.workspace = Workspace.objects.get(
-                        id=workspace_id,
-                        members=request.user,
-                    )
-                except Workspace.DoesNotExist:
-                    request.session.pop('current_workspace_id', None)
+        if request.path.startswith(SKIP_PREFIXES) or not request.user.is_authenticated:
+            return
 
-            if not request.workspace:
-                # Pegar primeiro workspace (pessoal)
-                membership = request.user.memberships.select_related('workspace').first()
-                if membership:
-                    request.workspace = membership.workspace
-                    request.session['current_workspace_id'] = str(request.workspace.id)
+        workspace_id = request.session.get('current_workspace_id')
+        context = resolve_workspace_context(request.user, workspace_id)
+        if context is None:
+            request.session.pop('current_workspace_id', None)
+            return
 
-        response = self.get_response(request)
-        return response
+        request.workspace = context.workspace
+        request.workspace_context = context
+        if workspace_id != str(context.workspace.id):
+            request.session['current_workspace_id'] = str(context.workspace.id)
@@ -26,6 +26,8 @@ PLAN_LIMITS = {
         'video_retention_days': 7,
         'api_access': False,
         'scheduling': False,
+        'browser_contexts': 1,
+        'concurrent_runs': 1,
     },
     Plan.PRO: {
         'test_runs': 1000,
@@ -34,6 +36,8 @@ PLAN_LIMITS = {
         'video_retention_days': 30,
         'api_access': True,
         'scheduling': True,
+        'browser_contexts': 3,
+        'concurrent_runs': 3,
     },
     Plan.ENTERPRISE: {
         'test_runs': -1,  # unlimited
@@ -42,6 +46,8 @@ PLAN_LIMITS = {
         'video_retention_days': 90,
         'api_access': True,
         'scheduling': True,
+        'browser_contexts': 6,
+        'concurrent_runs': 10,
     },
 }
 
@@ -99,12 +105,24 @@ class Workspace(models.Model):
     def __str__(self):
         return f"{self.name} ({self.plan})"
 
+    def __getstate__(self):
+        # O memo de roles é da request; não vai para o cache
+        state = super().__getstate__()
+        state.pop('_member_roles', None)
+        return state
+
     def get_member_role(self, user):
-        """Retorna o role do usuário neste workspace."""
-        try:
-            return self.memberships.get(user=user).role
-        except WorkspaceMembership.DoesNotExist:
-            return None
+        """Retorna o role do usuário neste workspace (memoizado na instância)."""
+        roles = self.__dict__.setdefault('_member_roles', {})
+        if user.pk not in roles:
+            try:
+                roles[user.pk] = self.memberships.get(user=user).role
+            except WorkspaceMembership.DoesNotExist:
+                roles[user.pk] = None
+        return roles[user.pk]
+
+    def remember_member_role(self, user, role):
+        self.__dict__.setdefault('_member_roles', {})[user.pk] = role
 
     def is_owner(self, user):
         return self.get_member_role(user) == WorkspaceRole.OWNER
@@ -239,3 +257,52 @@ class WorkspaceInvitation(models.Model):
 
     def __str__(self):
         return f"Convite: {self.email} → {self.workspace.name}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Notificação de run pendente de envio (Slack/Discord).
+
+    O fim da execução só grava a linha; o envio acontece no dispatcher
+    (workspaces.tasks), que agrupa rajadas por workspace e faz retry.
+    """
+
+    class Channel(models.TextChoices):
+        SLACK = 'slack', 'Slack'
+        DISCORD = 'discord', 'Discord'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    workspace = models.ForeignKey(
+        Workspace,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+    )
+    run = models.ForeignKey(
+        'testing.TestRun',
+        on_delete=models.CASCADE,
+        related_name='notifications',
+    )
+    channel = models.CharField(max_length=10, choices=Channel.choices)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Próxima tentativa (pending) ou prazo do claim (sending)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.CharField(max_length=255, blank=True, default='')
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Notificação'
+        verbose_name_plural = 'Notificações'
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.channel} {self.run_id} [{self.status}]"
@@ -1,15 +1,57 @@
 import httpx
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
 logger = logging.getLogger('spritetest.notifications')
 
+# Quantos runs entram, no máximo, numa mensagem agrupada
+DIGEST_MAX_RUNS = 10
+# Prazo de um claim 'sending' antes de voltar para 'pending' (worker morreu no meio)
+CLAIM_TIMEOUT = timedelta(minutes=5)
 
-def send_slack_notification(webhook_url: str, run) -> bool:
-    if not webhook_url:
-        return False
+_client = None
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_client():
+    """httpx.Client compartilhado pelo processo (keep-alive entre envios)."""
+    global _client
+    if _client is None:
+        from django.conf import settings
+
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(
+                    timeout=settings.NOTIFY_TIMEOUT_SECS,
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                )
+    return _client
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        from django.conf import settings
+
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.NOTIFY_MAX_WORKERS, thread_name_prefix='notify',
+                )
+    return _executor
+
+
+def _status_emoji(status):
+    return '✅' if status == 'passed' else '❌'
+
+
+def slack_payload(run) -> dict:
     color = '#a3e635' if run.status == 'passed' else '#f87171'
-    status_emoji = '\u2705' if run.status == 'passed' else '\u274c'
-    payload = {
+    return {
         'attachments': [{
             'color': color,
             'blocks': [
@@ -17,7 +59,7 @@ def send_slack_notification(webhook_url: str, run) -> bool:
                     'type': 'section',
                     'text': {
                         'type': 'mrkdwn',
-                        'text': f"{status_emoji} *{run.project.name}* \u2014 {run.pass_rate}% pass rate",
+                        'text': f"{_status_emoji(run.status)} *{run.project.name}* — {run.pass_rate}% pass rate",
                     },
                 },
                 {
@@ -25,52 +67,269 @@ def send_slack_notification(webhook_url: str, run) -> bool:
                     'fields': [
                         {'type': 'mrkdwn', 'text': f"*Status:* {run.status.upper()}"},
                         {'type': 'mrkdwn', 'text': f"*URL:* {run.project.base_url}"},
-                        {'type': 'mrkdwn', 'text': f"*Testes:* {run.passed_cases}\u2713 {run.failed_cases}\u2717 de {run.total_cases}"},
-                        {'type': 'mrkdwn', 'text': f"*Dura\u00e7\u00e3o:* {run.duration_secs}s"},
+                        {'type': 'mrkdwn', 'text': f"*Testes:* {run.passed_cases}✓ {run.failed_cases}✗ de {run.total_cases}"},
+                        {'type': 'mrkdwn', 'text': f"*Duração:* {run.duration_secs}s"},
                     ],
                 },
             ],
         }],
     }
-    try:
-        r = httpx.post(webhook_url, json=payload, timeout=10)
-        return r.status_code == 200
-    except Exception as e:
-        logger.error(f"Slack failed: {e}")
-        return False
 
 
-def send_discord_notification(webhook_url: str, run) -> bool:
-    if not webhook_url:
-        return False
+def slack_digest_payload(runs) -> dict:
+    """Uma mensagem para vários runs que terminaram juntos."""
+    failed = sum(1 for run in runs if run.status != 'passed')
+    lines = [
+        f"{_status_emoji(run.status)} *{run.project.name}* — {run.pass_rate}% "
+        f"({run.passed_cases}✓ {run.failed_cases}✗)"
+        for run in runs[:DIGEST_MAX_RUNS]
+    ]
+    if len(runs) > DIGEST_MAX_RUNS:
+        lines.append(f"… e mais {len(runs) - DIGEST_MAX_RUNS} run(s)")
+    return {
+        'attachments': [{
+            'color': '#f87171' if failed else '#a3e635',
+            'blocks': [
+                {
+                    'type': 'section',
+                    'text': {'type': 'mrkdwn', 'text': f"*{len(runs)} runs concluídos* — {failed} com falha"},
+                },
+                {'type': 'section', 'text': {'type': 'mrkdwn', 'text': '\n'.join(lines)}},
+            ],
+        }],
+    }
+
+
+def discord_payload(run) -> dict:
     color = 0xa3e635 if run.status == 'passed' else 0xf87171
-    status_emoji = '\u2705' if run.status == 'passed' else '\u274c'
-    payload = {
+    return {
         'embeds': [{
-            'title': f"{status_emoji} {run.project.name}",
+            'title': f"{_status_emoji(run.status)} {run.project.name}",
             'color': color,
             'fields': [
                 {'name': 'Status', 'value': run.status.upper(), 'inline': True},
                 {'name': 'Pass Rate', 'value': f"{run.pass_rate}%", 'inline': True},
-                {'name': 'Testes', 'value': f"{run.passed_cases}\u2713 {run.failed_cases}\u2717 / {run.total_cases}", 'inline': True},
+                {'name': 'Testes', 'value': f"{run.passed_cases}✓ {run.failed_cases}✗ / {run.total_cases}", 'inline': True},
                 {'name': 'URL', 'value': run.project.base_url, 'inline': False},
             ],
             'footer': {'text': 'SpriteTest'},
         }],
     }
+
+
+def discord_digest_payload(runs) -> dict:
+    failed = sum(1 for run in runs if run.status != 'passed')
+    fields = [
+        {
+            'name': f"{_status_emoji(run.status)} {run.project.name}",
+            'value': f"{run.pass_rate}% — {run.passed_cases}✓ {run.failed_cases}✗ / {run.total_cases}",
+            'inline': False,
+        }
+        for run in runs[:DIGEST_MAX_RUNS]
+    ]
+    return {
+        'embeds': [{
+            'title': f"{len(runs)} runs concluídos — {failed} com falha",
+            'color': 0xf87171 if failed else 0xa3e635,
+            'fields': fields,
+            'footer': {'text': 'SpriteTest'},
+        }],
+    }
+
+
+PAYLOADS = {
+    'slack': (slack_payload, slack_digest_payload),
+    'discord': (discord_payload, discord_digest_payload),
+}
+
+
+def _post(webhook_url: str, payload: dict):
+    """
+    POST no webhook com o client compartilhado.
+
+    Returns:
+        (ok, latency_ms, erro, retry_after_secs ou None)
+    """
+    started = time.monotonic()
     try:
-        r = httpx.post(webhook_url, json=payload, timeout=10)
-        return r.status_code in [200, 204]
+        r = _get_client().post(webhook_url, json=payload)
     except Exception as e:
-        logger.error(f"Discord failed: {e}")
+        return False, int((time.monotonic() - started) * 1000), f"{type(e).__name__}: {e}", None
+    latency_ms = int((time.monotonic() - started) * 1000)
+    if r.is_success:
+        return True, latency_ms, '', None
+    retry_after = r.headers.get('retry-after')
+    return False, latency_ms, f"HTTP {r.status_code}", int(retry_after) if retry_after and retry_after.isdigit() else None
+
+
+def send_slack_notification(webhook_url: str, run) -> bool:
+    if not webhook_url:
         return False
+    ok, _, error, _ = _post(webhook_url, slack_payload(run))
+    if not ok:
+        logger.error(f"Slack failed: {error}")
+    return ok
+
 
+def send_discord_notification(webhook_url: str, run) -> bool:
+    if not webhook_url:
+        return False
+    ok, _, error, _ = _post(webhook_url, discord_payload(run))
+    if not ok:
+        logger.error(f"Discord failed: {error}")
+    return ok
+
+
+def enqueue_run_notifications(run) -> int:
+    """
+    Grava no outbox uma notificação por canal configurado no workspace e
+    agenda o dispatcher. Não faz I/O de rede — seguro no fim da execução.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import NotificationOutbox
 
-def send_run_notifications(run) -> dict:
     workspace = run.project.workspace
-    results = {}
-    if workspace.slack_webhook_url:
-        results['slack'] = send_slack_notification(workspace.slack_webhook_url, run)
-    if workspace.discord_webhook_url:
-        results['discord'] = send_discord_notification(workspace.discord_webhook_url, run)
-    return results
+    channels = [
+        channel for channel, url in (
+            (NotificationOutbox.Channel.SLACK, workspace.slack_webhook_url),
+            (NotificationOutbox.Channel.DISCORD, workspace.discord_webhook_url),
+        ) if url
+    ]
+    if not channels:
+        return 0
+
+    now = timezone.now()
+    NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(workspace=workspace, run=run, channel=channel, next_attempt_at=now)
+        for channel in channels
+    ])
+    transaction.on_commit(lambda: schedule_dispatch(workspace.id))
+    return len(channels)
+
+
+def schedule_dispatch(workspace_id):
+    """
+    Agenda um dispatch do workspace ao fim da janela de agrupamento. Só o
+    primeiro run da janela agenda; os seguintes entram na mesma mensagem.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    from apps.core.cache import workspace_key
+
+    window = settings.NOTIFY_COALESCE_SECS
+    key = workspace_key(workspace_id, 'notify', 'dispatch')
+    if not cache.add(key, 1, timeout=window):
+        return
+    try:
+        from .tasks import dispatch_notifications
+        dispatch_notifications.apply_async(args=[str(workspace_id)], countdown=window)
+    except Exception:
+        # Redis offline: envia agora
+        cache.delete(key)
+        dispatch_pending(workspace_id)
+
+
+def release_stale_claims() -> int:
+    """Devolve para 'pending' claims cujo worker não terminou o envio."""
+    from django.utils import timezone
+
+    from .models import NotificationOutbox
+
+    return NotificationOutbox.objects.filter(
+        status=NotificationOutbox.Status.SENDING,
+        next_attempt_at__lte=timezone.now(),
+    ).update(status=NotificationOutbox.Status.PENDING)
+
+
+def _claim(workspace_id, limit):
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import NotificationOutbox
+
+    now = timezone.now()
+    with transaction.atomic():
+        due = NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+            status=NotificationOutbox.Status.PENDING, next_attempt_at__lte=now,
+        )
+        if workspace_id:
+            due = due.filter(workspace_id=workspace_id)
+        ids = list(due.order_by('next_attempt_at').values_list('id', flat=True)[:limit])
+        NotificationOutbox.objects.filter(id__in=ids).update(
+            status=NotificationOutbox.Status.SENDING, next_attempt_at=now + CLAIM_TIMEOUT,
+        )
+    return list(
+        NotificationOutbox.objects.filter(id__in=ids).select_related('workspace', 'run__project')
+    )
+
+
+def dispatch_pending(workspace_id=None, limit=200) -> dict:
+    """
+    Envia as notificações vencidas do outbox.
+
+    Agrupa por (workspace, canal) — vários runs viram uma mensagem só — e
+    envia os grupos em paralelo pelo client compartilhado. Falhas voltam para
+    'pending' com backoff exponencial até NOTIFY_MAX_ATTEMPTS.
+    """
+    from django.conf import settings
+    from django.utils import timezone
+
+    from .models import NotificationOutbox
+
+    items = _claim(workspace_id, limit)
+    if not items:
+        return {'sent': 0, 'retry': 0, 'failed': 0}
+
+    groups = {}
+    for item in items:
+        groups.setdefault((item.workspace_id, item.channel), []).append(item)
+
+    jobs = []
+    for (_, channel), group in groups.items():
+        workspace = group[0].workspace
+        url = workspace.slack_webhook_url if channel == 'slack' else workspace.discord_webhook_url
+        single, digest = PAYLOADS[channel]
+        runs = [item.run for item in group]
+        payload = single(runs[0]) if len(runs) == 1 else digest(runs)
+        jobs.append((group, url, payload))
+
+    executor = _get_executor()
+    futures = [
+        executor.submit(_post, url, payload) if url else None
+        for _, url, payload in jobs
+    ]
+
+    now = timezone.now()
+    counts = {'sent': 0, 'retry': 0, 'failed': 0}
+    for (group, url, _), future in zip(jobs, futures):
+        if future is None:
+            ok, latency_ms, error, retry_after = False, None, 'webhook removido', None
+        else:
+            ok, latency_ms, error, retry_after = future.result()
+        for item in group:
+            item.attempts += 1
+            item.latency_ms = latency_ms
+            item.last_error = error[:255]
+            if ok:
+                item.status = NotificationOutbox.Status.SENT
+                item.sent_at = now
+            elif url and item.attempts < settings.NOTIFY_MAX_ATTEMPTS:
+                delay = retry_after or settings.NOTIFY_RETRY_BASE_SECS * 2 ** (item.attempts - 1)
+                item.status = NotificationOutbox.Status.PENDING
+                item.next_attempt_at = now + timedelta(seconds=min(delay, 3600))
+            else:
+                item.status = NotificationOutbox.Status.FAILED
+        outcome = 'sent' if ok else ('retry' if group[0].status == NotificationOutbox.Status.PENDING else 'failed')
+        counts[outcome] += len(group)
+        logger.info(
+            "Notificação %s: %s run(s) workspace=%s %s latency=%sms %s",
+            group[0].channel, len(group), group[0].workspace_id, outcome, latency_ms, error,
+        )
+
+    NotificationOutbox.objects.bulk_update(
+        items, ['status', 'attempts', 'next_attempt_at', 'last_error', 'latency_ms', 'sent_at'],
+    )
+    return counts
@@ -1,47 +1,113 @@
+from django.db.models import Case, Count, F, Q, Value, When
 from django.utils import timezone
 
 
+class QuotaExceeded(Exception):
+    """O workspace não tem mais runs disponíveis no mês."""
+
+
+def month_start(now=None):
+    now = now or timezone.now()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def consume_run_quota(workspace_id, limit=None) -> bool:
+    """
+    Conta um run no contador do mês (runs_this_month) num único UPDATE
+    atômico; na virada do mês o contador recomeça em 1. Com `limit`, o UPDATE
+    só acontece se ainda houver quota — runs criados em paralelo nunca passam
+    do limite. Retorna False se a quota acabou.
+    """
+    from .models import Workspace
+
+    start = month_start()
+    workspaces = Workspace.objects.filter(pk=workspace_id)
+    if limit is not None:
+        workspaces = workspaces.filter(
+            Q(runs_reset_at__isnull=True) | Q(runs_reset_at__lt=start) | Q(runs_this_month__lt=limit)
+        )
+    return workspaces.update(
+        runs_this_month=Case(
+            When(runs_reset_at__gte=start, then=F('runs_this_month') + 1),
+            default=Value(1),
+        ),
+        runs_reset_at=start,
+    ) == 1
+
+
+def runs_used(workspace) -> int:
+    """Runs do mês pelo contador — uma leitura por PK, sem COUNT."""
+    from .models import Workspace
+
+    row = Workspace.objects.filter(pk=workspace.pk).values('runs_this_month', 'runs_reset_at').first()
+    if not row or not row['runs_reset_at'] or row['runs_reset_at'] < month_start():
+        return 0
+    return row['runs_this_month']
+
+
+def _projects_used(workspace) -> int:
+    from apps.testing.models import TestProject
+
+    return TestProject.objects.filter(workspace=workspace, is_active=True).count()
+
+
+def _members_used(workspace) -> int:
+    return workspace.memberships.count()
+
+
 def get_workspace_usage(workspace):
-    from apps.testing.models import TestRun, TestProject
-
-    now = timezone.now()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    runs_this_month = TestRun.objects.filter(
-        project__workspace=workspace,
-        created_at__gte=month_start,
-    ).count()
-    total_projects = TestProject.objects.filter(
-        workspace=workspace, is_active=True,
-    ).count()
-    total_members = workspace.memberships.count()
     return {
-        'runs_this_month': runs_this_month,
-        'total_projects': total_projects,
-        'total_members': total_members,
+        'runs_this_month': runs_used(workspace),
+        'total_projects': _projects_used(workspace),
+        'total_members': _members_used(workspace),
     }
 
 
+_RESOURCES = {
+    'runs': (runs_used, 'test runs este mês'),
+    'projects': (_projects_used, 'projetos ativos'),
+    'members': (_members_used, 'membros no workspace'),
+}
+
+
 def check_quota(workspace, resource: str) -> dict:
-    limits = workspace.get_plan_limits()
-    usage = get_workspace_usage(workspace)
-    checks = {
-        'runs': {
-            'used': usage['runs_this_month'],
-            'limit': limits['runs'],
-            'exceeded': usage['runs_this_month'] >= limits['runs'],
-            'label': 'test runs este mês',
-        },
-        'projects': {
-            'used': usage['total_projects'],
-            'limit': limits['projects'],
-            'exceeded': usage['total_projects'] >= limits['projects'],
-            'label': 'projetos ativos',
-        },
-        'members': {
-            'used': usage['total_members'],
-            'limit': limits['members'],
-            'exceeded': usage['total_members'] >= limits['members'],
-            'label': 'membros no workspace',
-        },
+    """Uso x limite do plano só do recurso pedido (runs: O(1) pelo contador)."""
+    if resource not in _RESOURCES:
+        return {'exceeded': False}
+    usage, label = _RESOURCES[resource]
+    used = usage(workspace)
+    limit = workspace.get_plan_limits()[resource]
+    return {
+        'used': used,
+        'limit': limit,
+        'exceeded': used >= limit,
+        'label': label,
     }
-    return checks.get(resource, {'exceeded': False})
+
+
+def reconcile_run_counters() -> int:
+    """
+    Acerta runs_this_month de todos os workspaces com o COUNT real dos runs
+    do mês (rede de segurança do contador; também faz a virada do mês de quem
+    não criou runs). Retorna quantos workspaces foram corrigidos.
+    """
+    from apps.testing.models import TestRun
+
+    from .models import Workspace
+
+    start = month_start()
+    actual = dict(
+        TestRun.objects.filter(created_at__gte=start)
+        .values('project__workspace')
+        .annotate(total=Count('id'))
+        .values_list('project__workspace', 'total')
+    )
+    changed = []
+    for workspace in Workspace.objects.only('id', 'runs_this_month', 'runs_reset_at'):
+        expected = actual.get(workspace.id, 0)
+        if workspace.runs_reset_at != start or workspace.runs_this_month != expected:
+            workspace.runs_this_month = expected
+            workspace.runs_reset_at = start
+            changed.append(workspace)
+    Workspace.objects.bulk_update(changed, ['runs_this_month', 'runs_reset_at'], batch_size=500)
+    return len(changed)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .context import invalidate_workspace_context
+from .models import Workspace, WorkspaceMembership
+
+
+@receiver(post_save, sender=Workspace)
+@receiver(post_delete, sender=Workspace)
+def invalidate_cached_workspace(sender, instance, **kwargs):
+    invalidate_workspace_context(instance.id)
+
+
+@receiver(post_save, sender=WorkspaceMembership)
+@receiver(post_delete, sender=WorkspaceMembership)
+def invalidate_cached_role(sender, instance, **kwargs):
+    invalidate_workspace_context(instance.workspace_id, instance.user_id)
@@ -0,0 +1,34 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger('spritetest.tasks')
+
+
+@shared_task(name='workspaces.dispatch_notifications')
+def dispatch_notifications(workspace_id: str = None):
+    """
+    Envia as notificações pendentes do outbox. Com workspace_id, é o dispatch
+    agendado ao fim da janela de agrupamento; sem, é a rede de segurança do beat
+    (retries vencidos e claims abandonados).
+    """
+    from .notifications import dispatch_pending, release_stale_claims
+
+    if workspace_id is None:
+        released = release_stale_claims()
+        if released:
+            logger.warning("Notificações: %s claims abandonados voltaram para pending", released)
+
+    counts = dispatch_pending(workspace_id)
+    return f"Notificações: {counts['sent']} enviadas, {counts['retry']} em retry, {counts['failed']} falharam"
+
+
+@shared_task(name='workspaces.reconcile_quota')
+def reconcile_quota():
+    """Confere os contadores de runs do mês com o COUNT real e corrige divergências."""
+    from .quota import reconcile_run_counters
+
+    fixed = reconcile_run_counters()
+    if fixed:
+        logger.info("Quota: %s workspace(s) com contador de runs corrigido", fixed)
+    return f"Quota: {fixed} contador(es) corrigido(s)"
@@ -1,3 +1,166 @@
+from unittest import mock
+
+import httpx
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+User = get_user_model()
+
+
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject, TestRun
+
+        self.user = User.objects.create_user(
+            username='notify', email='notify@test.com', password='NTpass123!'
+        )
+        self.workspace = self.user.workspaces.first()
+        self.workspace.slack_webhook_url = 'https://hooks.slack.test/x'
+        self.workspace.save()
+        project = TestProject.objects.create(
+            workspace=self.workspace, created_by=self.user, name='N', base_url='https://example.com',
+        )
+        self.runs = [
+            TestRun.objects.create(project=project, triggered_by=self.user, status=status, total_cases=2)
+            for status in ('passed', 'failed', 'passed')
+        ]
+        self.posts = []
+
+    def _use_transport(self, status_code):
+        from apps.workspaces import notifications
+
+        def handler(request):
+            self.posts.append(request)
+            return httpx.Response(status_code)
+
+        patcher = mock.patch.object(notifications, '_client', httpx.Client(transport=httpx.MockTransport(handler)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _enqueue_all(self):
+        from apps.workspaces.notifications import enqueue_run_notifications
+
+        with mock.patch('apps.workspaces.tasks.dispatch_notifications.apply_async') as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            for run in self.runs:
+                enqueue_run_notifications(run)
+        return apply_async
+
+    def test_burst_is_coalesced_into_one_message(self):
+        from apps.workspaces.models import NotificationOutbox
+        from apps.workspaces.notifications import dispatch_pending
+
+        self._use_transport(200)
+        apply_async = self._enqueue_all()
+        self.assertEqual(apply_async.call_count, 1)
+
+        counts = dispatch_pending(self.workspace.id)
+        self.assertEqual(counts['sent'], 3)
+        self.assertEqual(len(self.posts), 1)
+        self.assertIn(b'3 runs', self.posts[0].content)
+        self.assertFalse(NotificationOutbox.objects.exclude(status='sent').exists())
+        self.assertFalse(NotificationOutbox.objects.filter(latency_ms__isnull=True).exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        from apps.workspaces.models import NotificationOutbox
+        from apps.workspaces.notifications import dispatch_pending
+
+        self._use_transport(500)
+        self._enqueue_all()
+
+        counts = dispatch_pending()
+        self.assertEqual(counts['retry'], 3)
+        item = NotificationOutbox.objects.first()
+        self.assertEqual((item.status, item.attempts, item.last_error), ('pending', 1, 'HTTP 500'))
+        # Backoff: nada vencido numa segunda passada imediata
+        self.assertEqual(dispatch_pending()['retry'], 0)
+        self.assertEqual(len(self.posts), 1)
+
+
+class WorkspaceContextTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='ctx', email='ctx@test.com', password='CXpass123!'
+        )
+        self.workspace = self.user.workspaces.first()
+
+    def test_context_cached_and_invalidated_on_role_and_plan_change(self):
+        from apps.workspaces.context import resolve_workspace_context
+
+        context = resolve_workspace_context(self.user, str(self.workspace.id))
+        self.assertEqual((context.workspace, context.role), (self.workspace, 'owner'))
+
+        with self.assertNumQueries(0):
+            context = resolve_workspace_context(self.user, str(self.workspace.id))
+            # Memoizado a partir do contexto — views não voltam ao banco
+            self.assertEqual(context.workspace.get_member_role(self.user), 'owner')
+
+        membership = self.workspace.memberships.get(user=self.user)
+        membership.role = 'admin'
+        membership.save(update_fields=['role'])
+        self.workspace.plan = 'pro'
+        self.workspace.save()
+
+        context = resolve_workspace_context(self.user, str(self.workspace.id))
+        self.assertEqual(context.role, 'admin')
+        self.assertEqual(context.limits['runs'], 1000)
+
+    def test_falls_back_to_personal_workspace_after_leaving(self):
+        from apps.workspaces.context import resolve_workspace_context
+        from apps.workspaces.models import Workspace, WorkspaceMembership
+
+        other = Workspace.objects.create(name='Other')
+        WorkspaceMembership.objects.create(user=self.user, workspace=other, role='member')
+        self.assertEqual(resolve_workspace_context(self.user, str(other.id)).workspace, other)
+
+        other.memberships.filter(user=self.user).delete()
+        self.assertEqual(resolve_workspace_context(self.user, str(other.id)).workspace, self.workspace)
+
+
+class RunQuotaTest(TestCase):
+    def setUp(self):
+        from apps.testing.models import TestProject
+
+        self.user = User.objects.create_user(
+            username='quota', email='quota@test.com', password='QTpass123!'
+        )
+        self.workspace = self.user.workspaces.first()
+        self.project = TestProject.objects.create(
+            workspace=self.workspace, created_by=self.user, name='Q', base_url='https://example.com',
+        )
+
+    def test_counter_enforces_limit_and_rolls_over(self):
+        from datetime import timedelta
+
+        from apps.testing.services import materialize_run
+        from apps.workspaces.quota import QuotaExceeded, check_quota, month_start
+
+        self.workspace.runs_this_month = 49
+        self.workspace.runs_reset_at = month_start()
+        self.workspace.save()
+
+        materialize_run(self.project, self.user, [{'title': 'a'}], enforce_quota=True)
+        with self.assertNumQueries(1):
+            quota = check_quota(self.workspace, 'runs')
+        self.assertEqual((quota['used'], quota['exceeded']), (50, True))
+        with self.assertRaises(QuotaExceeded):
+            materialize_run(self.project, self.user, [{'title': 'b'}], enforce_quota=True)
+        self.assertEqual(self.project.runs.count(), 1)
+
+        # Contador do mês passado: o próximo run abre o mês em 1
+        self.workspace.runs_reset_at = month_start() - timedelta(days=40)
+        self.workspace.save()
+        self.assertEqual(check_quota(self.workspace, 'runs')['used'], 0)
+        materialize_run(self.project, self.user, [{'title': 'c'}], enforce_quota=True)
+        self.assertEqual(check_quota(self.workspace, 'runs')['used'], 1)
+
+    def test_reconcile_matches_real_count(self):
+        from apps.testing.models import TestRun
+        from apps.workspaces.quota import check_quota, reconcile_run_counters
+
+        TestRun.objects.create(project=self.project, triggered_by=self.user)
+        TestRun.objects.create(project=self.project, triggered_by=self.user)
+        self.assertEqual(check_quota(self.workspace, 'runs')['used'], 0)
+        self.assertGreaterEqual(reconcile_run_counters(), 1)
+        self.assertEqual(check_quota(self.workspace, 'runs')['used'], 2)
+        self.assertEqual(reconcile_run_counters(), 0)
@@ -26,8 +26,7 @@ def members(request):
 @login_required
 def workspace_settings(request):
     workspace = request.workspace
-    membership = workspace.memberships.filter(user=request.user).first()
-    is_owner = membership and membership.role == 'owner'
+    is_owner = request.workspace_context.is_owner
 
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -56,7 +55,7 @@ def workspace_settings(request):
         'workspace': workspace,
         'members': members_list,
         'is_owner': is_owner,
-        'plan_limits': workspace.get_plan_limits(),
+        'plan_limits': request.workspace_context.limits,
     })
 
 
@@ -94,12 +93,11 @@ def integrations(request):
 @login_required
 def invite_member(request):
     workspace = request.workspace
-    membership = workspace.memberships.filter(user=request.user).first()
-    if not membership or membership.role not in ['owner', 'admin']:
+    if not request.workspace_context.is_admin_or_owner:
         messages.error(request, 'Sem permissão para convidar membros.')
         return redirect('workspaces:settings')
 
-    limits = workspace.get_plan_limits()
+    limits = request.workspace_context.limits
     current_count = workspace.memberships.count()
     if current_count >= limits['members']:
         messages.error(
@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
 
@@ -15,6 +16,20 @@ app.conf.task_default_queue = 'default'
 app.conf.task_annotations = {
     '*': {
         'max_retries': 3,
-        'soft_time_limit': 300,
     },
 }
+
+
+# Browser pool quente por processo filho do worker (prefork). Sobe na
+# primeira execução do filho, não aqui: o init precisa responder dentro do
+# worker_proc_alive_timeout.
+@worker_process_init.connect
+def enable_browser_pool(**kwargs):
+    from apps.testing.browser_pool import enable_pool
+    enable_pool()
+
+
+@worker_process_shutdown.connect
+def shutdown_browser_pool(**kwargs):
+    from apps.testing.browser_pool import shutdown_pool
+    shutdown_pool()
@@ -55,7 +55,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'apps.core.middleware.SecurityHeadersMiddleware',
     'apps.core.middleware.RequestLoggingMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -167,7 +167,82 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'America/Sao_Paulo'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 600
+CELERY_TASK_SOFT_TIME_LIMIT = 300
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Filas de execução (apps.testing.queues): o worker de testes consome na ordem
+# do -Q (interactive, rerun, scheduled) e, dentro da fila, pela prioridade do
+# plano (0 = maior). Prefetch 1 para a prioridade valer em tasks longas.
+# 'default' fica só com housekeeping (beat tick, reaper, notificações, flushes)
+# num worker próprio (Procfile: housekeeping) — backlog de testes não o atrasa.
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ROUTES = {
+    'testing.generate_run_cases': {'queue': 'interactive'},
+    'testing.execute_scheduled_test': {'queue': 'scheduled'},
+}
+# Lease de execução por run: expira sem heartbeat em TTL segundos
+RUN_LEASE_TTL_SECS = int(os.environ.get('RUN_LEASE_TTL_SECS', 120))
+RUN_LEASE_HEARTBEAT_SECS = int(os.environ.get('RUN_LEASE_HEARTBEAT_SECS', 30))
+# Checkpoint dos resultados durante a execução (casos por lote / idade máxima do lote)
+RUN_CHECKPOINT_BATCH_SIZE = int(os.environ.get('RUN_CHECKPOINT_BATCH_SIZE', 5))
+RUN_CHECKPOINT_MAX_SECS = int(os.environ.get('RUN_CHECKPOINT_MAX_SECS', 10))
+# Reaper: retomadas por run e tolerância para runs na fila sem worker (queued_at
+# é renovado a cada espera por vaga, então esperar o teto não conta)
+RUN_MAX_RESUMES = int(os.environ.get('RUN_MAX_RESUMES', 2))
+RUN_REAPER_QUEUED_GRACE_SECS = int(os.environ.get('RUN_REAPER_QUEUED_GRACE_SECS', 60 * 60))
+# Sem vaga no teto de runs simultâneos do workspace: tenta de novo em N segundos
+WORKSPACE_SLOT_RETRY_SECS = int(os.environ.get('WORKSPACE_SLOT_RETRY_SECS', 15))
+
+# Playwright browser pool (um por processo de worker Celery; 0 desliga)
+PLAYWRIGHT_POOL_SIZE = int(os.environ.get('PLAYWRIGHT_POOL_SIZE', 1))
+PLAYWRIGHT_POOL_MAX_RUNS = int(os.environ.get('PLAYWRIGHT_POOL_MAX_RUNS', 50))
+PLAYWRIGHT_POOL_MAX_RSS_GROWTH_MB = int(os.environ.get('PLAYWRIGHT_POOL_MAX_RSS_GROWTH_MB', 1024))
+# Máximo de TestRuns simultâneos no mesmo event loop (execução em lote)
+PLAYWRIGHT_MAX_PARALLEL_RUNS = int(os.environ.get('PLAYWRIGHT_MAX_PARALLEL_RUNS', 4))
+# Carrega a landing page uma vez por run e roda checks de DOM contra o snapshot
+PLAYWRIGHT_SNAPSHOT_MODE = os.environ.get('PLAYWRIGHT_SNAPSHOT_MODE', 'True') == 'True'
+
+# AI test generation — cache por hash das entradas (segundos)
+AI_GENERATION_CACHE_TTL = int(os.environ.get('AI_GENERATION_CACHE_TTL', 60 * 60 * 24))
+
+# Crawl do site antes da geração (resumo de páginas/formulários no prompt)
+SITE_CRAWL_ENABLED = os.environ.get('SITE_CRAWL_ENABLED', 'True') == 'True'
+SITE_CRAWL_MAX_PAGES = int(os.environ.get('SITE_CRAWL_MAX_PAGES', 8))
+SITE_CRAWL_CONCURRENCY = int(os.environ.get('SITE_CRAWL_CONCURRENCY', 4))
+SITE_CRAWL_FRESH_SECS = int(os.environ.get('SITE_CRAWL_FRESH_SECS', 60 * 60))
+SITE_CRAWL_CACHE_TTL = int(os.environ.get('SITE_CRAWL_CACHE_TTL', 60 * 60 * 24 * 7))
+
+# Cache do dashboard por workspace (segundos; invalidado por versão a cada escrita)
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+
+# Notificações Slack/Discord (outbox + dispatcher)
+NOTIFY_COALESCE_SECS = int(os.environ.get('NOTIFY_COALESCE_SECS', 5))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', 5))
+NOTIFY_RETRY_BASE_SECS = int(os.environ.get('NOTIFY_RETRY_BASE_SECS', 30))
+NOTIFY_TIMEOUT_SECS = float(os.environ.get('NOTIFY_TIMEOUT_SECS', 10))
+NOTIFY_MAX_WORKERS = int(os.environ.get('NOTIFY_MAX_WORKERS', 8))
+
+# API keys: verificação em cache (segundos) e last_used_at gravado em lote pelo beat
+API_KEY_CACHE_TTL = int(os.environ.get('API_KEY_CACHE_TTL', 60))
+API_KEY_USAGE_TTL = int(os.environ.get('API_KEY_USAGE_TTL', 60 * 60))
+API_KEY_FLUSH_BATCH_SIZE = int(os.environ.get('API_KEY_FLUSH_BATCH_SIZE', 500))
+
+# ScheduledTests: quantos o beat enfileira por tick (tick = crontab do run-scheduled-tests)
+SCHEDULER_TICK_SECS = int(os.environ.get('SCHEDULER_TICK_SECS', 300))
+# Processos de worker disponíveis para agendados (replicas x -c do Procfile)
+SCHEDULER_WORKER_SLOTS = int(os.environ.get('SCHEDULER_WORKER_SLOTS', 2))
+SCHEDULER_EXPECTED_RUN_SECS = int(os.environ.get('SCHEDULER_EXPECTED_RUN_SECS', 60))
+
+# Eventos de run (SSE / long-poll) — pub/sub no Redis; sem Redis, polling do banco
+EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL', os.environ.get('REDIS_URL', ''))
+EVENTS_POLL_SECS = float(os.environ.get('EVENTS_POLL_SECS', 2))
+EVENTS_HEARTBEAT_SECS = int(os.environ.get('EVENTS_HEARTBEAT_SECS', 15))
+EVENTS_LONGPOLL_MAX_SECS = int(os.environ.get('EVENTS_LONGPOLL_MAX_SECS', 60))
+EVENTS_STREAM_MAX_SECS = int(os.environ.get('EVENTS_STREAM_MAX_SECS', 600))
 
 # Django REST Framework
 REST_FRAMEWORK = {
@@ -207,10 +282,26 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'testing.run_scheduled_tests',
         'schedule': crontab(minute='*/5'),
     },
+    'reap-stale-runs': {
+        'task': 'testing.reap_stale_runs',
+        'schedule': crontab(minute='*/2'),
+    },
     'cleanup-videos': {
         'task': 'testing.cleanup_videos',
         'schedule': crontab(hour=3, minute=0),
     },
+    'dispatch-notifications': {
+        'task': 'workspaces.dispatch_notifications',
+        'schedule': crontab(minute='*'),
+    },
+    'flush-api-key-usage': {
+        'task': 'api.flush_key_usage',
+        'schedule': crontab(minute='*'),
+    },
+    'reconcile-quota': {
+        'task': 'workspaces.reconcile_quota',
+        'schedule': crontab(minute=5),
+    },
 }
 
 # Logging estruturado
@@ -255,13 +346,34 @@ POSTHOG_HOST = os.environ.get('POSTHOG_HOST', 'https://app.posthog.com')
 # Security
 SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'
 
-# Cache
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'spritetest-cache',
+# Cache — Redis compartilhado entre processos quando há REDIS_URL (ou
+# CACHE_REDIS_URL, para separar do broker); LocMem só em dev/testes.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', os.environ.get('REDIS_URL', ''))
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'apps.core.cache.ResilientRedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'spritetest',
+            'TIMEOUT': 300,
+            # Segundos servindo do cache local após uma falha do Redis
+            'DEGRADED_RETRY_SECS': 30,
+            'OPTIONS': {
+                'max_connections': int(os.environ.get('CACHE_MAX_CONNECTIONS', 50)),
+                'socket_connect_timeout': 0.5,
+                'socket_timeout': 0.5,
+                'retry_on_timeout': True,
+                'health_check_interval': 30,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'spritetest-cache',
+        }
     }
-}
 
 # Rate Limiting
 RATELIMIT_ENABLE = True